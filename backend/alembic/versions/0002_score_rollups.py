@@ -0,0 +1,22 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002_score_rollups'
+down_revision = '0001_init'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('score_rollups_daily',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('kind', sa.String(length=16), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('passed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('score_sum', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('score_sq_sum', sa.Float(), nullable=False, server_default='0'),
+        *[sa.Column(f'hist_{i}', sa.Integer(), nullable=False, server_default='0') for i in range(1, 10)],
+        sa.PrimaryKeyConstraint('day', 'kind')
+    )
+
+def downgrade():
+    op.drop_table('score_rollups_daily')
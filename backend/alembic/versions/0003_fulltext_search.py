@@ -0,0 +1,21 @@
+from alembic import op
+
+revision = '0003_fulltext_search'
+down_revision = '0002_score_rollups'
+branch_labels = None
+depends_on = None
+
+# Índexs FULLTEXT (InnoDB) per a GET /okrs/search. A SQLite no s'apliquen:
+# la cerca usa un índex invertit en memòria (app/services/search.py).
+
+def upgrade():
+    if op.get_bind().dialect.name != 'mysql':
+        return
+    op.create_index('ix_okr_submissions_objective_ft', 'okr_submissions', ['objective'], mysql_prefix='FULLTEXT')
+    op.create_index('ix_key_results_kr_definition_ft', 'key_results', ['kr_definition'], mysql_prefix='FULLTEXT')
+
+def downgrade():
+    if op.get_bind().dialect.name != 'mysql':
+        return
+    op.drop_index('ix_key_results_kr_definition_ft', table_name='key_results')
+    op.drop_index('ix_okr_submissions_objective_ft', table_name='okr_submissions')
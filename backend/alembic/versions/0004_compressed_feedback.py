@@ -0,0 +1,37 @@
+import zlib
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+revision = '0004_compressed_feedback'
+down_revision = '0003_fulltext_search'
+branch_labels = None
+depends_on = None
+
+# feedback passa de LONGTEXT a LONGBLOB: el model (CompressedText) hi desa el text
+# comprimit amb zlib a partir de FEEDBACK_COMPRESS_MIN_BYTES. Els bytes UTF-8 de
+# les files existents es conserven i es llegeixen tal qual (no es recomprimeixen).
+# A SQLite no cal: la columna accepta bytes sense canviar-ne el tipus.
+
+TABLES = ('okr_submissions', 'key_results')
+
+def upgrade():
+    if op.get_bind().dialect.name != 'mysql':
+        return
+    for table in TABLES:
+        op.alter_column(table, 'feedback', existing_type=mysql.LONGTEXT(), type_=mysql.LONGBLOB(),
+                        existing_nullable=False)
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'mysql':
+        return
+    for table in TABLES:
+        # Abans de tornar a text, descomprimeix les files amb prefix (\x00z)
+        rows = bind.execute(sa.text(f"SELECT id, feedback FROM {table} WHERE feedback LIKE BINARY :p"),
+                            {'p': b'\x00z%'}).all()
+        for row_id, value in rows:
+            bind.execute(sa.text(f"UPDATE {table} SET feedback = :v WHERE id = :id"),
+                         {'v': zlib.decompress(value[2:]), 'id': row_id})
+        op.alter_column(table, 'feedback', existing_type=mysql.LONGBLOB(), type_=mysql.LONGTEXT(),
+                        existing_nullable=False)
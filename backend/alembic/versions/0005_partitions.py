@@ -0,0 +1,53 @@
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+from app.core.config import settings
+from app.db.partitions import PARTITIONED_TABLES, add_months, is_partitioned, month_start, partition_ddl
+
+revision = '0005_partitions'
+down_revision = '0004_compressed_feedback'
+branch_labels = None
+depends_on = None
+
+# Només MySQL i amb DB_PARTITIONED=true: okr_submissions i key_results particionades
+# per mes sobre created_at (app/db/partitions.py), perquè `app.cli.archive` pugui
+# treure els mesos antics amb DROP PARTITION. Restriccions d'InnoDB:
+# - la PK ha d'incloure la columna de partició: passa a ser (id, created_at)
+# - sense claus foranes: desapareix key_results.okr_id -> okr_submissions.id
+# - sense FULLTEXT: la cerca usa l'índex en memòria (app/services/search.py)
+# Per particionar més tard: `alembic downgrade 0004_compressed_feedback` i tornar a pujar.
+
+AHEAD_MONTHS = 3
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'mysql' or not settings.DB_PARTITIONED:
+        return
+    for fk in sa.inspect(bind).get_foreign_keys('key_results'):
+        if fk['referred_table'] == 'okr_submissions':
+            op.drop_constraint(fk['name'], 'key_results', type_='foreignkey')
+    op.drop_index('ix_okr_submissions_objective_ft', table_name='okr_submissions')
+    op.drop_index('ix_key_results_kr_definition_ft', table_name='key_results')
+
+    last = add_months(month_start(date.today()), AHEAD_MONTHS)
+    for table in PARTITIONED_TABLES:
+        first = bind.execute(sa.text(f"SELECT MIN(created_at) FROM {table}")).scalar() or date.today()
+        # Files sense created_at (no n'hi hauria d'haver): al primer mes
+        bind.execute(sa.text(f"UPDATE {table} SET created_at = :first WHERE created_at IS NULL"), {'first': first})
+        op.execute(f"ALTER TABLE {table} MODIFY created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+                   f"DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)")
+        op.execute(f"ALTER TABLE {table} {partition_ddl(first, last)}")
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'mysql' or not is_partitioned(bind, 'okr_submissions'):
+        return
+    for table in PARTITIONED_TABLES:
+        op.execute(f"ALTER TABLE {table} REMOVE PARTITIONING")
+        op.execute(f"ALTER TABLE {table} MODIFY created_at DATETIME NULL DEFAULT CURRENT_TIMESTAMP, "
+                   f"DROP PRIMARY KEY, ADD PRIMARY KEY (id)")
+    # Les files arxivades poden haver deixat KRs sense objectiu: no es poden tornar a lligar
+    op.execute("DELETE kr FROM key_results kr LEFT JOIN okr_submissions o ON o.id = kr.okr_id WHERE o.id IS NULL")
+    op.create_foreign_key(None, 'key_results', 'okr_submissions', ['okr_id'], ['id'], ondelete='CASCADE')
+    op.create_index('ix_okr_submissions_objective_ft', 'okr_submissions', ['objective'], mysql_prefix='FULLTEXT')
+    op.create_index('ix_key_results_kr_definition_ft', 'key_results', ['kr_definition'], mysql_prefix='FULLTEXT')
@@ -0,0 +1,17 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0006_overall_score'
+down_revision = '0005_partitions'
+branch_labels = None
+depends_on = None
+
+# Puntuació global del model (`overall_score`), la que decideix `can_add_krs`: la taxa
+# d'aprovats dels objectius a /okrs/stats surt d'aquí, no de l'heurística (`score`).
+# Les files anteriors queden a NULL i els rollups hi fan servir `score`.
+
+def upgrade():
+    op.add_column('okr_submissions', sa.Column('overall_score', sa.Float(), nullable=True))
+
+def downgrade():
+    op.drop_column('okr_submissions', 'overall_score')
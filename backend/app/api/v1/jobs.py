@@ -0,0 +1,20 @@
+import redis
+from fastapi import APIRouter, HTTPException, Depends
+from app.schemas.okr import JobStatus
+from app.services.jobs import get_job
+from app.core.ratelimit import RateLimiter
+
+router = APIRouter()
+
+read_rate_limit = RateLimiter("read")
+
+@router.get("/{job_id}", response_model=JobStatus, dependencies=[Depends(read_rate_limit)])
+async def get_job_endpoint(job_id: str):
+    """Estat d'un treball asíncron; `result` quan ha acabat (`succeeded`)."""
+    try:
+        job = await get_job(job_id)
+    except redis.RedisError:
+        raise HTTPException(503, "Job queue unavailable")
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return job
@@ -1,20 +1,201 @@
-from fastapi import APIRouter, HTTPException, Depends
-from app.schemas.okr import OkrEvaluateRequest, OkrEvaluateResponse, KrEvaluateRequest, KrEvaluateResponse
-from app.services.okr_service import evaluate_objective, evaluate_kr
-from app.core.ratelimit import rate_limit
+import orjson
+import redis
+from datetime import date, datetime, timedelta
+from typing import Literal
+from urllib.parse import urlencode
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse, ORJSONResponse
+from pydantic import TypeAdapter
+from app.schemas.okr import (
+    OkrEvaluateRequest, OkrEvaluateResponse, KrEvaluateRequest, KrEvaluateResponse,
+    BatchEvaluateRequest, BatchEvaluateResponse, OkrSummary, OkrDetail, StatsResponse, SearchHit, JobAccepted,
+)
+from app.services.okr_service import (
+    evaluate_objective, evaluate_objective_stream, evaluate_kr, evaluate_batch, UnknownObjective,
+)
+from app.services.okr_queries import list_okrs, get_okr, InvalidCursor
+from app.services.analytics import get_stats
+from app.services.search import search
+from app.services import jobs
+from app.core.etag import etag_response
+from app.core.config import settings
+from app.core.ratelimit import RateLimiter
+from app.core.disconnect import cancel_on_disconnect, ClientDisconnected
 
 router = APIRouter()
 
-@router.post("/evaluate", response_model=OkrEvaluateResponse, dependencies=[Depends(rate_limit)])
-async def evaluate(req: OkrEvaluateRequest):
+# 499: el client ha tancat la connexió (convenció de Nginx)
+CLIENT_CLOSED_REQUEST = 499
+
+# Un límit per ruta (RATE_LIMIT_ROUTES["evaluate" | "stream" | "kr" | "batch"])
+evaluate_rate_limit = RateLimiter("evaluate")
+stream_rate_limit = RateLimiter("stream")
+kr_rate_limit = RateLimiter("kr")
+batch_rate_limit = RateLimiter("batch")
+# Lectures (dashboards amb polling): RATE_LIMIT_ROUTES["read"]
+read_rate_limit = RateLimiter("read")
+
+_okr_list = TypeAdapter(list[OkrSummary])
+
+class JobOptions:
+    """`?mode=async`: encua l'avaluació i respon 202 amb l'id del treball
+    (GET /api/v1/jobs/{id}); opcionalment, `webhook_url` rep el resultat."""
+
+    def __init__(
+        self,
+        mode: Literal["sync", "async"] = "sync",
+        priority: Literal["high", "normal", "low"] | None = None,
+        webhook_url: str | None = Query(None, max_length=2000),
+    ):
+        self.mode = mode
+        self.priority = priority
+        self.webhook_url = webhook_url
+
+def debug_requested(request: Request) -> bool:
+    """Camps debug_* (resposta del model en cru) amb DEBUG_RESPONSES o la capçalera `X-Debug: 1`.
+    Llavors es retorna el resultat complet del servei, sense filtrar pel response_model."""
+    return settings.DEBUG_RESPONSES or request.headers.get("x-debug") == "1"
+
+async def _enqueue(request: Request, kind: str, payload: dict, opts: JobOptions, default_priority: str = "normal"):
+    try:
+        job = await jobs.enqueue(kind, payload, opts.priority or default_priority, opts.webhook_url)
+    except jobs.InvalidWebhook as e:
+        raise HTTPException(400, str(e))
+    except jobs.QueueFull as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "5"})
+    except redis.RedisError:
+        raise HTTPException(503, "Job queue unavailable")
+    status_url = str(request.url_for("get_job_endpoint", job_id=job["id"]))
+    body = JobAccepted(job_id=job["id"], status=job["status"], priority=job["priority"], status_url=status_url)
+    return ORJSONResponse(body.model_dump(), status_code=202, headers={"Location": status_url})
+
+@router.get("", response_model=list[OkrSummary], dependencies=[Depends(read_rate_limit)])
+async def list_okrs_endpoint(
+    request: Request,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = None,
+    min_score: float | None = Query(None, ge=0, le=10),
+    max_score: float | None = Query(None, ge=0, le=10),
+    from_date: datetime | None = None,
+    to_date: datetime | None = None,
+    include_feedback: bool = False,
+):
+    """Llistat del més recent al més antic. La pàgina següent s'indica a les
+    capçaleres `X-Next-Cursor` i `Link: <...>; rel="next"` (el cos és una llista).
+    `to_date` sense hora (`2026-10-31`) inclou tot el dia, com el filtre de Home.tsx."""
+    if to_date is not None and len(request.query_params["to_date"]) <= len("YYYY-MM-DD"):
+        to_date += timedelta(days=1)
+    try:
+        rows, next_cursor = await list_okrs(
+            limit, cursor, min_score, max_score, from_date, to_date, include_feedback
+        )
+    except InvalidCursor as e:
+        raise HTTPException(400, str(e))
+    response = etag_response(request, _okr_list.dump_json([OkrSummary(**r) for r in rows], exclude_none=True, by_alias=True))
+    if next_cursor:
+        params = {k: v for k, v in request.query_params.items() if k != "cursor"}
+        next_url = request.url.replace(query=urlencode({**params, "cursor": next_cursor}))
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return response
+
+# Rang màxim de /stats: el cost és proporcional als dies, no a les avaluacions
+STATS_MAX_DAYS = 731
+
+@router.get("/stats", response_model=StatsResponse, dependencies=[Depends(read_rate_limit)])
+async def stats_endpoint(
+    request: Request,
+    from_date: date | None = None,
+    to_date: date | None = None,
+    group_by: Literal["day", "week"] = "week",
+):
+    """Distribució de scores, mitjanes per període i taxa d'aprovats (>= PASS_THRESHOLD, el mateix
+    llindar que `can_add_krs` i `allow_next_kr`), llegides dels rollups diaris. Per defecte, els últims 90 dies."""
+    to_date = to_date or date.today()
+    from_date = from_date or to_date - timedelta(days=89)
+    if from_date > to_date or (to_date - from_date).days >= STATS_MAX_DAYS:
+        raise HTTPException(400, f"Invalid date range (max {STATS_MAX_DAYS} days)")
+    stats = await get_stats(from_date, to_date, group_by)
+    return etag_response(request, StatsResponse(**stats).model_dump_json().encode("utf-8"))
+
+@router.get("/search", response_model=list[SearchHit], dependencies=[Depends(read_rate_limit)])
+async def search_endpoint(
+    q: str = Query(min_length=2, max_length=200),
+    kind: Literal["objective", "key_result"] = "objective",
+    limit: int = Query(20, ge=1, le=100),
+    min_score: float | None = Query(None, ge=0, le=10),
+    max_score: float | None = Query(None, ge=0, le=10),
+):
+    """Objectius (o KRs) semblants al text: cada paraula es cerca com a prefix i
+    els resultats surten ordenats per rellevància."""
+    return await search(q, kind, limit, min_score, max_score)
+
+@router.get("/{okr_id}", response_model=OkrDetail, dependencies=[Depends(read_rate_limit)])
+async def get_okr_endpoint(okr_id: str, request: Request):
+    okr = await get_okr(okr_id)
+    if okr is None:
+        raise HTTPException(404, "OKR not found")
+    return etag_response(request, OkrDetail.model_validate(okr).model_dump_json(by_alias=True).encode("utf-8"))
+
+@router.post("/evaluate", response_model=OkrEvaluateResponse, responses={202: {"model": JobAccepted}},
+             dependencies=[Depends(evaluate_rate_limit)])
+async def evaluate(req: OkrEvaluateRequest, request: Request, opts: JobOptions = Depends(),
+                   debug: bool = Depends(debug_requested)):
+    if opts.mode == "async":
+        return await _enqueue(request, "objective", req.model_dump(mode="json"), opts)
+    try:
+        result = await cancel_on_disconnect(request, evaluate_objective(req.objective, debug))
+        return ORJSONResponse(result) if debug else result
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except Exception as e:
+        raise HTTPException(500, str(e))
+
+@router.post("/evaluate/stream", dependencies=[Depends(stream_rate_limit)])
+async def evaluate_stream(req: OkrEvaluateRequest):
+    """Server-Sent Events: heurística immediata, criteris i suggeriments a mesura
+    que arriben del model i, finalment, l'okr_id desat (event `done`)."""
+    async def events():
+        async for event, data in evaluate_objective_stream(req.objective):
+            yield f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/kr/evaluate", response_model=KrEvaluateResponse, responses={202: {"model": JobAccepted}},
+             dependencies=[Depends(kr_rate_limit)])
+async def evaluate_key_result(req: KrEvaluateRequest, request: Request, opts: JobOptions = Depends()):
+    if opts.mode == "async":
+        return await _enqueue(request, "key_result", req.model_dump(mode="json"), opts)
     try:
-        return await evaluate_objective(req.objective)
+        return await cancel_on_disconnect(
+            request,
+            evaluate_kr(req.okr_id, req.kr_definition, req.target_value, req.target_date.isoformat()),
+        )
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except UnknownObjective as e:
+        raise HTTPException(404, str(e))
     except Exception as e:
         raise HTTPException(500, str(e))
 
-@router.post("/kr/evaluate", response_model=KrEvaluateResponse, dependencies=[Depends(rate_limit)])
-async def evaluate_key_result(req: KrEvaluateRequest):
+@router.post("/evaluate/batch", response_model=BatchEvaluateResponse, responses={202: {"model": JobAccepted}},
+             dependencies=[Depends(batch_rate_limit)])
+async def evaluate_batch_endpoint(req: BatchEvaluateRequest, request: Request, opts: JobOptions = Depends(),
+                                  debug: bool = Depends(debug_requested)):
+    items = len(req.objectives) + sum(len(o.key_results) for o in req.objectives)
+    if items > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(413, f"Batch too large: {items} items (max {settings.BATCH_MAX_ITEMS})")
+    if opts.mode == "async":
+        # Els lots, per defecte, per darrere de les avaluacions individuals
+        return await _enqueue(request, "batch", req.model_dump(mode="json"), opts, default_priority="low")
     try:
-        return await evaluate_kr(req.okr_id, req.kr_definition, req.target_value, req.target_date.isoformat())
+        result = await cancel_on_disconnect(request, evaluate_batch(req.objectives, debug))
+        return ORJSONResponse(result) if debug else result
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
     except Exception as e:
         raise HTTPException(500, str(e))
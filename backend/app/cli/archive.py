@@ -0,0 +1,158 @@
+"""Retenció: exporta els mesos antics d'okr_submissions i key_results a JSONL comprimit i els treu de la BD.
+
+    python -m app.cli.archive --retention-months 12 --out /backups/okr-archive
+    python -m app.cli.archive --retention-months 12 --dry-run      # només compta
+
+- Arxiva per mesos, del més antic fins a `--retention-months` enrere: un fitxer
+  `<taula>-YYYY-MM.jsonl.gz` per taula i mes (el primer inclou les files anteriors),
+  amb el feedback ja descomprimit. El fitxer s'escriu sencer abans d'esborrar res.
+- MySQL particionat (migració 0005): DROP PARTITION dels mesos exportats (instantani)
+  i crea les particions dels `--ahead-months` següents. Altrament, DELETE per mes.
+- Un objectiu surt de la BD amb tots els seus KRs, encara que siguin més nous: abans
+  d'esborrar-lo s'exporten a `key_results-YYYY-MM.by-objective.jsonl.gz` (mes de
+  l'objectiu) i s'esborren. Sense això, el DELETE en cascada (FK ondelete=CASCADE)
+  se'ls enduria sense haver-los exportat.
+- Els rollups de score_rollups_daily no es toquen: /okrs/stats conserva l'històric
+  (no executis `app.cli.backfill_stats` sobre mesos arxivats). L'índex de cerca en
+  memòria pot retornar files arxivades fins que el procés es reinicia.
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import date, datetime
+from sqlalchemy import select, delete, func
+from app.db.session import engine
+from app.db.models import OkrSubmission, KeyResult
+from app.db.partitions import add_months, drop_partitions, ensure_partitions, is_partitioned, month_start
+
+logger = logging.getLogger("archive")
+
+# Els KRs primer: sense particions, esborrar un objectiu els esborraria en cascada
+TABLES = {"key_results": KeyResult.__table__, "okr_submissions": OkrSubmission.__table__}
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} no serialitzable")
+
+def _at(d: date) -> datetime:
+    return datetime.combine(d, datetime.min.time())
+
+def _window(t, lower: date | None, upper: date):
+    cond = t.c.created_at < _at(upper)
+    return cond if lower is None else cond & (t.c.created_at >= _at(lower))
+
+def _krs_of(lower: date | None, upper: date):
+    """KRs dels objectius de [lower, upper), sigui quina sigui la seva data."""
+    okrs = TABLES["okr_submissions"]
+    return TABLES["key_results"].c.okr_id.in_(select(okrs.c.id).where(_window(okrs, lower, upper)))
+
+def export_rows(t, cond, path: str, ids: list | None = None) -> int:
+    """Escriu les files de `t` que compleixen `cond` a `path` (gzip, una fila JSON per línia).
+    Si es passa `ids`, hi afegeix l'id de cada fila escrita."""
+    tmp = f"{path}.tmp"
+    n = 0
+    with engine.connect() as conn, gzip.open(tmp, "wt", encoding="utf-8") as f:
+        result = conn.execution_options(stream_results=True, yield_per=2000).execute(
+            select(t).where(cond).order_by(t.c.created_at, t.c.id)
+        )
+        for row in result.mappings():
+            f.write(json.dumps(dict(row), ensure_ascii=False, default=_json_default))
+            f.write("\n")
+            n += 1
+            if ids is not None:
+                ids.append(row["id"])
+    if n:
+        os.replace(tmp, path)
+    else:
+        os.remove(tmp)
+    return n
+
+def export_month(t, lower: date | None, upper: date, path: str) -> int:
+    """Escriu les files de [lower, upper) a `path`."""
+    return export_rows(t, _window(t, lower, upper), path)
+
+def _archive_krs_of(lower: date | None, upper: date, month: date, cutoff: date, out: str, dry_run: bool,
+                    files: list[str]) -> int:
+    """Exporta i esborra els KRs que queden dels objectius del mes (els anteriors a
+    `cutoff` ja han sortit per data). Va abans d'esborrar els objectius."""
+    krs, cond = TABLES["key_results"], _krs_of(lower, upper)
+    if dry_run:
+        with engine.connect() as conn:
+            return conn.execute(
+                select(func.count()).select_from(krs).where(cond & (krs.c.created_at >= _at(cutoff)))
+            ).scalar()
+    path = os.path.join(out, f"key_results-{month:%Y-%m}.by-objective.jsonl.gz")
+    ids: list[str] = []
+    n = export_rows(krs, cond, path, ids)
+    # Només els exportats: un KR afegit mentrestant a aquests objectius no s'esborra sense còpia
+    with engine.begin() as conn:
+        for i in range(0, len(ids), 1000):
+            conn.execute(delete(krs).where(krs.c.id.in_(ids[i:i + 1000])))
+    if n:
+        files.append(path)
+    return n
+
+def archive(retention_months: int, out: str, ahead_months: int = 3, dry_run: bool = False,
+            today: date | None = None) -> dict:
+    start = time.perf_counter()
+    today = today or date.today()
+    cutoff = add_months(month_start(today), -retention_months)
+    if not dry_run:
+        os.makedirs(out, exist_ok=True)
+    summary = {"cutoff": cutoff.isoformat(), "tables": {}}
+
+    for name, t in TABLES.items():
+        with engine.connect() as conn:
+            partitioned = is_partitioned(conn, name)
+            oldest = conn.execute(select(func.min(t.c.created_at)).where(t.c.created_at < _at(cutoff))).scalar()
+        stats = {"partitioned": partitioned, "rows": 0, "files": [], "dropped": [], "added": []}
+        if name == "okr_submissions":
+            stats["key_results"] = 0  # KRs més nous que se'n van amb el seu objectiu
+        month = month_start(oldest) if oldest is not None else cutoff
+        lower = None
+        while month < cutoff:
+            upper = add_months(month, 1)
+            if name == "okr_submissions":
+                stats["key_results"] += _archive_krs_of(lower, upper, month, cutoff, out, dry_run, stats["files"])
+            if dry_run:
+                with engine.connect() as conn:
+                    n = conn.execute(select(func.count()).select_from(t).where(_window(t, lower, upper))).scalar()
+            else:
+                path = os.path.join(out, f"{name}-{month:%Y-%m}.jsonl.gz")
+                n = export_month(t, lower, upper, path)
+                with engine.begin() as conn:
+                    if partitioned:
+                        stats["dropped"] += drop_partitions(conn, name, upper)
+                    else:
+                        conn.execute(delete(t).where(_window(t, lower, upper)))
+                if n:
+                    stats["files"].append(path)
+            stats["rows"] += n
+            logger.info(f"{name} {month:%Y-%m}: {n} files")
+            lower, month = upper, upper
+
+        if partitioned and not dry_run:
+            with engine.begin() as conn:
+                stats["added"] = ensure_partitions(conn, name, add_months(month_start(today), ahead_months))
+        summary["tables"][name] = stats
+
+    summary["seconds"] = round(time.perf_counter() - start, 2)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Arxiva a JSONL (gzip) els OKRs més antics que la retenció")
+    parser.add_argument("--retention-months", type=int, required=True, help="mesos complets que es queden a la BD")
+    parser.add_argument("--out", default="archive", help="directori dels fitxers .jsonl.gz")
+    parser.add_argument("--ahead-months", type=int, default=3, help="particions futures que han d'existir (MySQL)")
+    parser.add_argument("--dry-run", action="store_true", help="només compta les files que s'arxivarien")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    print(json.dumps(archive(args.retention_months, args.out, args.ahead_months, args.dry_run)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Reconstrueix els rollups de score_rollups_daily a partir d'okr_submissions i key_results.
+
+    python -m app.cli.backfill_stats                       # tot l'històric
+    python -m app.cli.backfill_stats --from-date 2026-01-01 --to-date 2026-03-31
+
+Cal executar-lo un cop després de la migració 0002 (files anteriors als rollups)
+i després d'un `app.cli.rescore`. L'agregació la fa la BD (GROUP BY per dia) i
+el rang es reescriu dins una sola transacció.
+"""
+import argparse
+import json
+import logging
+import time
+from datetime import date
+from app.db.session import engine
+from app.services.analytics import backfill_statements, upsert_statement
+
+logger = logging.getLogger("backfill_stats")
+
+def backfill(from_date: date | None = None, to_date: date | None = None) -> dict:
+    start = time.perf_counter()
+    dialect = engine.dialect.name
+    days = {}
+    with engine.begin() as conn:
+        for kind, stmt in backfill_statements(dialect, from_date, to_date):
+            if kind == "delete":
+                conn.execute(stmt)
+                continue
+            n = 0
+            for row in conn.execute(stmt).mappings():
+                values = dict(row)
+                day = values.pop("day")
+                day = day if isinstance(day, date) else date.fromisoformat(str(day))
+                conn.execute(upsert_statement(dialect, day, kind, values))
+                n += 1
+            days[kind] = n
+            logger.info(f"{kind}: {n} dies reconstruïts")
+    return {"days": days, "seconds": round(time.perf_counter() - start, 2)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstrueix els rollups diaris de /okrs/stats")
+    parser.add_argument("--from-date", type=date.fromisoformat)
+    parser.add_argument("--to-date", type=date.fromisoformat)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    print(json.dumps(backfill(args.from_date, args.to_date)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Recalcula la puntuació heurística de les files desades (després de canviar scoring.py).
+
+    python -m app.cli.rescore --table okr_submissions --workers 4 --checkpoint rescore.json
+    python -m app.cli.rescore --table key_results --page-size 5000
+
+- Llegeix amb cursor de servidor i paginació keyset sobre (created_at, id):
+  no carrega mai la taula sencera a memòria.
+- Puntua en un pool de processos mentre es llegeix la pàgina següent.
+- Només escriu les files que canvien, amb UPDATEs en lot (executemany).
+- Desa un checkpoint després de cada pàgina confirmada; si es torna a llançar
+  amb el mateix fitxer, continua on ho havia deixat (esborra'l per començar de zero).
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import select, update, bindparam, and_, or_
+from app.db.session import engine
+from app.db.models import OkrSubmission, KeyResult
+from app.services.scoring import score_many, score_kr_many
+
+logger = logging.getLogger("rescore")
+
+TABLES = {
+    "okr_submissions": {
+        "table": OkrSubmission.__table__,
+        "inputs": ("objective",),
+        "outputs": ("clarity", "focus", "writing"),
+    },
+    "key_results": {
+        "table": KeyResult.__table__,
+        "inputs": ("kr_definition", "target_value", "target_date"),
+        "outputs": ("clarity", "measurability", "feasibility"),
+    },
+}
+
+def _score_chunk(table_name: str, rows: list[tuple]) -> list[dict]:
+    """S'executa als processos del pool: rep (id, inputs...) i retorna els valors nous."""
+    outputs = TABLES[table_name]["outputs"]
+    if table_name == "okr_submissions":
+        scores = score_many(r[1] for r in rows)
+    else:
+        scores = score_kr_many(
+            (r[1], r[2], r[3].isoformat() if hasattr(r[3], "isoformat") else str(r[3])) for r in rows
+        )
+    out = []
+    for row, s in zip(rows, scores):
+        values = {"b_id": row[0], "score": s["total"]}
+        values.update({col: s[col] for col in outputs})
+        out.append(values)
+    return out
+
+def load_checkpoint(path: str | None, table_name: str) -> dict:
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            ckpt = json.load(f)
+        if ckpt.get("table") == table_name:
+            return ckpt
+    return {"table": table_name, "phase": "null", "created_at": None, "id": "", "rows": 0, "updated": 0}
+
+def save_checkpoint(path: str | None, ckpt: dict):
+    if not path:
+        return
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(ckpt, f)
+    os.replace(tmp, path)
+
+def _page_query(spec: dict, ckpt: dict, page_size: int):
+    t = spec["table"]
+    cols = [t.c.id, *(t.c[c] for c in spec["inputs"]), *(t.c[c] for c in spec["outputs"]), t.c.score, t.c.created_at]
+    q = select(*cols)
+    if ckpt["phase"] == "null":
+        # Files sense created_at (no haurien d'existir, però el camp és nullable)
+        q = q.where(t.c.created_at.is_(None), t.c.id > ckpt["id"]).order_by(t.c.id)
+    else:
+        q = q.where(t.c.created_at.is_not(None))
+        if ckpt["created_at"] is not None:
+            after = datetime.fromisoformat(ckpt["created_at"])
+            q = q.where(or_(
+                t.c.created_at > after,
+                and_(t.c.created_at == after, t.c.id > ckpt["id"]),
+            ))
+        q = q.order_by(t.c.created_at, t.c.id)
+    return q.limit(page_size)
+
+def _fetch_page(spec: dict, ckpt: dict, page_size: int) -> list[tuple]:
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=2000).execute(
+            _page_query(spec, ckpt, page_size)
+        )
+        return [tuple(r) for r in result]
+
+def _advance(ckpt: dict, page: list[tuple], page_size: int):
+    last = page[-1] if page else None
+    if ckpt["phase"] == "null":
+        if last is None or len(page) < page_size:
+            ckpt.update(phase="dated", created_at=None, id="")
+        else:
+            ckpt["id"] = last[0]
+    elif last is not None:
+        ckpt["created_at"] = last[-1].isoformat()
+        ckpt["id"] = last[0]
+
+def rescore(table_name: str, page_size: int, workers: int, chunk_size: int, checkpoint: str | None,
+            dry_run: bool = False) -> dict:
+    spec = TABLES[table_name]
+    t = spec["table"]
+    n_inputs = len(spec["inputs"])
+    scored_cols = (*spec["outputs"], "score")
+    stmt = update(t).where(t.c.id == bindparam("b_id")).values(
+        {c: bindparam(c) for c in scored_cols}
+    )
+
+    ckpt = load_checkpoint(checkpoint, table_name)
+    start = time.perf_counter()
+    rows_done = 0
+    updated = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        page = _fetch_page(spec, ckpt, page_size)
+        while True:
+            if not page:
+                if ckpt["phase"] == "null":
+                    _advance(ckpt, page, page_size)
+                    page = _fetch_page(spec, ckpt, page_size)
+                    continue
+                break
+
+            inputs = [r[:1 + n_inputs] for r in page]
+            chunks = [inputs[i:i + chunk_size] for i in range(0, len(inputs), chunk_size)]
+            futures = [pool.submit(_score_chunk, table_name, chunk) for chunk in chunks]
+
+            # Mentre el pool puntua, llegim la pàgina següent
+            next_ckpt = dict(ckpt)
+            _advance(next_ckpt, page, page_size)
+            next_page = _fetch_page(spec, next_ckpt, page_size)
+
+            new_values = [v for f in futures for v in f.result()]
+            changed = []
+            for row, values in zip(page, new_values):
+                old = row[1 + n_inputs:1 + n_inputs + len(scored_cols)]
+                if any(o != values[c] for o, c in zip(old, scored_cols)):
+                    changed.append(values)
+
+            if changed and not dry_run:
+                with engine.begin() as conn:
+                    conn.execute(stmt, changed)
+
+            rows_done += len(page)
+            updated += len(changed)
+            ckpt = next_ckpt
+            ckpt["rows"] += len(page)
+            ckpt["updated"] += len(changed)
+            if not dry_run:
+                # El dry run no escriu res: si avancés el checkpoint, l'execució real se saltaria aquestes pàgines
+                save_checkpoint(checkpoint, ckpt)
+
+            elapsed = time.perf_counter() - start
+            logger.info(f"{table_name}: {ckpt['rows']} files ({len(changed)} canvis a la pàgina), "
+                        f"{rows_done / elapsed:.0f} files/s")
+            page = next_page
+
+    elapsed = time.perf_counter() - start
+    return {
+        "table": table_name,
+        "rows": rows_done,
+        "updated": updated,
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(rows_done / elapsed, 1) if elapsed else None,
+        "dry_run": dry_run,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcula clarity/focus/writing/score amb l'heurística actual")
+    parser.add_argument("--table", choices=sorted(TABLES), default="okr_submissions")
+    parser.add_argument("--page-size", type=int, default=10_000)
+    parser.add_argument("--chunk-size", type=int, default=1_000, help="files per tasca del pool")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--checkpoint", help="fitxer JSON per reprendre el procés")
+    parser.add_argument("--dry-run", action="store_true", help="puntua però no escriu (ni el checkpoint)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    summary = rescore(args.table, args.page_size, args.workers, args.chunk_size, args.checkpoint, args.dry_run)
+    print(json.dumps(summary))
+
+if __name__ == "__main__":
+    main()
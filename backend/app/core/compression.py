@@ -0,0 +1,74 @@
+"""Compressió de les respostes grans: Brotli si el client l'accepta i el paquet
+`brotli` és instal·lat (dependència opcional), si no gzip.
+
+Només es comprimeixen cossos d'un sol missatge (les respostes JSON) de com a
+mínim COMPRESSION_MIN_BYTES. Les respostes en streaming (SSE) passen intactes:
+comprimides, el compressor les retindria i els esdeveniments no arribarien a temps.
+"""
+import gzip
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+def accepted_encodings(header: str) -> set[str]:
+    """Codificacions d'Accept-Encoding, sense les marcades amb q=0."""
+    out = set()
+    for part in header.lower().split(","):
+        name, _, params = part.partition(";")
+        q = params.replace(" ", "").removeprefix("q=")
+        if q and q.strip("0.") == "":
+            continue
+        out.add(name.strip())
+    return out
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        encoding = "br" if brotli is not None and "br" in accepted else "gzip" if "gzip" in accepted else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message  # s'envia amb el cos, quan ja se sap si es comprimeix
+                return
+            if start is None:
+                await send(message)
+                return
+            initial, start = start, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(scope=initial)
+            if (message.get("more_body", False) or len(body) < self.minimum_size
+                    or "content-encoding" in headers):
+                await send(initial)
+                await send(message)
+                return
+            body = self._compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(initial)
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
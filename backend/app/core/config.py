@@ -6,12 +6,99 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
 
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 10.0
+    DB_POOL_RECYCLE_SECONDS: int = 3600
+    DB_CREATE_ALL: bool = False              # crea les taules a l'arrencada (només dev; a producció, Alembic)
+    DB_PARTITIONED: bool = False             # MySQL: particions mensuals (migració 0005); la cerca no usa FULLTEXT
+    FEEDBACK_COMPRESS_MIN_BYTES: int = 256   # feedback més llarg es desa comprimit (zlib)
+    FEEDBACK_COMPRESS_LEVEL: int = 6
+    STARTUP_WARMUP_TIMEOUT_SECONDS: float = 5.0   # per dependència (BD, Redis, LLM), en segon pla
+    READY_CHECK_TIMEOUT_SECONDS: float = 1.0
+    WRITE_BEHIND_ENABLED: bool = True
+    WRITE_BEHIND_QUEUE_SIZE: int = 10000
+    WRITE_BEHIND_BATCH_SIZE: int = 500
+    WRITE_BEHIND_FLUSH_INTERVAL_SECONDS: float = 0.5
+    WRITE_BEHIND_ENQUEUE_TIMEOUT_SECONDS: float = 2.0
+    WRITE_BEHIND_SHUTDOWN_TIMEOUT_SECONDS: float = 20.0
+    WRITE_BEHIND_SPILL_PATH: str | None = None  # JSONL append-only si MySQL cau
+    WRITE_BEHIND_FK_RETRIES: int = 5          # KR sense objectiu a la BD: reintents abans d'anar al spill
+    WRITE_BEHIND_FK_RETRY_SECONDS: float = 0.5  # es dobla a cada reintent
+    KR_PARENT_WAIT_SECONDS: float = 2.0       # espera que l'objectiu d'un KR arribi a la BD (cua d'un altre worker)
     OPENAI_API_KEY: str
     OPENAI_MODEL: str = "gpt-4o-mini"
+    OPENAI_BASE_URL: str | None = None  # p.ex. un stub local compatible amb OpenAI
+    LLM_TIMEOUT_SECONDS: float = 30.0
+    LLM_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    LLM_MAX_CONCURRENCY: int = 16
+    LLM_MAX_CONNECTIONS: int = 32
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 16
+    LLM_DEADLINE_SECONDS: float = 20.0       # pressupost total per crida (reintents i hedging inclosos)
+    LLM_MAX_RETRIES: int = 2
+    LLM_RETRY_BASE_SECONDS: float = 0.2
+    LLM_RETRY_MAX_SECONDS: float = 2.0
+    LLM_HEDGE_ENABLED: bool = False          # segona petició si la primera supera el percentil
+    LLM_HEDGE_QUANTILE: float = 0.95
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_BREAKER_WINDOW: int = 20             # últimes crides que compten per al circuit breaker
+    LLM_BREAKER_MIN_CALLS: int = 10
+    LLM_BREAKER_FAILURE_RATIO: float = 0.5
+    LLM_BREAKER_RESET_SECONDS: float = 30.0
+    LLM_JSON_MODE: bool = True               # response_format json_object (desactivar si el backend no ho suporta)
+    LLM_MAX_TOKENS_OBJECTIVE: int = 800      # pressupost de resposta per endpoint
+    LLM_MAX_TOKENS_KR: int = 400
+    LOG_FORMAT: str = "text"                 # json: una línia JSON per registre (Loki), amb trace_id
+    LOG_LEVEL: str = "INFO"
+    OTEL_ENABLED: bool = False               # spans OTLP (requereix opentelemetry-sdk; OTEL_EXPORTER_OTLP_ENDPOINT)
+    OTEL_SERVICE_NAME: str = "okr-api"
+    WEB_BIND: str = "0.0.0.0:8000"           # gunicorn.conf.py (producció)
+    WEB_WORKERS: int = 0                     # 0 = un per CPU
+    WEB_TIMEOUT_SECONDS: int = 60
+    WEB_GRACEFUL_TIMEOUT_SECONDS: int = 30
+    WEB_KEEPALIVE_SECONDS: int = 5
+    WEB_MAX_REQUESTS: int = 0                # >0: recicla el worker després de N peticions
     CORS_ORIGINS: str = '["http://localhost:5173"]'  # JSON list
+    COMPRESSION_ENABLED: bool = True         # gzip (o Brotli amb el paquet `brotli`) per a respostes grans
+    COMPRESSION_MIN_BYTES: int = 1024
+    DEBUG_RESPONSES: bool = False            # camps debug_* a totes les respostes (si no, només amb X-Debug: 1)
     REDIS_URL: str | None = None
     RATE_LIMIT_WINDOW_SECONDS: int = 60
     RATE_LIMIT_MAX_REQUESTS: int = 60
+    RATE_LIMIT_ROUTES: str = '{}'       # JSON: {"batch": {"max_requests": 10, "window_seconds": 60}}
+    RATE_LIMIT_API_KEYS: str = '{}'     # JSON: {"<api key>": max_requests}
+    RATE_LIMIT_API_KEY_HEADER: str = "X-API-Key"
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = 0.5
+    IDEMPOTENCY_ENABLED: bool = True         # Idempotency-Key a /evaluate, /kr/evaluate i /evaluate/batch
+    IDEMPOTENCY_TTL_SECONDS: int = 86400     # respostes desades per als reintents
+    IDEMPOTENCY_LOCK_SECONDS: float = 60.0   # lease de la primera (es renova mentre s'executa) i espera màxima d'un reintent
+    IDEMPOTENCY_POLL_SECONDS: float = 0.1    # amb Redis
+    IDEMPOTENCY_MAX_ENTRIES: int = 10000     # en memòria (sense Redis)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL_SECONDS: int = 3600          # tier local (LRU)
+    LLM_CACHE_MAX_ENTRIES: int = 1000
+    LLM_CACHE_MAX_BYTES: int = 8 * 1024 * 1024
+    LLM_CACHE_REDIS_TTL_SECONDS: int = 86400   # tier compartit (Redis)
+    SINGLEFLIGHT_LEASE_SECONDS: float = 60.0     # lease entre workers per a avaluacions idèntiques
+    SINGLEFLIGHT_POLL_SECONDS: float = 0.25
+    SIMILARITY_ENABLED: bool = True          # reutilitza avaluacions d'objectius quasi idèntics
+    SIMILARITY_THRESHOLD: float = 0.75       # Jaccard sobre el conjunt de paraules
+    SIMILARITY_MAX_ENTRIES: int = 20000
+    BATCH_MAX_ITEMS: int = 500               # objectius + KRs per petició
+    BATCH_LLM_CONCURRENCY: int = 8
+    JOB_WORKERS: int = 4                     # treballs asíncrons simultanis per procés
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_VISIBILITY_TIMEOUT_SECONDS: float = 60.0   # sense heartbeat en aquest temps, el treball torna a la cua
+    JOB_RETRY_BASE_SECONDS: float = 2.0      # espera abans de reintentar un treball fallit; es dobla a cada intent
+    JOB_RETRY_MAX_SECONDS: float = 60.0
+    JOB_POLL_SECONDS: float = 0.5
+    JOB_MAX_QUEUED: int = 10000
+    JOB_RESULT_TTL_SECONDS: int = 86400
+    JOB_SHUTDOWN_TIMEOUT_SECONDS: float = 10.0
+    JOB_WEBHOOK_ALLOWED_HOSTS: str = '[]'    # JSON: hosts permesos per als webhooks (buit: cap)
+    JOB_WEBHOOK_SECRET: str | None = None    # signatura HMAC-SHA256 (capçalera X-Signature)
+    JOB_WEBHOOK_TIMEOUT_SECONDS: float = 5.0
 
     def cors_origins_list(self) -> List[str]:
         try:
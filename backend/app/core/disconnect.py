@@ -0,0 +1,25 @@
+import asyncio
+from typing import Awaitable, TypeVar
+from fastapi import Request
+
+T = TypeVar("T")
+
+class ClientDisconnected(Exception):
+    pass
+
+async def cancel_on_disconnect(request: Request, aw: Awaitable[T], poll_interval: float = 0.5) -> T:
+    """Executa `aw` i el cancel·la si el client tanca la connexió abans d'acabar.
+    Evita continuar pagant una crida LLM que ningú no llegirà.
+    """
+    task = asyncio.ensure_future(aw)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
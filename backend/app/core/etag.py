@@ -0,0 +1,12 @@
+import hashlib
+from fastapi import Request, Response
+
+def etag_response(request: Request, body: bytes, media_type: str = "application/json") -> Response:
+    """Resposta amb ETag fort (hash del cos); 304 sense cos si el client ja la té.
+    Els dashboards que fan polling només paguen la consulta, no la transferència."""
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (t.strip().removeprefix("W/") for t in if_none_match.split(",")) or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
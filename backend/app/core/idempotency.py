@@ -0,0 +1,340 @@
+"""Capçalera `Idempotency-Key` a les avaluacions (cada execució desa files i paga el LLM).
+
+Els clients mòbils reintenten quan els venç el timeout. Amb la mateixa clau:
+- La primera petició s'executa i la resposta final (estat, Content-Type, Location i cos)
+  es desa IDEMPOTENCY_TTL_SECONDS: a Redis si hi ha REDIS_URL (compartida entre workers),
+  si no (o si Redis falla) en memòria del procés.
+- Els reintents reben el mateix cos byte a byte, amb `Idempotent-Replayed: true`.
+- Un reintent mentre la primera és en curs n'espera el resultat (fins a
+  IDEMPOTENCY_LOCK_SECONDS; després, 409) en lloc de tornar-la a executar. La primera
+  renova el lease (IDEMPOTENCY_LOCK_SECONDS) mentre s'executa, per llarga que sigui.
+- La primera no es cancel·la si el client es desconnecta: el reintent en trobarà el resultat.
+- La mateixa clau amb un altre cos respon 422. Les respostes 5xx, 408, 409, 429 i 499
+  no es desen: són transitòries i el reintent ha de tornar a executar la petició.
+La clau és per client (API key o IP, com el rate limit) i per ruta.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+import redis
+from fastapi.responses import ORJSONResponse
+from prometheus_client import Counter
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from app.core.config import settings
+from app.core.ratelimit import client_identity
+from app.core.redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_REQUESTS = Counter(
+    "okr_idempotency_requests_total", "Peticions amb Idempotency-Key", ["outcome"]
+)
+
+HEADER = "idempotency-key"
+MAX_KEY_LENGTH = 255
+REDIS_PREFIX = "idem:"
+# Capçaleres de la resposta desada; la resta (RateLimit-*, X-Trace-Id, CORS) són de cada petició
+_STORED_HEADERS = (b"content-type", b"location")
+# Transitòries (a més dels 5xx): timeout, conflicte, rate limit i 499, el client ha
+# tancat la connexió abans que acabés (vegeu app/api/v1/okrs.py)
+_NOT_STORED = {408, 409, 429, 499}
+
+# Compare-and-act (com el lease de okr_service._leased_feedback): només si la clau encara
+# és el lease d'aquesta petició. Si ha vençut i un reintent l'ha agafada, no la toquem.
+# KEYS[1] = clau; ARGV[1] = el registre "running" d'aquesta petició (porta un token únic)
+_EXTEND = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+# També si la clau ha desaparegut (lease vençut i ningú no l'ha agafada): el resultat val
+_COMPLETE = """
+local current = redis.call('get', KEYS[1])
+if current == false or current == ARGV[1] then
+    redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+_RELEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class LocalStore:
+    """Registres en memòria del procés, amb TTL i límit d'entrades.
+    `acquire` retorna el lease (un token) que fan servir `extend`, `complete` i `release`."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._finished: dict[str, asyncio.Event] = {}
+
+    async def get(self, key: str) -> dict | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires, record = item
+        if expires <= time.monotonic():
+            del self._data[key]
+            return None
+        return record
+
+    async def acquire(self, key: str, fingerprint: str, lease: float) -> str | None:
+        if await self.get(key) is not None:
+            return None
+        token = uuid.uuid4().hex
+        self._put(key, {"state": "running", "fp": fingerprint, "token": token}, lease)
+        return token
+
+    def _owns(self, key: str, token: str) -> bool:
+        item = self._data.get(key)
+        return item is not None and item[0] > time.monotonic() and item[1].get("token") == token
+
+    async def extend(self, key: str, token: str, lease: float) -> bool:
+        if not self._owns(key, token):
+            return False
+        self._data[key] = (time.monotonic() + lease, self._data[key][1])
+        return True
+
+    async def complete(self, key: str, token: str, record: dict, ttl: float) -> bool:
+        if await self.get(key) is not None and not self._owns(key, token):
+            return False
+        self._put(key, record, ttl)
+        self._wake(key)
+        return True
+
+    async def release(self, key: str, token: str):
+        if self._owns(key, token):
+            del self._data[key]
+            self._wake(key)
+
+    async def wait(self, key: str, timeout: float):
+        event = self._finished.setdefault(key, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _put(self, key: str, record: dict, ttl: float):
+        self._data[key] = (time.monotonic() + ttl, record)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def _wake(self, key: str):
+        event = self._finished.pop(key, None)
+        if event is not None:
+            event.set()
+
+class RedisStore:
+    """Registres compartits entre workers: SET NX com a lease mentre s'executa. El lease
+    és el registre "running" sencer, amb un token per petició (vegeu _EXTEND)."""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def get(self, key: str) -> dict | None:
+        raw = await self.client.get(REDIS_PREFIX + key)
+        return json.loads(raw) if raw else None
+
+    async def acquire(self, key: str, fingerprint: str, lease: float) -> str | None:
+        running = json.dumps({"state": "running", "fp": fingerprint, "token": uuid.uuid4().hex})
+        if await self.client.set(REDIS_PREFIX + key, running, nx=True, px=int(lease * 1000)):
+            return running
+        return None
+
+    async def extend(self, key: str, token: str, lease: float) -> bool:
+        return bool(await self.client.eval(_EXTEND, 1, REDIS_PREFIX + key, token, int(lease * 1000)))
+
+    async def complete(self, key: str, token: str, record: dict, ttl: float) -> bool:
+        return bool(await self.client.eval(_COMPLETE, 1, REDIS_PREFIX + key, token, json.dumps(record), int(ttl)))
+
+    async def release(self, key: str, token: str):
+        await self.client.eval(_RELEASE, 1, REDIS_PREFIX + key, token)
+
+    async def wait(self, key: str, timeout: float):
+        await asyncio.sleep(max(0.0, min(timeout, settings.IDEMPOTENCY_POLL_SECONDS)))
+
+_local = LocalStore(settings.IDEMPOTENCY_MAX_ENTRIES)
+# Com al rate limit: després d'un error de Redis, uns segons en memòria
+_REDIS_RETRY_SECONDS = 5.0
+_redis_down_until = 0.0
+
+def _store() -> LocalStore | RedisStore:
+    client = get_async_redis()
+    if client is not None and time.monotonic() >= _redis_down_until:
+        return RedisStore(client)
+    return _local
+
+def _redis_failed(e: Exception):
+    global _redis_down_until
+    _redis_down_until = time.monotonic() + _REDIS_RETRY_SECONDS
+    logger.warning(f"⚠️ Redis no disponible para Idempotency-Key, se usa la memoria local: {e}")
+
+def fingerprint(scope, body: bytes) -> str:
+    """El que ha de coincidir entre reintents: query string, X-Debug i cos."""
+    h = hashlib.sha256(scope.get("query_string", b""))
+    h.update(b"\0" + Headers(scope=scope).get("x-debug", "").encode("latin-1") + b"\0")
+    h.update(body)
+    return h.hexdigest()
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+async def _replay(record: dict, send):
+    body = base64.b64decode(record["body"])
+    headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in record["headers"]]
+    headers += [(b"content-length", str(len(body)).encode("latin-1")), (b"idempotent-replayed", b"true")]
+    await send({"type": "http.response.start", "status": record["status"], "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+class IdempotencyMiddleware:
+    """Middleware ASGI per als POST de `paths`; sense capçalera, la petició passa intacta.
+    Va per dins de CORS (les respostes reproduïdes també en porten les capçaleres) i de la compressió
+    (es desa el cos sense comprimir i cada reintent es comprimeix segons el seu Accept-Encoding)."""
+
+    def __init__(self, app, paths: set[str]):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        key = Headers(scope=scope).get(HEADER)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            response = ORJSONResponse({"detail": f"Invalid Idempotency-Key (1-{MAX_KEY_LENGTH} chars)"}, 400)
+            await response(scope, receive, send)
+            return
+
+        body = await _read_body(receive)
+        identity, _ = client_identity(Request(scope))
+        store_key = hashlib.sha256(f"{identity}\0{scope['path']}\0{key}".encode("utf-8")).hexdigest()
+        fp = fingerprint(scope, body)
+        store = _store()
+        try:
+            token, record = await self._claim(store, store_key, fp)
+        except (redis.RedisError, OSError) as e:
+            _redis_failed(e)
+            store = _local
+            token, record = await self._claim(store, store_key, fp)
+
+        if token is not None:
+            IDEMPOTENCY_REQUESTS.labels("executed").inc()
+            await self._execute(store, store_key, token, fp, body, scope, receive, send)
+        elif record["fp"] != fp:
+            IDEMPOTENCY_REQUESTS.labels("mismatch").inc()
+            response = ORJSONResponse({"detail": "Idempotency-Key reused with a different request"}, 422)
+            await response(scope, receive, send)
+        elif record["state"] == "running":
+            IDEMPOTENCY_REQUESTS.labels("in_progress").inc()
+            response = ORJSONResponse({"detail": "Request with this Idempotency-Key still in progress"}, 409,
+                                      headers={"Retry-After": "1"})
+            await response(scope, receive, send)
+        else:
+            IDEMPOTENCY_REQUESTS.labels("replayed").inc()
+            await _replay(record, send)
+
+    async def _claim(self, store, key: str, fp: str) -> tuple[str | None, dict | None]:
+        """(lease, None) si aquesta petició fa la feina; si no, (None, registre existent):
+        acabat, d'una altra petició o encara en curs quan s'ha esgotat l'espera."""
+        lease = settings.IDEMPOTENCY_LOCK_SECONDS
+        deadline = time.monotonic() + lease
+        while True:
+            token = await store.acquire(key, fp, lease)
+            if token is not None:
+                return token, None
+            record = await store.get(key)
+            if record is None:
+                continue  # s'acaba d'alliberar: tornem a provar d'agafar-la
+            if record["state"] == "done" or record["fp"] != fp or time.monotonic() >= deadline:
+                return None, record
+            await store.wait(key, deadline - time.monotonic())
+
+    async def _renew(self, store, key: str, token: str):
+        """Allarga el lease mentre la primera petició s'executa: si no, en venceria
+        i un reintent la tornaria a executar en paral·lel."""
+        lease = settings.IDEMPOTENCY_LOCK_SECONDS
+        while True:
+            await asyncio.sleep(lease / 3)
+            try:
+                if not await store.extend(key, token, lease):
+                    logger.warning("⚠️ Lease de Idempotency-Key perdido: otra petición lo ha tomado")
+                    return
+            except (redis.RedisError, OSError) as e:
+                logger.warning(f"⚠️ No se pudo renovar el lease de Idempotency-Key: {e}")
+
+    async def _execute(self, store, key: str, token: str, fp: str, body: bytes, scope, receive, send):
+        start = None
+        chunks = []
+        body_sent = False
+
+        async def receive_body():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                # No es propaga: la feina continua i el resultat queda desat per al reintent
+                await asyncio.Event().wait()
+            return message
+
+        async def capture(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        stored = False
+        renew = asyncio.create_task(self._renew(store, key, token))
+        try:
+            try:
+                await self.app(scope, receive_body, capture)
+            finally:
+                # Abans de desar: una renovació posterior escurçaria el TTL del resultat
+                renew.cancel()
+                await asyncio.gather(renew, return_exceptions=True)
+            if start is not None and start["status"] < 500 and start["status"] not in _NOT_STORED:
+                record = {
+                    "state": "done", "fp": fp, "status": start["status"],
+                    "headers": [[k.decode("latin-1"), v.decode("latin-1")] for k, v in start["headers"]
+                                if k.lower() in _STORED_HEADERS],
+                    "body": base64.b64encode(b"".join(chunks)).decode("ascii"),
+                }
+                try:
+                    # False si un reintent ja té la clau: el seu resultat és el que queda
+                    await store.complete(key, token, record, settings.IDEMPOTENCY_TTL_SECONDS)
+                    stored = True
+                except (redis.RedisError, OSError) as e:
+                    _redis_failed(e)
+        finally:
+            if not stored:
+                # Error, 5xx o transitòria: el reintent la tornarà a executar
+                try:
+                    await store.release(key, token)
+                except (redis.RedisError, OSError):
+                    pass
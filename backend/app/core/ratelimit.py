@@ -1,40 +1,188 @@
-import time
 import os
+import time
+import json
+import hashlib
+import logging
+from collections import OrderedDict, deque
+from functools import lru_cache
 import redis
 from fastapi import Request, HTTPException
+from starlette.datastructures import MutableHeaders
+from prometheus_client import Counter
 from app.core.config import settings
+from app.core.redis_client import get_async_redis
+from app.core.tracing import stage
 
-_redis_client = None
+logger = logging.getLogger(__name__)
 
-def get_redis():
-    global _redis_client
-    if _redis_client is None and settings.REDIS_URL:
-        _redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
-    return _redis_client
+RATE_LIMIT_DECISIONS = Counter(
+    "okr_rate_limit_decisions_total", "Decisions del rate limiter", ["scope", "outcome", "backend"]
+)
 
-async def rate_limit(request: Request):
-    """Very simple IP-based sliding window limiter via Redis.
-    Uses RATE_LIMIT_MAX_REQUESTS per RATE_LIMIT_WINDOW_SECONDS.
-    Attach as dependency to sensitive routes.
-    """
-    if not settings.REDIS_URL:
-        return  # disabled
+# Finestra lliscant (log de timestamps en un ZSET), atòmica: neteja, compta i
+# registra la petició en un sol round trip. La clau sempre queda amb TTL.
+# KEYS[1] = clau; ARGV = ara_ms, finestra_ms, límit, membre únic
+# Retorna {permès (0/1), restants, ms fins que s'allibera una plaça}
+_SLIDING_WINDOW = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+local count = redis.call('ZCARD', key)
+if count < limit then
+  redis.call('ZADD', key, now, ARGV[4])
+  redis.call('PEXPIRE', key, window)
+  local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+  return {1, limit - count - 1, tonumber(oldest[2]) + window - now}
+end
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+return {0, 0, tonumber(oldest[2]) + window - now}
+"""
 
-    client = get_redis()
-    if client is None:
-        return
+class LocalSlidingWindow:
+    """Mateix algorisme en memòria del procés. S'usa quan Redis no respon:
+    el límit passa a ser per worker en lloc de global, però no queda obert."""
 
-    window = int(settings.RATE_LIMIT_WINDOW_SECONDS or 60)
-    max_req = int(settings.RATE_LIMIT_MAX_REQUESTS or 60)
+    def __init__(self, max_keys: int = 10_000):
+        self.max_keys = max_keys
+        self._hits: OrderedDict[str, deque] = OrderedDict()
 
-    ip = request.client.host if request.client else "unknown"
-    key = f"rl:{ip}:{int(time.time()//window)}"
+    def hit(self, key: str, now_ms: int, window_ms: int, limit: int) -> tuple[bool, int, int]:
+        hits = self._hits.get(key)
+        if hits is None:
+            hits = self._hits[key] = deque()
+            if len(self._hits) > self.max_keys:
+                self._hits.popitem(last=False)
+        else:
+            self._hits.move_to_end(key)
+        while hits and hits[0] <= now_ms - window_ms:
+            hits.popleft()
+        if len(hits) < limit:
+            hits.append(now_ms)
+            return True, limit - len(hits), hits[0] + window_ms - now_ms
+        return False, 0, hits[0] + window_ms - now_ms
+
+_local = LocalSlidingWindow()
+# Després d'un error de Redis no s'hi torna a provar durant uns segons
+# (evita pagar el timeout de connexió a cada petició)
+_REDIS_RETRY_SECONDS = 5.0
+_redis_down_until = 0.0
+_scripts: dict[int, object] = {}
+
+def _sliding_window_script(client):
+    # EVALSHA (redis-py torna a carregar l'script si Redis respon NOSCRIPT)
+    script = _scripts.get(id(client))
+    if script is None:
+        _scripts.clear()
+        script = _scripts[id(client)] = client.register_script(_SLIDING_WINDOW)
+    return script
+
+@lru_cache(maxsize=8)
+def _json_setting(raw: str, name: str) -> dict:
     try:
-        current = client.incr(key)
-        if current == 1:
-            client.expire(key, window)
-        if current > max_req:
-            raise HTTPException(status_code=429, detail="Rate limit exceeded. Try again later.")
-    except redis.RedisError:
-        # fail open
-        return
+        return json.loads(raw) if raw else {}
+    except Exception:
+        logger.error(f"❌ {name} no es un JSON válido; se ignora")
+        return {}
+
+def client_identity(request: Request) -> tuple[str, str | None]:
+    """Identitat a limitar: l'API key (hash) si és a RATE_LIMIT_API_KEYS, si no la IP.
+    Una clau desconeguda compta com la IP: si no, cada valor inventat tindria un límit nou."""
+    api_key = request.headers.get(settings.RATE_LIMIT_API_KEY_HEADER)
+    if api_key and api_key in _json_setting(settings.RATE_LIMIT_API_KEYS, "RATE_LIMIT_API_KEYS"):
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:32], api_key
+    ip = request.client.host if request.client else "unknown"
+    return f"ip:{ip}", None
+
+class RateLimiter:
+    """Dependència FastAPI de rate limit amb finestra lliscant.
+
+    - Límits per ruta (`scope`: evaluate, stream, kr, batch, read): RATE_LIMIT_ROUTES =
+      {"batch": {"max_requests": 10, "window_seconds": 60}} i, si no hi és,
+      RATE_LIMIT_MAX_REQUESTS / RATE_LIMIT_WINDOW_SECONDS. Cada scope té el seu comptador.
+    - Límits per API key: RATE_LIMIT_API_KEYS = {"<key>": max_requests} (mateixa finestra).
+    - Afegeix capçaleres RateLimit-Limit/Remaining/Reset i Retry-After (429).
+    - Sense REDIS_URL queda desactivat; si Redis falla, limita en memòria del procés.
+    """
+
+    def __init__(self, scope: str = "default"):
+        self.scope = scope
+
+    def limits(self, api_key: str | None) -> tuple[int, int]:
+        route = _json_setting(settings.RATE_LIMIT_ROUTES, "RATE_LIMIT_ROUTES").get(self.scope, {})
+        window = int(route.get("window_seconds", settings.RATE_LIMIT_WINDOW_SECONDS) or 60)
+        max_req = int(route.get("max_requests", settings.RATE_LIMIT_MAX_REQUESTS) or 60)
+        if api_key is not None:
+            per_key = _json_setting(settings.RATE_LIMIT_API_KEYS, "RATE_LIMIT_API_KEYS")
+            if api_key in per_key:
+                max_req = int(per_key[api_key])
+        return max_req, window
+
+    async def _hit(self, key: str, now_ms: int, window_ms: int, limit: int) -> tuple[bool, int, int, str]:
+        global _redis_down_until
+        client = get_async_redis()
+        if client is not None and time.monotonic() >= _redis_down_until:
+            try:
+                allowed, remaining, reset_ms = await _sliding_window_script(client)(
+                    keys=[key], args=[now_ms, window_ms, limit, f"{now_ms}-{os.urandom(6).hex()}"]
+                )
+                return bool(allowed), int(remaining), int(reset_ms), "redis"
+            except (redis.RedisError, OSError) as e:
+                _redis_down_until = time.monotonic() + _REDIS_RETRY_SECONDS
+                logger.warning(f"⚠️ Redis no disponible para rate limit, se usa el límite local: {e}")
+        allowed, remaining, reset_ms = _local.hit(key, now_ms, window_ms, limit)
+        return allowed, remaining, reset_ms, "local"
+
+    async def __call__(self, request: Request):
+        if not settings.REDIS_URL:
+            return  # desactivat
+        identity, api_key = client_identity(request)
+        max_req, window = self.limits(api_key)
+        key = f"rl:{self.scope}:{identity}"
+        with stage("rate_limit"):
+            allowed, remaining, reset_ms, backend = await self._hit(
+                key, int(time.time() * 1000), window * 1000, max_req
+            )
+        reset = max(1, -(-reset_ms // 1000))  # segons, arrodonit amunt
+        headers = {
+            "RateLimit-Limit": str(max_req),
+            "RateLimit-Remaining": str(remaining),
+            "RateLimit-Reset": str(reset),
+        }
+        RATE_LIMIT_DECISIONS.labels(self.scope, "allowed" if allowed else "limited", backend).inc()
+        if not allowed:
+            raise HTTPException(
+                status_code=429,
+                detail="Rate limit exceeded. Try again later.",
+                headers={**headers, "Retry-After": str(reset)},
+            )
+        # Les capçaleres del `Response` de la dependència es perden quan l'endpoint
+        # retorna la seva pròpia resposta (202, 304, ORJSONResponse...): les
+        # afegeix RateLimitHeadersMiddleware a la resposta que surti de debò
+        request.state.rate_limit_headers = headers
+
+class RateLimitHeadersMiddleware:
+    """Afegeix a la resposta les capçaleres RateLimit-* que ha deixat el limitador.
+
+    ASGI pur (sense BaseHTTPMiddleware): l'estat de la petició viu a scope["state"],
+    el mateix diccionari que veu la dependència, i no es trenca el streaming (SSE).
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.REDIS_URL:
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                extra = scope.get("state", {}).get("rate_limit_headers")
+                if extra:
+                    headers = MutableHeaders(scope=message)
+                    for name, value in extra.items():
+                        if name not in headers:  # el 429 ja les porta
+                            headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
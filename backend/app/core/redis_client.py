@@ -0,0 +1,23 @@
+import redis.asyncio as aioredis
+from app.core.config import settings
+
+_async_client: aioredis.Redis | None = None
+
+def get_async_redis() -> aioredis.Redis | None:
+    """Client redis.asyncio compartit (pool de connexions); None si REDIS_URL no està definit."""
+    global _async_client
+    if _async_client is None and settings.REDIS_URL:
+        _async_client = aioredis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+        )
+    return _async_client
+
+async def close_async_redis():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+    _async_client = None
@@ -0,0 +1,102 @@
+"""Escalfament a l'arrencada i readiness.
+
+Importar l'app no fa cap I/O. Al lifespan, `start_warmup()` llança en segon pla,
+en paral·lel i cadascun amb STARTUP_WARMUP_TIMEOUT_SECONDS:
+- BD: obre una connexió del pool
+- Redis: PING (si hi ha REDIS_URL)
+- LLM: importa el client i obre la connexió HTTP amb l'API del model
+Un error o un timeout no aturen el procés: es registra i `/ready` el reporta.
+`/health` només diu que el procés viu; `/ready` diu si pot servir trànsit.
+"""
+import asyncio
+import importlib
+import logging
+import time
+from prometheus_client import Gauge
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.redis_client import get_async_redis
+from app.db.session import async_engine
+
+logger = logging.getLogger(__name__)
+
+STARTUP_WARMUP_SECONDS = Gauge("okr_startup_warmup_seconds", "Durada de l'escalfament a l'arrencada",
+                               multiprocess_mode="livemax")
+
+_warmup_task: asyncio.Task | None = None
+_warmup: dict[str, str] = {}
+
+async def create_tables():
+    """Només dev (DB_CREATE_ALL): en producció l'esquema el porta Alembic."""
+    from app.db.models import Base
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+async def _ping_db(timeout: float):
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+async def _ping_redis(timeout: float):
+    await get_async_redis().ping()
+
+async def _warm_llm(timeout: float):
+    # Importar openai costa centenars de ms de CPU: en un fil, el bucle continua servint
+    await asyncio.to_thread(importlib.import_module, "openai")
+    from app.services.ai_service import warm_client
+    await warm_client(timeout)
+
+async def _check(fn, timeout: float) -> str:
+    try:
+        await asyncio.wait_for(fn(timeout), timeout)
+        return "ok"
+    except asyncio.TimeoutError:
+        return "timeout"
+    except Exception as e:
+        return f"error: {type(e).__name__}"
+
+async def warmup() -> dict[str, str]:
+    start = time.perf_counter()
+    timeout = settings.STARTUP_WARMUP_TIMEOUT_SECONDS
+    checks = {"db": _ping_db, "llm": _warm_llm}
+    if settings.REDIS_URL:
+        checks["redis"] = _ping_redis
+    results = await asyncio.gather(*(_check(fn, timeout) for fn in checks.values()))
+    _warmup.update(zip(checks, results))
+    elapsed = time.perf_counter() - start
+    STARTUP_WARMUP_SECONDS.set(elapsed)
+    failed = {k: v for k, v in _warmup.items() if v != "ok"}
+    if failed:
+        logger.warning(f"⚠️ Arranque: calentamiento incompleto en {elapsed * 1000:.0f} ms: {failed}")
+    else:
+        logger.info(f"🔥 Arranque: BD, Redis y LLM listos en {elapsed * 1000:.0f} ms")
+    return dict(_warmup)
+
+def start_warmup():
+    global _warmup_task
+    if _warmup_task is None:
+        _warmup.clear()
+        _warmup_task = asyncio.create_task(warmup(), name="startup-warmup")
+
+async def stop_warmup():
+    global _warmup_task
+    if _warmup_task is not None and not _warmup_task.done():
+        _warmup_task.cancel()
+        try:
+            await _warmup_task
+        except asyncio.CancelledError:
+            pass
+    _warmup_task = None
+
+async def readiness() -> tuple[bool, dict]:
+    """(ready, detall). Cal haver acabat l'escalfament i que la BD respongui ara;
+    Redis i el LLM són degradables (límit local, resposta heurística)."""
+    if _warmup_task is None or not _warmup_task.done():
+        return False, {"status": "starting"}
+    timeout = settings.READY_CHECK_TIMEOUT_SECONDS
+    checks = {"db": await _check(_ping_db, timeout), "llm": _warmup.get("llm", "skipped")}
+    if settings.REDIS_URL:
+        checks["redis"] = await _check(_ping_redis, timeout)
+    if checks["db"] != "ok":
+        return False, {"status": "unavailable", "checks": checks}
+    degraded = any(v != "ok" for v in checks.values())
+    return True, {"status": "degraded" if degraded else "ok", "checks": checks}
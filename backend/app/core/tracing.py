@@ -0,0 +1,165 @@
+"""Traces i desglossament de latència per etapes.
+
+- `stage(nom, model=...)`: mesura una etapa del camí calent a l'histograma
+  okr_stage_seconds{stage, model} i, si OpenTelemetry és instal·lat i OTEL_ENABLED,
+  n'obre un span fill del span de la petició (exportat per OTLP).
+- trace_id per petició (contextvar): el del span d'OTel si n'hi ha; si no, el de la
+  capçalera W3C `traceparent` entrant o un de nou. Es retorna a `X-Trace-Id` i
+  s'afegeix a cada línia de log (JSON amb LOG_FORMAT=json) perquè Loki el pugui filtrar.
+"""
+import json
+import logging
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from prometheus_client import Histogram
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+STAGE_SECONDS = Histogram(
+    "okr_stage_seconds", "Durada de cada etapa del camí calent", ["stage", "model"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+_trace_id: ContextVar[str | None] = ContextVar("trace_id", default=None)
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-[0-9a-f]{16}-[0-9a-f]{2}$")
+
+_tracer = None
+
+def setup_otel():
+    """Activa OpenTelemetry si OTEL_ENABLED i el paquet hi és (dependència opcional)."""
+    global _tracer
+    if not settings.OTEL_ENABLED or _tracer is not None:
+        return
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        logger.warning("⚠️ OTEL_ENABLED pero opentelemetry-sdk no está instalado; solo métricas")
+        return
+    provider = TracerProvider(resource=Resource.create({"service.name": settings.OTEL_SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))  # OTEL_EXPORTER_OTLP_ENDPOINT
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("okr-api")
+
+def current_trace_id() -> str | None:
+    return _trace_id.get()
+
+@contextmanager
+def stage(name: str, model: str = ""):
+    """Temps de l'etapa a okr_stage_seconds (i span d'OTel si està actiu)."""
+    start = time.perf_counter()
+    try:
+        if _tracer is None:
+            yield
+        else:
+            attributes = {"okr.stage": name, **({"llm.model": model} if model else {})}
+            with _tracer.start_as_current_span(name, attributes=attributes):
+                yield
+    finally:
+        STAGE_SECONDS.labels(stage=name, model=model).observe(time.perf_counter() - start)
+
+@contextmanager
+def new_trace(name: str):
+    """Traça pròpia per a feina en segon pla (p.ex. un treball asíncron)."""
+    if _tracer is None:
+        token = _trace_id.set(uuid.uuid4().hex)
+        try:
+            yield
+        finally:
+            _trace_id.reset(token)
+        return
+    with _tracer.start_as_current_span(name) as span:
+        token = _trace_id.set(format(span.get_span_context().trace_id, "032x"))
+        try:
+            yield
+        finally:
+            _trace_id.reset(token)
+
+class TraceMiddleware:
+    """Middleware ASGI: trace_id per petició, span arrel (amb OTel) i capçalera X-Trace-Id."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]
+                   if k in (b"traceparent", b"tracestate")}
+
+        if _tracer is None:
+            match = _TRACEPARENT.match(headers.get("traceparent", ""))
+            token = _trace_id.set(match.group(1) if match else uuid.uuid4().hex)
+            try:
+                await self.app(scope, receive, self._send_with_trace_id(send))
+            finally:
+                _trace_id.reset(token)
+            return
+
+        from opentelemetry import propagate
+        from opentelemetry.trace import SpanKind
+        with _tracer.start_as_current_span(scope["method"], context=propagate.extract(headers),
+                                           kind=SpanKind.SERVER) as span:
+            token = _trace_id.set(format(span.get_span_context().trace_id, "032x"))
+            try:
+                await self.app(scope, receive, self._send_with_trace_id(send, span))
+            finally:
+                _trace_id.reset(token)
+                # Nom del span amb la plantilla de la ruta (no el path: cardinalitat)
+                route = scope.get("route")
+                span.update_name(f"{scope['method']} {getattr(route, 'path', scope['path'])}")
+
+    @staticmethod
+    def _send_with_trace_id(send, span=None):
+        async def wrapped(message):
+            if message["type"] == "http.response.start":
+                trace_id = _trace_id.get()
+                if trace_id:
+                    message["headers"] = [*message.get("headers", []), (b"x-trace-id", trace_id.encode("latin-1"))]
+                if span is not None:
+                    span.set_attribute("http.status_code", message["status"])
+            await send(message)
+        return wrapped
+
+# --- Logs
+
+class TraceIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = _trace_id.get() or ""
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """Una línia JSON per registre (la llegeix el pipeline de Promtail)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "trace_id": getattr(record, "trace_id", "") or None,
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+def configure_logging():
+    """Handler del logger arrel amb trace_id: JSON (LOG_FORMAT=json) o text."""
+    handler = logging.StreamHandler()
+    handler.addFilter(TraceIdFilter())
+    if settings.LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(trace_id)s] %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(settings.LOG_LEVEL)
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # una línia per crida LLM
@@ -1,25 +1,72 @@
+import zlib
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import String, Text, DateTime, ForeignKey, Float, func
-from sqlalchemy.dialects.mysql import LONGTEXT
-from datetime import datetime
+from sqlalchemy import String, Text, DateTime, Date, ForeignKey, Float, Integer, Index, LargeBinary, TypeDecorator, func
+from sqlalchemy.dialects.mysql import LONGBLOB
+from datetime import datetime, date
+from app.core.config import settings
 
 class Base(DeclarativeBase):
     pass
 
+# Prefix dels valors comprimits: el feedback en text no comença mai amb un byte nul
+_ZLIB = b"\x00z"
+
+class CompressedText(TypeDecorator):
+    """Text desat com a bytes (LONGBLOB a MySQL, migració 0004), comprimit amb zlib
+    a partir de FEEDBACK_COMPRESS_MIN_BYTES. La lectura és transparent: descomprimeix
+    els valors amb prefix i retorna tal qual el text anterior a la migració."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "mysql":
+            return dialect.type_descriptor(LONGBLOB())
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        raw = value.encode("utf-8")
+        if len(raw) < settings.FEEDBACK_COMPRESS_MIN_BYTES:
+            return raw
+        packed = _ZLIB + zlib.compress(raw, settings.FEEDBACK_COMPRESS_LEVEL)
+        return packed if len(packed) < len(raw) else raw
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, str):
+            return value
+        value = bytes(value)
+        if value.startswith(_ZLIB):
+            value = zlib.decompress(value[len(_ZLIB):])
+        return value.decode("utf-8")
+
 class OkrSubmission(Base):
     __tablename__ = "okr_submissions"
+    # Cerca (app/services/search.py): FULLTEXT només a MySQL (migració 0003).
+    # Amb DB_PARTITIONED (migració 0005) la PK és (id, created_at) i no hi ha FULLTEXT ni FK.
+    __table_args__ = (
+        Index("ix_okr_submissions_objective_ft", "objective", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
     id: Mapped[str] = mapped_column(String(36), primary_key=True)
     objective: Mapped[str] = mapped_column(Text)
     clarity: Mapped[float] = mapped_column(Float)
     focus: Mapped[float] = mapped_column(Float)
     writing: Mapped[float] = mapped_column(Float)
     score: Mapped[float] = mapped_column(Float)
-    feedback: Mapped[str] = mapped_column(LONGTEXT)
+    # Puntuació del model, la del llindar de can_add_krs (NULL a les files anteriors a 0006)
+    overall_score: Mapped[float | None] = mapped_column(Float, nullable=True)
+    feedback: Mapped[str] = mapped_column(CompressedText)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
-    key_results: Mapped[list["KeyResult"]] = relationship(back_populates="okr", cascade="all, delete")
+    key_results: Mapped[list["KeyResult"]] = relationship(
+        back_populates="okr", cascade="all, delete", order_by="KeyResult.created_at"
+    )
 
 class KeyResult(Base):
     __tablename__ = "key_results"
+    __table_args__ = (
+        Index("ix_key_results_kr_definition_ft", "kr_definition", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
     id: Mapped[str] = mapped_column(String(36), primary_key=True)
     okr_id: Mapped[str] = mapped_column(ForeignKey("okr_submissions.id", ondelete="CASCADE"), index=True)
     kr_definition: Mapped[str] = mapped_column(Text)
@@ -29,6 +76,26 @@ class KeyResult(Base):
     measurability: Mapped[float] = mapped_column(Float)
     feasibility: Mapped[float] = mapped_column(Float)
     score: Mapped[float] = mapped_column(Float)
-    feedback: Mapped[str] = mapped_column(LONGTEXT)
+    feedback: Mapped[str] = mapped_column(CompressedText)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
     okr: Mapped[OkrSubmission] = relationship(back_populates="key_results")
+
+class ScoreRollupDaily(Base):
+    """Agregats diaris per a /okrs/stats, actualitzats a cada escriptura (app/services/analytics.py).
+    hist_N compta els scores dins [N, N+1); hist_9 inclou el 10."""
+    __tablename__ = "score_rollups_daily"
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    kind: Mapped[str] = mapped_column(String(16), primary_key=True)  # objective | key_result
+    count: Mapped[int] = mapped_column(Integer, default=0)
+    passed: Mapped[int] = mapped_column(Integer, default=0)
+    score_sum: Mapped[float] = mapped_column(Float, default=0.0)
+    score_sq_sum: Mapped[float] = mapped_column(Float, default=0.0)
+    hist_1: Mapped[int] = mapped_column(Integer, default=0)
+    hist_2: Mapped[int] = mapped_column(Integer, default=0)
+    hist_3: Mapped[int] = mapped_column(Integer, default=0)
+    hist_4: Mapped[int] = mapped_column(Integer, default=0)
+    hist_5: Mapped[int] = mapped_column(Integer, default=0)
+    hist_6: Mapped[int] = mapped_column(Integer, default=0)
+    hist_7: Mapped[int] = mapped_column(Integer, default=0)
+    hist_8: Mapped[int] = mapped_column(Integer, default=0)
+    hist_9: Mapped[int] = mapped_column(Integer, default=0)
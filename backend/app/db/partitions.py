@@ -0,0 +1,70 @@
+"""Particions mensuals (MySQL, RANGE COLUMNS sobre created_at) d'okr_submissions i key_results.
+
+Cada partició `pYYYYMM` conté les files d'aquell mes (la primera, també les anteriors)
+i `pmax` les posteriors a l'última. La crea la migració 0005 i les manté `app.cli.archive`:
+afegeix els mesos següents partint `pmax` i esborra els antics amb DROP PARTITION.
+"""
+from datetime import date
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+PARTITIONED_TABLES = ("okr_submissions", "key_results")
+
+def month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+def add_months(d: date, n: int) -> date:
+    y, m = divmod(d.year * 12 + d.month - 1 + n, 12)
+    return date(y, m + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"p{month:%Y%m}"
+
+def partition_clause(month: date) -> str:
+    """Partició del mes `month`: files amb created_at anterior al mes següent."""
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN ('{add_months(month, 1):%Y-%m-%d}')"
+
+def partition_ddl(first: date, last: date) -> str:
+    months = []
+    month = month_start(first)
+    while month <= last:
+        months.append(partition_clause(month))
+        month = add_months(month, 1)
+    months.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+    return f"PARTITION BY RANGE COLUMNS(created_at) ({', '.join(months)})"
+
+def partitions(conn: Connection, table: str) -> dict[str, date | None]:
+    """Particions de la taula: nom -> límit superior (None per a pmax). Buit si no n'hi ha."""
+    rows = conn.execute(text(
+        "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION"
+    ), {"table": table})
+    out = {}
+    for name, description in rows:
+        bound = description.strip("'")
+        out[name] = None if bound == "MAXVALUE" else date.fromisoformat(bound[:10])
+    return out
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    return conn.dialect.name == "mysql" and bool(partitions(conn, table))
+
+def ensure_partitions(conn: Connection, table: str, until: date) -> list[str]:
+    """Crea les particions mensuals que faltin fins al mes `until` (inclòs) partint pmax."""
+    bounds = [b for b in partitions(conn, table).values() if b is not None]
+    month = max(bounds) if bounds else month_start(until)
+    new = []
+    while month <= until:
+        new.append(month)
+        month = add_months(month, 1)
+    if new:
+        clauses = ", ".join([*(partition_clause(m) for m in new), "PARTITION pmax VALUES LESS THAN (MAXVALUE)"])
+        conn.execute(text(f"ALTER TABLE {table} REORGANIZE PARTITION pmax INTO ({clauses})"))
+    return [partition_name(m) for m in new]
+
+def drop_partitions(conn: Connection, table: str, before: date) -> list[str]:
+    """Esborra les particions amb totes les files anteriors a `before`."""
+    names = [name for name, bound in partitions(conn, table).items() if bound is not None and bound <= before]
+    if names:
+        conn.execute(text(f"ALTER TABLE {table} DROP PARTITION {', '.join(names)}"))
+    return names
@@ -1,6 +1,38 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from app.core.config import settings
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, pool_recycle=3600)
+def async_database_url(url: str) -> str:
+    """Tradueix DATABASE_URL al driver asíncron equivalent (asyncmy / aiosqlite)."""
+    scheme, sep, rest = url.partition("://")
+    driver = {
+        "mysql": "mysql+asyncmy",
+        "mysql+mysqldb": "mysql+asyncmy",
+        "mysql+pymysql": "mysql+asyncmy",
+        "sqlite": "sqlite+aiosqlite",
+        "sqlite+pysqlite": "sqlite+aiosqlite",
+    }.get(scheme, scheme)
+    return f"{driver}{sep}{rest}"
+
+def _pool_options(url: str) -> dict:
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    }
+
+# Engine síncron: Alembic, scripts i CLI
+engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, **_pool_options(settings.DATABASE_URL))
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+# Engine asíncron: tota la persistència des de l'API
+async_engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL),
+    pool_pre_ping=True,
+    **_pool_options(settings.DATABASE_URL),
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
@@ -0,0 +1,294 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from prometheus_client import Counter, Gauge
+from sqlalchemy import insert, DateTime
+from sqlalchemy.exc import IntegrityError, OperationalError, InterfaceError
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.db.models import Base, OkrSubmission, KeyResult
+from app.services.analytics import apply_rollups
+from app.core.tracing import stage
+
+try:
+    import fcntl
+except ImportError:  # Windows (dev): un sol procés, sense bloqueig
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_QUEUE_DEPTH = Gauge("okr_write_behind_queue_depth", "Files pendents d'escriure a BD",
+                                 multiprocess_mode="livesum")  # una cua per worker
+WRITE_BEHIND_ROWS = Counter("okr_write_behind_rows_total", "Files processades pel write-behind", ["outcome"])
+
+# Ordre d'inserció dins d'un lot: primer els pares (FK de key_results)
+_MODELS = [OkrSubmission, KeyResult]
+_BY_TABLE = {m.__tablename__: m for m in _MODELS}
+
+def _encode(row: dict) -> dict:
+    return {k: v.isoformat() if isinstance(v, datetime) else v for k, v in row.items()}
+
+def _missing_parent(e: Exception) -> bool:
+    """FK de key_results sense l'objectiu: pot ser a la cua d'un altre worker o al spill,
+    no és una fila dolenta (MySQL 1452, SQLite «FOREIGN KEY constraint failed»)."""
+    return isinstance(e, IntegrityError) and "foreign key" in str(e.orig).lower()
+
+def _decode(model: type[Base], row: dict) -> dict:
+    out = dict(row)
+    for col in model.__table__.columns:
+        if isinstance(col.type, DateTime) and isinstance(out.get(col.key), str):
+            out[col.key] = datetime.fromisoformat(out[col.key])
+    return out
+
+@contextmanager
+def _file_lock(path: str, blocking: bool = True):
+    """flock exclusiu sobre `path` (entre workers de gunicorn). Amb blocking=False,
+    retorna False si un altre procés el té."""
+    with open(path, "a") as f:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+class WriteBehindWriter:
+    """Cua acotada en procés que escriu a BD en segon pla amb INSERTs multi-fila.
+
+    - `submit()` només encua: la resposta HTTP no espera la BD.
+    - Si la cua és plena, `submit()` espera (backpressure) fins a
+      WRITE_BEHIND_ENQUEUE_TIMEOUT_SECONDS i després bolca la fila al fitxer de spill.
+    - Si MySQL no respon, el lot sencer va al fitxer de spill (JSONL append-only),
+      que es torna a inserir al proper arrencada.
+    - Un KR l'objectiu del qual encara no és a la BD (a la cua d'un altre worker o al
+      spill) es reintenta WRITE_BEHIND_FK_RETRIES cops amb backoff i després va al spill:
+      no es descarta mai.
+    """
+
+    def __init__(self):
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._pending: set[str] = set()          # objectius encuats que encara no s'han escrit
+        self._deferred: set[asyncio.Task] = set()  # KRs esperant el seu objectiu
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=settings.WRITE_BEHIND_QUEUE_SIZE)
+        await self.replay_spill()
+        self._task = asyncio.create_task(self._run(), name="write-behind")
+
+    async def stop(self):
+        """Buida la cua (graceful shutdown) i atura el worker."""
+        if not self.running:
+            return
+        await self._queue.put(None)
+        try:
+            await asyncio.wait_for(self._task, timeout=settings.WRITE_BEHIND_SHUTDOWN_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            pending = []
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not None:
+                    pending.append(item)
+            self._spill(pending)
+        self._task = None
+        # Els KRs que esperaven el seu objectiu van al spill (es reprodueixen en arrencar)
+        for task in list(self._deferred):
+            task.cancel()
+        await asyncio.gather(*self._deferred, return_exceptions=True)
+
+    def has_pending(self, okr_id: str) -> bool:
+        """L'objectiu és a la cua d'aquest procés (encara no a la BD)."""
+        return okr_id in self._pending
+
+    def spilled(self, table: str, row_id: str) -> bool:
+        """La fila és al fitxer de spill (compartit entre workers), pendent de reproduir."""
+        path = settings.WRITE_BEHIND_SPILL_PATH
+        if not path:
+            return False
+        needle = json.dumps(row_id)
+        for candidate in (path, f"{path}.replaying"):
+            try:
+                with open(candidate, encoding="utf-8") as f:
+                    for line in f:
+                        if needle in line:
+                            entry = json.loads(line)
+                            if entry["table"] == table and entry["row"].get("id") == row_id:
+                                return True
+            except FileNotFoundError:
+                continue
+        return False
+
+    async def submit(self, model: type[Base], row: dict):
+        if not settings.WRITE_BEHIND_ENABLED or not self.running:
+            await self._flush([(model, row)])
+            return
+        if model is OkrSubmission:
+            self._pending.add(row["id"])
+        try:
+            await asyncio.wait_for(self._queue.put((model, row)), timeout=settings.WRITE_BEHIND_ENQUEUE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ Cola write-behind llena; la fila va al fichero de spill")
+            self._spill([(model, row)])
+            self._pending.discard(row["id"])
+            return
+        WRITE_BEHIND_QUEUE_DEPTH.set(self._queue.qsize())
+
+    async def _run(self):
+        batch_size = max(1, settings.WRITE_BEHIND_BATCH_SIZE)
+        interval = settings.WRITE_BEHIND_FLUSH_INTERVAL_SECONDS
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + interval
+            while len(batch) < batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            WRITE_BEHIND_QUEUE_DEPTH.set(self._queue.qsize())
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[tuple[type[Base], dict]], attempt: int = 0):
+        try:
+            await self._write(batch, attempt)
+        finally:
+            # Escrits, al spill o descartats: ja no són a la cua
+            self._pending.difference_update(row["id"] for model, row in batch if model is OkrSubmission)
+
+    async def _write(self, batch: list[tuple[type[Base], dict]], attempt: int):
+        grouped = {m: [row for model, row in batch if model is m] for m in _MODELS}
+        try:
+            with stage("db_commit"):
+                async with AsyncSessionLocal() as db:
+                    for model, rows in grouped.items():
+                        if rows:
+                            await db.execute(insert(model), rows)
+                    await apply_rollups(db, grouped)
+                    await db.commit()
+            WRITE_BEHIND_ROWS.labels(outcome="written").inc(len(batch))
+            logger.info(f"💾 Write-behind: {len(batch)} filas guardadas en BD")
+        except (OperationalError, InterfaceError, OSError) as e:
+            logger.error(f"❌ BD no disponible, {len(batch)} filas al fichero de spill: {e}")
+            self._spill(batch)
+        except Exception as e:
+            # Una fila dolenta (p.ex. duplicada) o sense pare no ha de fer perdre tot el lot
+            logger.error(f"❌ Error guardando lote en BD, reintento fila a fila: {e}")
+            await self._flush_one_by_one(batch, attempt)
+
+    async def _flush_one_by_one(self, batch: list[tuple[type[Base], dict]], attempt: int):
+        orphans = []
+        for model, row in sorted(batch, key=lambda item: _MODELS.index(item[0])):
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(insert(model), [row])
+                    await apply_rollups(db, {model: [row]})
+                    await db.commit()
+                WRITE_BEHIND_ROWS.labels(outcome="written").inc()
+            except (OperationalError, InterfaceError, OSError):
+                self._spill([(model, row)])
+            except Exception as e:
+                if _missing_parent(e):
+                    orphans.append((model, row))
+                    continue
+                logger.error(f"❌ Fila descartada ({model.__tablename__} {row.get('id')}): {e}")
+                WRITE_BEHIND_ROWS.labels(outcome="dropped").inc()
+        if orphans:
+            self._defer(orphans, attempt)
+
+    def _defer(self, batch: list[tuple[type[Base], dict]], attempt: int):
+        """Torna a provar més tard els KRs sense objectiu a la BD; esgotats els intents
+        (o fora del bucle del writer, p.ex. reproduint el spill), al spill."""
+        if attempt >= settings.WRITE_BEHIND_FK_RETRIES or not self.running:
+            logger.warning(f"⚠️ {len(batch)} KRs sin su objetivo en BD; al fichero de spill")
+            self._spill(batch)
+            return
+        WRITE_BEHIND_ROWS.labels(outcome="deferred").inc(len(batch))
+        task = asyncio.create_task(self._retry(batch, attempt + 1))
+        self._deferred.add(task)
+        task.add_done_callback(self._deferred.discard)
+
+    async def _retry(self, batch: list[tuple[type[Base], dict]], attempt: int):
+        try:
+            await asyncio.sleep(settings.WRITE_BEHIND_FK_RETRY_SECONDS * 2 ** (attempt - 1))
+            await self._flush(batch, attempt)
+        except asyncio.CancelledError:
+            # stop(): al spill (si ja s'havien escrit, la reproducció les descarta per duplicades)
+            self._spill(batch)
+            raise
+
+    def _spill(self, batch: list[tuple[type[Base], dict]]):
+        path = settings.WRITE_BEHIND_SPILL_PATH
+        if not path:
+            WRITE_BEHIND_ROWS.labels(outcome="dropped").inc(len(batch))
+            return
+        # Mateix bloqueig que replay_spill() fa servir per moure el fitxer
+        with _file_lock(f"{path}.lock"), open(path, "a", encoding="utf-8") as f:
+            for model, row in batch:
+                f.write(json.dumps({"table": model.__tablename__, "row": _encode(row)}, ensure_ascii=False) + "\n")
+        WRITE_BEHIND_ROWS.labels(outcome="spilled").inc(len(batch))
+
+    async def replay_spill(self):
+        """Torna a inserir les files del fitxer de spill (p.ex. després d'una caiguda de MySQL).
+
+        Tots els workers ho intenten en arrencar: només un el reprodueix (els altres
+        continuen). Primer el `.replaying` que hagi deixat una reproducció interrompuda,
+        després el fitxer actual, que es mou sota el mateix bloqueig que les escriptures.
+        """
+        path = settings.WRITE_BEHIND_SPILL_PATH
+        if not path:
+            return
+        replaying = f"{path}.replaying"
+        with _file_lock(f"{path}.replay.lock", blocking=False) as acquired:
+            if not acquired:
+                return
+            if os.path.exists(replaying):
+                await self._replay_file(replaying)
+            with _file_lock(f"{path}.lock"):
+                if not os.path.exists(path):
+                    return
+                os.replace(path, replaying)
+            await self._replay_file(replaying)
+
+    async def _replay_file(self, replaying: str):
+        batch = []
+        with open(replaying, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                model = _BY_TABLE[entry["table"]]
+                batch.append((model, _decode(model, entry["row"])))
+        logger.info(f"♻️ Reinsertando {len(batch)} filas del fichero de spill")
+        size = max(1, settings.WRITE_BEHIND_BATCH_SIZE)
+        for i in range(0, len(batch), size):
+            await self._flush(batch[i:i + size])
+        os.remove(replaying)
+
+writer = WriteBehindWriter()
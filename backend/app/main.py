@@ -1,28 +1,82 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from prometheus_fastapi_instrumentator import Instrumentator
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.api.v1.okrs import router as okrs_router
-from app.db.models import Base
-from app.db.session import engine
+from app.api.v1.jobs import router as jobs_router
+from app.db.session import engine, async_engine
+from app.services.ai_service import close_client
+from app.core.redis_client import close_async_redis
+from app.db.writer import writer
+from app.services import similarity
+from app.services.jobs import workers as job_workers
+from app.core.tracing import TraceMiddleware, configure_logging, setup_otel
+from app.core.compression import CompressionMiddleware
+from app.core.idempotency import IdempotencyMiddleware
+from app.core.ratelimit import RateLimitHeadersMiddleware
+from app.core import startup
 
-Base.metadata.create_all(bind=engine)  # Dev only
+configure_logging()
+setup_otel()
 
-app = FastAPI(title="OKR Evaluator API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Cap I/O en importar el mòdul: tot passa aquí, i l'escalfament va en segon pla
+    if settings.DB_CREATE_ALL:
+        await startup.create_tables()  # Dev only
+    startup.start_warmup()
+    await writer.start()
+    similarity.start_rebuild()
+    await job_workers.start()
+    yield
+    await startup.stop_warmup()
+    await job_workers.stop()
+    await similarity.stop_rebuild()
+    await writer.stop()
+    await close_client()
+    await close_async_redis()
+    await async_engine.dispose()
+    engine.dispose()
+
+app = FastAPI(title="OKR Evaluator API", version="1.0.0", lifespan=lifespan,
+              default_response_class=ORJSONResponse)
 
 # Prometheus metrics at /metrics
 Instrumentator().instrument(app).expose(app, include_in_schema=False, endpoint="/metrics")
 
+# El més intern: veu la resposta real de l'endpoint, sigui quina sigui
+app.add_middleware(RateLimitHeadersMiddleware)
+if settings.IDEMPOTENCY_ENABLED:
+    # Per dins de CORS i de la compressió: les respostes reproduïdes passen per tots dos
+    app.add_middleware(IdempotencyMiddleware, paths={
+        "/api/v1/okrs/evaluate", "/api/v1/okrs/kr/evaluate", "/api/v1/okrs/evaluate/batch",
+    })
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_origins_list(),
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id", "Idempotent-Replayed",
+                    "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "Retry-After"],
 )
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_BYTES)
+# L'últim afegit és el més extern: el trace_id cobreix també CORS i les mètriques
+app.add_middleware(TraceMiddleware)
 
 @app.get("/health")
 def health():
+    """Liveness: el procés respon (sense tocar dependències)."""
     return {"status": "ok"}
 
+@app.get("/ready")
+async def ready():
+    """Readiness: escalfament acabat i BD disponible (Redis i LLM poden estar degradats)."""
+    is_ready, detail = await startup.readiness()
+    return ORJSONResponse(detail, status_code=200 if is_ready else 503)
+
 app.include_router(okrs_router, prefix="/api/v1/okrs", tags=["okrs"])
+app.include_router(jobs_router, prefix="/api/v1/jobs", tags=["jobs"])
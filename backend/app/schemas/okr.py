@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from datetime import date
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+from datetime import date, datetime
 
 class OkrEvaluateRequest(BaseModel):
     objective: str = Field(min_length=5, max_length=2000)
@@ -15,6 +15,10 @@ class OkrEvaluateResponse(BaseModel):
     breakdown: ScoreBreakdown
     feedback: str
     can_add_krs: bool
+    status: str = "success"            # degraded: resposta heurística (servei d'IA no disponible)
+    reused: bool = False               # avaluació reaprofitada d'un objectiu quasi idèntic
+    reused_from: str | None = None     # okr_id d'origen
+    similarity: float | None = None
 
 class KrEvaluateRequest(BaseModel):
     okr_id: str
@@ -33,3 +37,126 @@ class KrEvaluateResponse(BaseModel):
     breakdown: KrScoreBreakdown
     feedback: str
     allow_next_kr: bool
+
+class BatchKrItem(BaseModel):
+    kr_definition: str = Field(min_length=5, max_length=2000)
+    target_value: str
+    target_date: date
+
+class BatchObjectiveItem(BaseModel):
+    objective: str = Field(min_length=5, max_length=2000)
+    key_results: list[BatchKrItem] = Field(default_factory=list)
+
+class BatchEvaluateRequest(BaseModel):
+    """Accepta un objectiu amb els seus KRs (`{"objective": ..., "key_results": [...]}`)
+    o molts (`{"objectives": [...]}`)."""
+    objectives: list[BatchObjectiveItem] = Field(min_length=1)
+
+    @model_validator(mode="before")
+    @classmethod
+    def _single_objective(cls, data):
+        if isinstance(data, dict) and "objectives" not in data and "objective" in data:
+            return {"objectives": [data]}
+        return data
+
+class BatchKrResult(BaseModel):
+    index: int
+    key_result_id: str | None = None
+    score: float | None = None
+    breakdown: KrScoreBreakdown | None = None
+    feedback: str | None = None
+    allow_next_kr: bool | None = None
+    error: str | None = None
+
+class BatchObjectiveResult(BaseModel):
+    index: int
+    okr_id: str | None = None
+    score: float | None = None
+    breakdown: ScoreBreakdown | None = None
+    feedback: str | None = None
+    can_add_krs: bool | None = None
+    error: str | None = None
+    key_results: list[BatchKrResult] = Field(default_factory=list)
+
+class BatchEvaluateResponse(BaseModel):
+    results: list[BatchObjectiveResult]
+    succeeded: int
+    failed: int
+
+class OkrSummary(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    objective: str
+    score: float
+    clarity: float
+    focus: float
+    writing: float
+    created_at: datetime | None = Field(None, serialization_alias="createdAt")  # el nom que llegeix el frontend
+    feedback: str | None = None  # només amb include_feedback=true
+
+class KeyResultOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    okr_id: str
+    kr_definition: str
+    target_value: str
+    target_date: datetime
+    score: float
+    clarity: float
+    measurability: float
+    feasibility: float
+    feedback: str
+    created_at: datetime | None = Field(None, serialization_alias="createdAt")  # com OkrSummary
+
+class OkrDetail(OkrSummary):
+    key_results: list[KeyResultOut] = Field(default_factory=list)
+
+class StatsPeriod(BaseModel):
+    period: date
+    count: int
+    avg_score: float | None = None
+    pass_rate: float | None = None
+
+class KindStats(BaseModel):
+    count: int
+    avg_score: float | None = None
+    stddev_score: float | None = None
+    pass_rate: float | None = None
+    histogram: dict[str, int]
+    series: list[StatsPeriod]
+
+class StatsResponse(BaseModel):
+    from_date: date
+    to_date: date
+    group_by: str
+    pass_threshold: float
+    kinds: dict[str, KindStats]  # objective | key_result
+
+class SearchHit(BaseModel):
+    kind: str  # objective | key_result
+    id: str
+    okr_id: str | None = None
+    text: str
+    score: float
+    relevance: float
+    created_at: datetime | None = None
+
+class JobAccepted(BaseModel):
+    job_id: str
+    status: str
+    priority: str
+    status_url: str
+
+class JobStatus(BaseModel):
+    id: str
+    kind: str                          # objective | key_result | batch
+    status: str                        # queued | running | succeeded | failed
+    priority: str
+    attempts: int
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    result: dict | None = None         # mateixa forma que la resposta síncrona
+    error: str | None = None
@@ -1,23 +1,202 @@
-import os
-from openai import OpenAI
+import time
+import asyncio
+from typing import TYPE_CHECKING, AsyncIterator, Callable
+import httpx
+from prometheus_client import Counter, Histogram
 from app.core.config import settings
+from app.services import llm_cache, resilience
+from app.services.prompts import Prompt
+from app.core.tracing import stage, STAGE_SECONDS
 
-# Assegura que la clau API estigui disponible com a variable d'entorn
-os.environ["OPENAI_API_KEY"] = settings.OPENAI_API_KEY
-
-client = OpenAI()
-
-SYSTEM = ("Ets un avaluador d'OKR inspirat en Doerr i Grove. "
-          "Dona feedback concret, accionable i breu (màxim 6 punts, 1200 caràcters). "
-          "Evita repeticions i termes vagues.")
-
-async def llm_feedback(prompt: str) -> str:
-    res = client.chat.completions.create(
-        model=settings.OPENAI_MODEL,
-        temperature=0.2,
-        messages=[
-            {"role": "system", "content": SYSTEM},
-            {"role": "user", "content": prompt},
-        ],
-    )
-    return (res.choices[0].message.content or "")[:5000]
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+TEMPERATURE = 0.2
+
+LLM_TOKENS = Histogram(
+    "okr_llm_tokens", "Tokens per crida LLM", ["endpoint", "type"],
+    buckets=(25, 50, 100, 200, 400, 800, 1600, 3200),
+)
+LLM_TRUNCATED = Counter("okr_llm_truncated_total", "Respostes tallades pel pressupost de max_tokens", ["endpoint"])
+
+_client: "AsyncOpenAI | None" = None
+_http: httpx.AsyncClient | None = None   # pool HTTP del client (compartit amb warm_client)
+_semaphore: asyncio.Semaphore | None = None
+
+def get_client() -> "AsyncOpenAI":
+    """Client asíncron compartit, amb un pool de connexions HTTP reutilitzable.
+    El paquet openai (lent d'importar) es carrega aquí, no en importar el mòdul."""
+    global _client, _http
+    if _client is None:
+        from openai import AsyncOpenAI
+        _http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=30.0,
+            ),
+            timeout=httpx.Timeout(settings.LLM_TIMEOUT_SECONDS, connect=settings.LLM_CONNECT_TIMEOUT_SECONDS),
+        )
+        _client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL,
+            http_client=_http,
+            max_retries=0,  # els reintents els fa app/services/resilience.py, dins el deadline
+        )
+    return _client
+
+def get_semaphore() -> asyncio.Semaphore:
+    """Limita les crides LLM simultànies per procés (LLM_MAX_CONCURRENCY)."""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(max(1, settings.LLM_MAX_CONCURRENCY))
+    return _semaphore
+
+async def warm_client(timeout: float):
+    """Obre una connexió amb l'API del model (DNS, TCP i TLS) i la deixa al pool.
+    Qualsevol resposta HTTP serveix: no es consumeixen tokens."""
+    client = get_client()
+    await _http.get(str(client.base_url), timeout=timeout)
+
+async def close_client():
+    global _client, _http, _semaphore
+    if _client is not None:
+        await _client.close()
+    _client = None
+    _http = None
+    _semaphore = None
+
+def cache_key(prompt: Prompt) -> str:
+    return llm_cache.make_key(prompt.user, settings.OPENAI_MODEL, TEMPERATURE, prompt.system, prompt.options())
+
+def record_usage(prompt: Prompt, usage, finish_reason: str | None):
+    """Tokens de la crida (prompt, completion i prefix cachejat pel proveïdor) per endpoint."""
+    if finish_reason == "length":
+        LLM_TRUNCATED.labels(endpoint=prompt.endpoint).inc()
+    if usage is None:
+        return
+    LLM_TOKENS.labels(endpoint=prompt.endpoint, type="prompt").observe(usage.prompt_tokens or 0)
+    LLM_TOKENS.labels(endpoint=prompt.endpoint, type="completion").observe(usage.completion_tokens or 0)
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = details.get("cached_tokens") if isinstance(details, dict) else getattr(details, "cached_tokens", None)
+    LLM_TOKENS.labels(endpoint=prompt.endpoint, type="cached_prompt").observe(cached or 0)
+
+def cacheable(content: str, finish_reason: str | None, validate: Callable[[str], bool] | None) -> bool:
+    """Només es desa a la cache una resposta completa (no tallada per max_tokens)
+    i vàlida: si no, el mateix prompt rebria el fallback durant tot el TTL."""
+    return bool(content) and finish_reason != "length" and (validate is None or validate(content))
+
+async def _complete(prompt: Prompt, timeout: float) -> tuple[str, str | None]:
+    async with get_semaphore():
+        res = await get_client().chat.completions.create(
+            model=settings.OPENAI_MODEL,
+            temperature=TEMPERATURE,
+            messages=prompt.messages(),
+            timeout=timeout,
+            **prompt.options(),
+        )
+    record_usage(prompt, res.usage, res.choices[0].finish_reason)
+    return res.choices[0].message.content or "", res.choices[0].finish_reason
+
+async def llm_feedback(prompt: Prompt, timeout: float | None = None,
+                       validate: Callable[[str], bool] | None = None) -> str:
+    """Resposta del model (o de la cache). `timeout` és el deadline total
+    (per defecte LLM_DEADLINE_SECONDS); pot llançar resilience.CircuitOpenError.
+    `validate` decideix si la resposta es pot desar a la cache."""
+    key = cache_key(prompt)
+    with stage("llm_cache"):
+        cached = await llm_cache.get(key)
+    if cached is not None:
+        return cached
+
+    with stage("llm", model=settings.OPENAI_MODEL):
+        content, finish_reason = await resilience.call(lambda t: _complete(prompt, t), timeout)
+    if cacheable(content, finish_reason, validate):
+        await llm_cache.put(key, content)
+    return content
+
+async def _stream_step(aw, remaining: float):
+    """Un pas del streaming (obrir-lo o el fragment següent): espera una plaça del
+    semàfor i `aw` amb el pressupost que queda; TimeoutError si s'esgota.
+    asyncio.timeout i no wait_for: a 3.11 wait_for es pot empassar una cancel·lació."""
+    async with asyncio.timeout(remaining), get_semaphore():
+        return await aw
+
+async def llm_feedback_stream(prompt: Prompt, timeout: float | None = None,
+                              validate: Callable[[str], bool] | None = None) -> AsyncIterator[str]:
+    """Com llm_feedback però retorna els fragments a mesura que el model els genera.
+    Si la resposta és a la cache, es retorna sencera d'un sol cop.
+    """
+    key = cache_key(prompt)
+    with stage("llm_cache"):
+        cached = await llm_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    # Sense reintents ni hedging (ja s'han enviat fragments), però amb breaker i deadline.
+    # El deadline i el semàfor només cobreixen les esperes al model: mentre el generador
+    # està aturat a `yield` (el client llegeix a poc a poc) no compten ni ocupen plaça.
+    budget = remaining = timeout or settings.LLM_DEADLINE_SECONDS
+
+    async def step(aw):
+        nonlocal remaining
+        t0 = time.monotonic()
+        try:
+            return await _stream_step(aw, remaining)
+        finally:
+            remaining -= time.monotonic() - t0
+
+    resilience.breaker.allow()
+    settled = False  # ja s'ha informat el breaker (èxit, error o prova alliberada)
+    stream = None
+    parts: list[str] = []
+    usage = finish_reason = None
+    # Sense span: el generador cedeix el control entre fragments; només l'histograma
+    start = time.perf_counter()
+    try:
+        stream = await step(get_client().chat.completions.create(
+            model=settings.OPENAI_MODEL,
+            temperature=TEMPERATURE,
+            messages=prompt.messages(),
+            timeout=min(budget, settings.LLM_TIMEOUT_SECONDS),
+            stream=True,
+            stream_options={"include_usage": True},  # l'últim fragment porta els tokens
+            **prompt.options(),
+        ))
+        while True:
+            try:
+                chunk = await step(stream.__anext__())
+            except StopAsyncIteration:
+                break
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            delta = chunk.choices[0].delta.content or ""
+            if not delta:
+                continue
+            parts.append(delta)
+            yield delta
+        settled = True
+        resilience.breaker.record_success()
+    except Exception as e:
+        settled = True
+        if resilience.is_retryable(e):
+            resilience.breaker.record_failure()
+        else:
+            resilience.breaker.release_probe()
+        raise
+    finally:
+        if not settled:
+            # GeneratorExit o CancelledError (el client ha marxat): sense veredicte,
+            # però la prova del half-open no pot quedar agafada
+            resilience.breaker.release_probe()
+        if stream is not None:
+            await stream.close()
+    STAGE_SECONDS.labels(stage="llm", model=settings.OPENAI_MODEL).observe(time.perf_counter() - start)
+    record_usage(prompt, usage, finish_reason)
+    content = "".join(parts)
+    if cacheable(content, finish_reason, validate):
+        await llm_cache.put(key, content)
@@ -0,0 +1,148 @@
+"""Estadístiques de puntuació a partir de rollups diaris (taula score_rollups_daily).
+
+Cada escriptura d'OKRs/KRs suma els seus deltes al rollup del dia dins la mateixa
+transacció (upsert), així que /okrs/stats llegeix com a molt una fila per dia i
+tipus, independentment de quantes avaluacions hi hagi. `app.cli.backfill_stats`
+reconstrueix els rollups a partir de les taules (files antigues o després d'un rescore).
+
+L'histograma i la mitjana són de `score` (heurística). Els aprovats són els del
+llindar que s'aplica a l'API: `overall_score` (model) per als objectius, com
+`can_add_krs`, i `score` per als KRs, com `allow_next_kr`.
+"""
+import math
+from datetime import date, timedelta
+from sqlalchemy import select, func, delete, case
+from sqlalchemy.dialects import mysql, sqlite
+from app.db.models import OkrSubmission, KeyResult, ScoreRollupDaily
+from app.db.session import AsyncSessionLocal
+from app.services.scoring import PASS_THRESHOLD
+
+KINDS = {OkrSubmission: "objective", KeyResult: "key_result"}
+# Columna del llindar d'aprovat de cada tipus (NULL: files anteriors a la migració 0006, es fa servir `score`)
+GATES = {OkrSubmission: "overall_score", KeyResult: "score"}
+HIST_BUCKETS = range(1, 10)
+_COUNTERS = ("count", "passed", "score_sum", "score_sq_sum", *(f"hist_{b}" for b in HIST_BUCKETS))
+_T = ScoreRollupDaily.__table__
+
+def bucket(score: float) -> int:
+    return min(9, max(1, int(score)))
+
+def gate_value(model, row: dict) -> float:
+    value = row.get(GATES[model])
+    return row["score"] if value is None else value
+
+def rollup_deltas(scores: list[float], gates: list[float] | None = None) -> dict:
+    """Deltes d'un conjunt de files; `gates` són els valors del llindar d'aprovat (per defecte, `scores`)."""
+    deltas = dict.fromkeys(_COUNTERS, 0)
+    deltas["score_sum"] = deltas["score_sq_sum"] = 0.0
+    for s, g in zip(scores, scores if gates is None else gates):
+        deltas["count"] += 1
+        deltas["passed"] += g >= PASS_THRESHOLD
+        deltas["score_sum"] += s
+        deltas["score_sq_sum"] += s * s
+        deltas[f"hist_{bucket(s)}"] += 1
+    return deltas
+
+def upsert_statement(dialect: str, day, kind: str, deltas: dict):
+    """INSERT ... ON DUPLICATE KEY UPDATE col = col + delta (ON CONFLICT a SQLite)."""
+    values = {"day": day, "kind": kind, **deltas}
+    if dialect == "mysql":
+        stmt = mysql.insert(_T).values(values)
+        return stmt.on_duplicate_key_update({c: _T.c[c] + stmt.inserted[c] for c in _COUNTERS})
+    stmt = sqlite.insert(_T).values(values)
+    return stmt.on_conflict_do_update(
+        index_elements=["day", "kind"], set_={c: _T.c[c] + stmt.excluded[c] for c in _COUNTERS}
+    )
+
+async def apply_rollups(db, rows_by_model: dict) -> None:
+    """Suma al rollup d'avui les files que s'estan inserint a la sessió `db`.
+    El dia surt de CURRENT_DATE de la BD, el mateix rellotge que created_at."""
+    dialect = db.bind.dialect.name
+    for model, rows in rows_by_model.items():
+        kind = KINDS.get(model)
+        if kind is None or not rows:
+            continue
+        deltas = rollup_deltas([r["score"] for r in rows], [gate_value(model, r) for r in rows])
+        await db.execute(upsert_statement(dialect, func.current_date(), kind, deltas))
+
+def _summary(agg: dict) -> dict:
+    n = agg["count"]
+    mean = agg["score_sum"] / n if n else None
+    var = max(0.0, agg["score_sq_sum"] / n - mean * mean) if n else None
+    return {
+        "count": n,
+        "avg_score": round(mean, 2) if n else None,
+        "stddev_score": round(math.sqrt(var), 2) if n else None,
+        "pass_rate": round(agg["passed"] / n, 4) if n else None,
+        "histogram": {f"{b}-{b + 1}": agg[f"hist_{b}"] for b in HIST_BUCKETS},
+    }
+
+def _period_start(day: date, group_by: str) -> date:
+    return day - timedelta(days=day.weekday()) if group_by == "week" else day
+
+async def get_stats(from_date: date, to_date: date, group_by: str = "week") -> dict:
+    """Totals i sèrie temporal (per dia o setmana ISO) per a objectius i KRs dins [from_date, to_date]."""
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(_T).where(_T.c.day >= from_date, _T.c.day <= to_date).order_by(_T.c.day)
+        )).mappings().all()
+
+    out = {"from_date": from_date, "to_date": to_date, "group_by": group_by,
+           "pass_threshold": PASS_THRESHOLD, "kinds": {}}
+    for kind in KINDS.values():
+        total = dict.fromkeys(_COUNTERS, 0)
+        periods: dict[date, dict] = {}
+        for r in rows:
+            if r["kind"] != kind:
+                continue
+            day = r["day"] if isinstance(r["day"], date) else date.fromisoformat(r["day"])
+            period = periods.setdefault(_period_start(day, group_by), dict.fromkeys(_COUNTERS, 0))
+            for c in _COUNTERS:
+                total[c] += r[c]
+                period[c] += r[c]
+        out["kinds"][kind] = {
+            **_summary(total),
+            "series": [
+                {"period": p, "count": a["count"],
+                 "avg_score": round(a["score_sum"] / a["count"], 2) if a["count"] else None,
+                 "pass_rate": round(a["passed"] / a["count"], 4) if a["count"] else None}
+                for p, a in sorted(periods.items())
+            ],
+        }
+    return out
+
+def backfill_statements(dialect: str, from_date: date | None = None, to_date: date | None = None):
+    """Sentències (sync) per reconstruir els rollups de [from_date, to_date] des de les taules:
+    un DELETE del rang i un SELECT agregat per dia i tipus (GROUP BY al servidor)."""
+    where_rollup = []
+    if from_date:
+        where_rollup.append(_T.c.day >= from_date)
+    if to_date:
+        where_rollup.append(_T.c.day <= to_date)
+    yield "delete", delete(_T).where(*where_rollup)
+
+    for model, kind in KINDS.items():
+        day = func.date(model.created_at).label("day")
+        score = model.score
+        gate = func.coalesce(getattr(model, GATES[model]), score)
+        cols = [
+            day,
+            func.count().label("count"),
+            func.sum(case((gate >= PASS_THRESHOLD, 1), else_=0)).label("passed"),
+            func.sum(score).label("score_sum"),
+            func.sum(score * score).label("score_sq_sum"),
+        ]
+        for b in HIST_BUCKETS:
+            if b == 9:
+                cond = score >= 9
+            elif b == 1:
+                cond = score < 2
+            else:
+                cond = (score >= b) & (score < b + 1)
+            cols.append(func.sum(case((cond, 1), else_=0)).label(f"hist_{b}"))
+        q = select(*cols).where(model.created_at.is_not(None))
+        if from_date:
+            q = q.where(model.created_at >= from_date)
+        if to_date:
+            q = q.where(model.created_at < to_date + timedelta(days=1))
+        yield kind, q.group_by(day)
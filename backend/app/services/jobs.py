@@ -0,0 +1,503 @@
+"""Cua de treballs per a les avaluacions asíncrones (`?mode=async`).
+
+L'endpoint encua el treball i respon 202 amb l'id; un pool de workers
+(JOB_WORKERS tasques per procés) l'executa i el client consulta
+GET /api/v1/jobs/{id} o rep un webhook quan acaba.
+
+- Backend: Redis (REDIS_URL, compartit entre processos) o memòria del procés
+  (sense REDIS_URL: desenvolupament i tests).
+- Prioritats high/normal/low; dins la mateixa prioritat, FIFO.
+- Visibility timeout: un treball reclamat queda "en vol" fins a
+  JOB_VISIBILITY_TIMEOUT_SECONDS; el worker l'allarga mentre treballa. Si el
+  worker mor, el reaper el torna a la cua fins a JOB_MAX_ATTEMPTS intents.
+- Reintents amb backoff: un treball fallit no es pot tornar a reclamar fins
+  passats JOB_RETRY_BASE_SECONDS (es dobla a cada intent, màx. JOB_RETRY_MAX_SECONDS).
+"""
+import asyncio
+import hashlib
+import heapq
+import hmac
+import json
+import logging
+import time
+import uuid
+from datetime import datetime
+from functools import lru_cache
+from urllib.parse import urlsplit
+import httpx
+import redis
+from prometheus_client import Counter, Gauge, Histogram
+from app.core.config import settings
+from app.core.redis_client import get_async_redis
+from app.core.tracing import new_trace
+from app.schemas.okr import OkrEvaluateResponse, KrEvaluateResponse, BatchEvaluateRequest, BatchEvaluateResponse
+from app.services.okr_service import evaluate_objective, evaluate_kr, evaluate_batch
+
+logger = logging.getLogger(__name__)
+
+JOBS = Counter("okr_jobs_total", "Treballs asíncrons per resultat", ["kind", "outcome"])
+JOB_QUEUE_DEPTH = Gauge("okr_job_queue_depth", "Treballs pendents a la cua", multiprocess_mode="livemax")
+JOB_WAIT_SECONDS = Histogram(
+    "okr_job_wait_seconds", "Temps a la cua fins que un worker el reclama",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60, 300),
+)
+JOB_WEBHOOKS = Counter("okr_job_webhooks_total", "Webhooks de treballs", ["outcome"])
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+# Puntuació a la cua: prioritat i, dins la prioritat, ms d'encuament (FIFO)
+_PRIORITY_SPAN = 10 ** 13
+
+class QueueFull(Exception):
+    pass
+
+class InvalidWebhook(ValueError):
+    pass
+
+def _now_iso() -> str:
+    return datetime.utcnow().isoformat()
+
+def retry_delay(attempts: int) -> float:
+    """Segons d'espera abans de tornar a oferir un treball que ha fallat `attempts` vegades."""
+    return min(settings.JOB_RETRY_MAX_SECONDS, settings.JOB_RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1))
+
+def _public(job: dict) -> dict:
+    return {k: job.get(k) for k in (
+        "id", "kind", "status", "priority", "attempts", "created_at", "started_at", "finished_at", "result", "error",
+    )}
+
+# --- Handlers: el resultat es desa ja validat pel mateix model que la resposta síncrona
+
+async def _run_objective(payload: dict) -> dict:
+    result = await evaluate_objective(payload["objective"])
+    return OkrEvaluateResponse.model_validate(result).model_dump(mode="json")
+
+async def _run_key_result(payload: dict) -> dict:
+    result = await evaluate_kr(payload["okr_id"], payload["kr_definition"], payload["target_value"],
+                               payload["target_date"])
+    return KrEvaluateResponse.model_validate(result).model_dump(mode="json")
+
+async def _run_batch(payload: dict) -> dict:
+    req = BatchEvaluateRequest.model_validate(payload)
+    return BatchEvaluateResponse.model_validate(await evaluate_batch(req.objectives)).model_dump(mode="json")
+
+HANDLERS = {"objective": _run_objective, "key_result": _run_key_result, "batch": _run_batch}
+
+# --- Backends
+
+class MemoryJobQueue:
+    """Cua en memòria del procés (heap per prioritat, reintents en espera i treballs en vol amb deadline)."""
+
+    backend = "memory"
+
+    def __init__(self):
+        self._jobs: dict[str, dict] = {}
+        self._heap: list[tuple[int, str]] = []
+        self._delayed: list[tuple[float, int, str]] = []  # (no abans de, puntuació, id)
+        self._inflight: dict[str, float] = {}
+
+    async def enqueue(self, job: dict):
+        if await self.depth() >= settings.JOB_MAX_QUEUED:
+            raise QueueFull("Job queue full")
+        self._jobs[job["id"]] = job
+        heapq.heappush(self._heap, (job["score"], job["id"]))
+
+    async def claim(self) -> dict | None:
+        now = time.monotonic()
+        while self._delayed and self._delayed[0][0] <= now:
+            _, score, job_id = heapq.heappop(self._delayed)
+            heapq.heappush(self._heap, (score, job_id))
+        while self._heap:
+            _, job_id = heapq.heappop(self._heap)
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] != "queued":
+                continue
+            job.update(status="running", started_at=_now_iso(), attempts=job["attempts"] + 1)
+            self._inflight[job_id] = time.monotonic() + settings.JOB_VISIBILITY_TIMEOUT_SECONDS
+            return dict(job)
+        return None
+
+    async def heartbeat(self, job_id: str):
+        if job_id in self._inflight:
+            self._inflight[job_id] = time.monotonic() + settings.JOB_VISIBILITY_TIMEOUT_SECONDS
+
+    async def finish(self, job_id: str, result: dict) -> dict:
+        self._inflight.pop(job_id, None)
+        job = self._jobs[job_id]
+        job.update(status="succeeded", result=result, error=None, finished_at=_now_iso(),
+                   expires=time.monotonic() + settings.JOB_RESULT_TTL_SECONDS)
+        return dict(job)
+
+    async def retry_or_fail(self, job_id: str, error: str) -> dict | None:
+        """Torna el treball a la cua si li queden intents; si no, el marca com a fallit."""
+        if self._inflight.pop(job_id, None) is None:
+            return None
+        job = self._jobs[job_id]
+        if job["attempts"] < settings.JOB_MAX_ATTEMPTS:
+            job.update(status="queued", error=error)
+            ready = time.monotonic() + retry_delay(job["attempts"])
+            heapq.heappush(self._delayed, (ready, job["score"], job_id))
+        else:
+            job.update(status="failed", error=error, finished_at=_now_iso(),
+                       expires=time.monotonic() + settings.JOB_RESULT_TTL_SECONDS)
+        return dict(job)
+
+    async def reap(self) -> list[dict]:
+        now = time.monotonic()
+        expired = [job_id for job_id, deadline in self._inflight.items() if deadline <= now]
+        out = [job for job in [await self.retry_or_fail(job_id, "visibility timeout") for job_id in expired] if job]
+        for job_id in [j for j, job in self._jobs.items() if job.get("expires", now + 1) <= now]:
+            del self._jobs[job_id]
+        return out
+
+    async def get(self, job_id: str) -> dict | None:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def depth(self) -> int:
+        return sum(1 for job in self._jobs.values() if job["status"] == "queued")
+
+# Reclama el treball de més prioritat: el treu de la cua i el passa a "en vol"
+# amb el seu deadline de visibilitat, en un sol pas atòmic. Abans hi passa els
+# reintents en espera que ja toquen (amb la puntuació original, per prioritat).
+# KEYS[1] = cua, KEYS[2] = en vol, KEYS[3] = en espera; ARGV = ara_ms, visibility_ms, prefix, started_at
+_CLAIM = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', ARGV[1], 'LIMIT', 0, 100)
+for _, id in ipairs(due) do
+  redis.call('ZREM', KEYS[3], id)
+  local score = redis.call('HGET', ARGV[3] .. id, 'score')
+  if score then redis.call('ZADD', KEYS[1], tonumber(score), id) end
+end
+local ids = redis.call('ZRANGE', KEYS[1], 0, 0)
+if #ids == 0 then return false end
+local id = ids[1]
+redis.call('ZREM', KEYS[1], id)
+local key = ARGV[3] .. id
+if redis.call('EXISTS', key) == 0 then return false end
+redis.call('ZADD', KEYS[2], tonumber(ARGV[1]) + tonumber(ARGV[2]), id)
+redis.call('HSET', key, 'status', 'running', 'started_at', ARGV[4])
+redis.call('HINCRBY', key, 'attempts', 1)
+return id
+"""
+
+# Treballs que surten de vol sense acabar (error o visibility timeout): esperen el
+# backoff (base * 2^(intents-1), fins al màxim) si els queden intents, si no queden
+# fallits amb TTL. Només actua si el treball encara és en vol (un altre reaper o
+# worker no l'ha tocat).
+# KEYS[1] = cua, KEYS[2] = en vol, KEYS[3] = en espera;
+# ARGV = prefix, màx. intents, finished_at, ttl, error, ara_ms, base_ms, màx_ms, ids...
+_REQUEUE_OR_FAIL = """
+local out = {}
+for i = 9, #ARGV do
+  local id = ARGV[i]
+  if redis.call('ZREM', KEYS[2], id) == 1 then
+    local key = ARGV[1] .. id
+    local attempts = tonumber(redis.call('HGET', key, 'attempts') or '0')
+    local score = redis.call('HGET', key, 'score')
+    if score and attempts < tonumber(ARGV[2]) then
+      local delay = math.min(tonumber(ARGV[8]), tonumber(ARGV[7]) * 2 ^ math.max(0, attempts - 1))
+      redis.call('HSET', key, 'status', 'queued', 'error', ARGV[5])
+      redis.call('ZADD', KEYS[3], tonumber(ARGV[6]) + delay, id)
+    elseif score then
+      redis.call('HSET', key, 'status', 'failed', 'error', ARGV[5], 'finished_at', ARGV[3])
+      redis.call('EXPIRE', key, tonumber(ARGV[4]))
+    end
+    table.insert(out, id)
+  end
+end
+return out
+"""
+
+class RedisJobQueue:
+    """Cua a Redis: hash per treball, ZSET de pendents (per prioritat), ZSET en vol (per deadline)
+    i ZSET de reintents en espera (per hora a partir de la qual es poden reclamar)."""
+
+    backend = "redis"
+    PREFIX = "jobs:"
+    QUEUE = "jobs:queue"
+    INFLIGHT = "jobs:inflight"
+    DELAYED = "jobs:delayed"
+
+    def __init__(self, client):
+        self.client = client
+        self._claim = client.register_script(_CLAIM)
+        self._requeue = client.register_script(_REQUEUE_OR_FAIL)
+
+    @staticmethod
+    def _encode(job: dict) -> dict:
+        return {k: json.dumps(v) if k in ("payload", "result") else v for k, v in job.items() if v is not None}
+
+    @staticmethod
+    def _decode(raw: dict) -> dict:
+        job = dict(raw)
+        for k in ("payload", "result"):
+            job[k] = json.loads(job[k]) if k in job else None
+        job["attempts"] = int(job.get("attempts", 0))
+        job["score"] = int(job["score"])
+        return job
+
+    async def enqueue(self, job: dict):
+        if await self.depth() >= settings.JOB_MAX_QUEUED:
+            raise QueueFull("Job queue full")
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(self.PREFIX + job["id"], mapping=self._encode(job))
+            pipe.zadd(self.QUEUE, {job["id"]: job["score"]})
+            await pipe.execute()
+
+    async def claim(self) -> dict | None:
+        job_id = await self._claim(
+            keys=[self.QUEUE, self.INFLIGHT, self.DELAYED],
+            args=[int(time.time() * 1000), int(settings.JOB_VISIBILITY_TIMEOUT_SECONDS * 1000), self.PREFIX,
+                  _now_iso()],
+        )
+        return await self.get(job_id) if job_id else None
+
+    async def heartbeat(self, job_id: str):
+        deadline = int((time.time() + settings.JOB_VISIBILITY_TIMEOUT_SECONDS) * 1000)
+        await self.client.zadd(self.INFLIGHT, {job_id: deadline}, xx=True)
+
+    async def finish(self, job_id: str, result: dict) -> dict:
+        key = self.PREFIX + job_id
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.zrem(self.INFLIGHT, job_id)
+            pipe.zrem(self.QUEUE, job_id)  # si el reaper l'havia tornat a encuar
+            pipe.zrem(self.DELAYED, job_id)
+            pipe.hset(key, mapping={"status": "succeeded", "result": json.dumps(result), "finished_at": _now_iso()})
+            pipe.hdel(key, "error")
+            pipe.expire(key, settings.JOB_RESULT_TTL_SECONDS)
+            await pipe.execute()
+        return await self.get(job_id)
+
+    async def _requeue_or_fail(self, job_ids: list[str], error: str) -> list[str]:
+        return await self._requeue(
+            keys=[self.QUEUE, self.INFLIGHT, self.DELAYED],
+            args=[self.PREFIX, settings.JOB_MAX_ATTEMPTS, _now_iso(), settings.JOB_RESULT_TTL_SECONDS, error,
+                  int(time.time() * 1000), int(settings.JOB_RETRY_BASE_SECONDS * 1000),
+                  int(settings.JOB_RETRY_MAX_SECONDS * 1000), *job_ids],
+        )
+
+    async def retry_or_fail(self, job_id: str, error: str) -> dict | None:
+        if not await self._requeue_or_fail([job_id], error):
+            return None
+        return await self.get(job_id)
+
+    async def reap(self) -> list[dict]:
+        expired = await self.client.zrangebyscore(self.INFLIGHT, "-inf", int(time.time() * 1000), start=0, num=100)
+        if not expired:
+            return []
+        moved = await self._requeue_or_fail(expired, "visibility timeout")
+        return [job for job in [await self.get(job_id) for job_id in moved] if job]
+
+    async def get(self, job_id: str) -> dict | None:
+        raw = await self.client.hgetall(self.PREFIX + job_id)
+        return self._decode(raw) if raw else None
+
+    async def depth(self) -> int:
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.zcard(self.QUEUE)
+            pipe.zcard(self.DELAYED)
+            return sum(await pipe.execute())
+
+_memory_queue = MemoryJobQueue()
+_redis_queues: dict[int, RedisJobQueue] = {}
+
+def get_queue() -> MemoryJobQueue | RedisJobQueue:
+    client = get_async_redis()
+    if client is None:
+        return _memory_queue
+    queue = _redis_queues.get(id(client))
+    if queue is None:
+        _redis_queues.clear()
+        queue = _redis_queues[id(client)] = RedisJobQueue(client)
+    return queue
+
+# --- Webhooks
+
+@lru_cache(maxsize=4)
+def _allowed_hosts(raw: str) -> frozenset[str]:
+    try:
+        return frozenset(h.lower() for h in json.loads(raw))
+    except (json.JSONDecodeError, TypeError):
+        logger.error("❌ JOB_WEBHOOK_ALLOWED_HOSTS no és una llista JSON vàlida; webhooks desactivats")
+        return frozenset()
+
+def validate_webhook_url(url: str):
+    """Només http(s) cap als hosts de JOB_WEBHOOK_ALLOWED_HOSTS (evita SSRF cap a la xarxa interna)."""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise InvalidWebhook("Invalid webhook_url")
+    if parts.hostname.lower() not in _allowed_hosts(settings.JOB_WEBHOOK_ALLOWED_HOSTS):
+        raise InvalidWebhook("webhook_url host not allowed")
+
+def sign(body: bytes) -> str:
+    return "sha256=" + hmac.new(settings.JOB_WEBHOOK_SECRET.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+# --- API del servei
+
+async def enqueue(kind: str, payload: dict, priority: str = "normal", webhook_url: str | None = None) -> dict:
+    if webhook_url:
+        validate_webhook_url(webhook_url)
+    job = {
+        "id": str(uuid.uuid4()),
+        "kind": kind,
+        "payload": payload,
+        "status": "queued",
+        "priority": priority,
+        "score": PRIORITIES[priority] * _PRIORITY_SPAN + int(time.time() * 1000),
+        "attempts": 0,
+        "created_at": _now_iso(),
+        "webhook_url": webhook_url,
+    }
+    await get_queue().enqueue(job)
+    workers.wake()
+    return _public(job)
+
+async def get_job(job_id: str) -> dict | None:
+    job = await get_queue().get(job_id)
+    return _public(job) if job else None
+
+class JobWorkers:
+    """Pool de workers del procés: reclamen treballs, els executen i notifiquen.
+
+    - JOB_WORKERS tasques (concurrència màxima de treballs per procés).
+    - Heartbeat cada terç del visibility timeout mentre el treball s'executa.
+    - En aturar-se, els treballs en curs tenen JOB_SHUTDOWN_TIMEOUT_SECONDS per
+      acabar; els que no, tornen a la cua pel visibility timeout.
+    """
+
+    def __init__(self):
+        self._tasks: list[asyncio.Task] = []
+        self._wake = asyncio.Event()
+        self._stopped = asyncio.Event()
+        self._stopping = False
+        self._http: httpx.AsyncClient | None = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def wake(self):
+        self._wake.set()
+
+    async def start(self):
+        if self.running or settings.JOB_WORKERS <= 0:
+            return
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._stopped = asyncio.Event()
+        self._http = httpx.AsyncClient(timeout=settings.JOB_WEBHOOK_TIMEOUT_SECONDS)
+        self._tasks = [asyncio.create_task(self._work(), name=f"job-worker-{i}") for i in range(settings.JOB_WORKERS)]
+        self._tasks.append(asyncio.create_task(self._reap(), name="job-reaper"))
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._stopping = True
+        self._wake.set()
+        self._stopped.set()
+        done, pending = await asyncio.wait(self._tasks, timeout=settings.JOB_SHUTDOWN_TIMEOUT_SECONDS)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+        await self._http.aclose()
+        self._http = None
+
+    async def _idle(self, seconds: float):
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _work(self):
+        while not self._stopping:
+            queue = get_queue()
+            try:
+                job = await queue.claim()
+            except redis.RedisError as e:
+                logger.error(f"❌ Error reclamando trabajo de la cola: {e}")
+                await self._idle(settings.JOB_POLL_SECONDS)
+                continue
+            if job is None:
+                await self._idle(settings.JOB_POLL_SECONDS)
+                continue
+            try:
+                await self._execute(queue, job)
+            except redis.RedisError as e:
+                # El treball queda en vol: el reaper el tornarà a la cua
+                logger.error(f"❌ Error de Redis con el trabajo {job['id']}: {e}")
+
+    async def _heartbeat(self, queue, job_id: str):
+        while True:
+            await asyncio.sleep(settings.JOB_VISIBILITY_TIMEOUT_SECONDS / 3)
+            try:
+                await queue.heartbeat(job_id)
+            except redis.RedisError as e:
+                logger.warning(f"⚠️ Heartbeat del trabajo {job_id} fallido: {e}")
+
+    async def _execute(self, queue, job: dict):
+        JOB_WAIT_SECONDS.observe(max(0.0, time.time() - (job["score"] % _PRIORITY_SPAN) / 1000))
+        heartbeat = asyncio.create_task(self._heartbeat(queue, job["id"]))
+        try:
+            with new_trace(f"job {job['kind']}"):
+                logger.info(f"⚙️ Trabajo {job['id']} ({job['kind']}), intento {job['attempts']}")
+                result = await HANDLERS[job["kind"]](job["payload"])
+        except Exception as e:
+            error = e
+        else:
+            error = None
+        finally:
+            heartbeat.cancel()
+        if error is None:
+            job = await queue.finish(job["id"], result)
+            outcome = "succeeded"
+        else:
+            logger.error(f"❌ Trabajo {job['id']} ({job['kind']}) fallido, intento {job['attempts']}: {error}")
+            job = await queue.retry_or_fail(job["id"], str(error))
+            outcome = job["status"] if job else "lost"
+        JOBS.labels(kind=job["kind"] if job else "unknown", outcome=outcome).inc()
+        if job and job["status"] in ("succeeded", "failed"):
+            await self.notify(job)
+
+    async def _reap(self):
+        while not self._stopping:
+            queue = get_queue()
+            try:
+                for job in await queue.reap():
+                    logger.warning(f"⏱️ Trabajo {job['id']} sin heartbeat: {job['status']} (intento {job['attempts']})")
+                    if job["status"] == "failed":
+                        JOBS.labels(kind=job["kind"], outcome="failed").inc()
+                        await self.notify(job)
+                JOB_QUEUE_DEPTH.set(await queue.depth())
+            except redis.RedisError as e:
+                logger.error(f"❌ Error en el reaper de trabajos: {e}")
+            try:  # s'atura de seguida amb stop()
+                await asyncio.wait_for(self._stopped.wait(), min(5.0, settings.JOB_VISIBILITY_TIMEOUT_SECONDS / 3))
+            except asyncio.TimeoutError:
+                pass
+
+    async def notify(self, job: dict):
+        """POST del treball acabat al webhook_url (amb signatura HMAC si hi ha JOB_WEBHOOK_SECRET).
+        Tres intents; els 4xx (excepte 429) no es reintenten."""
+        url = job.get("webhook_url")
+        if not url or self._http is None:
+            return
+        body = json.dumps(_public(job), ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json", "X-Job-Id": job["id"]}
+        if settings.JOB_WEBHOOK_SECRET:
+            headers["X-Signature"] = sign(body)
+        for attempt in range(3):
+            try:
+                res = await self._http.post(url, content=body, headers=headers)
+                if res.status_code < 300:
+                    JOB_WEBHOOKS.labels(outcome="delivered").inc()
+                    return
+                if res.status_code < 500 and res.status_code != 429:
+                    break
+            except httpx.HTTPError as e:
+                logger.warning(f"⚠️ Webhook del trabajo {job['id']} fallido: {e}")
+            await asyncio.sleep(0.5 * 2 ** attempt)
+        JOB_WEBHOOKS.labels(outcome="failed").inc()
+        logger.error(f"❌ Webhook del trabajo {job['id']} no entregado: {url}")
+
+workers = JobWorkers()
@@ -0,0 +1,107 @@
+import json
+from typing import Any
+
+_WS = " \t\r\n"
+
+class _Frame:
+    __slots__ = ("kind", "start", "key", "expect_key")
+
+    def __init__(self, kind: str, start: int):
+        self.kind = kind          # "obj" | "arr"
+        self.start = start        # posició de '{' o '[' al buffer
+        self.key: Any = 0 if kind == "arr" else None
+        self.expect_key = kind == "obj"
+
+class IncrementalJsonParser:
+    """Parser JSON incremental per a respostes LLM en streaming.
+
+    `feed(chunk)` retorna els valors que s'han completat amb aquest fragment,
+    com a parelles (path, valor), fins a `max_depth` nivells. Per exemple
+    ("criteria", "specific") o ("suggestions", 0). Ignora el text abans del
+    primer '{' (p.ex. blocs ```json).
+    """
+
+    def __init__(self, max_depth: int = 2):
+        self.max_depth = max_depth
+        self.buf = ""
+        self.pos = 0
+        self.stack: list[_Frame] = []
+        self.started = False
+        self.done = False
+        self.in_string = False
+        self.escape = False
+        self.string_start = 0
+        self.string_is_key = False
+        self.scalar_start: int | None = None
+
+    def _path(self) -> tuple:
+        return tuple(f.key for f in self.stack)
+
+    def _emit(self, out: list, path: tuple, raw: str):
+        if len(path) <= self.max_depth:
+            out.append((path, json.loads(raw)))
+
+    def _end_scalar(self, out: list, end: int):
+        if self.scalar_start is not None:
+            self._emit(out, self._path(), self.buf[self.scalar_start:end].strip())
+            self.scalar_start = None
+
+    def feed(self, chunk: str) -> list[tuple[tuple, Any]]:
+        out: list[tuple[tuple, Any]] = []
+        self.buf += chunk
+        buf = self.buf
+        i = self.pos
+        n = len(buf)
+        while i < n and not self.done:
+            c = buf[i]
+            if not self.started:
+                if c == "{":
+                    self.started = True
+                    self.stack.append(_Frame("obj", i))
+                i += 1
+                continue
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    raw = buf[self.string_start:i + 1]
+                    if self.string_is_key:
+                        self.stack[-1].key = json.loads(raw)
+                    else:
+                        self._emit(out, self._path(), raw)
+                i += 1
+                continue
+            if c == '"':
+                self.in_string = True
+                self.string_start = i
+                top = self.stack[-1]
+                self.string_is_key = top.kind == "obj" and top.expect_key
+            elif c in "{[":
+                self.stack.append(_Frame("obj" if c == "{" else "arr", i))
+            elif c in "}]":
+                self._end_scalar(out, i)
+                frame = self.stack.pop()
+                if self.stack:
+                    self._emit(out, self._path(), buf[frame.start:i + 1])
+                else:
+                    self._emit(out, (), buf[frame.start:i + 1])
+                    self.done = True
+            elif c == ":":
+                self.stack[-1].expect_key = False
+            elif c == ",":
+                self._end_scalar(out, i)
+                top = self.stack[-1]
+                if top.kind == "obj":
+                    top.expect_key = True
+                else:
+                    top.key += 1
+            elif c in _WS:
+                self._end_scalar(out, i)
+            elif self.scalar_start is None:
+                self.scalar_start = i
+            i += 1
+        self.pos = i
+        return out
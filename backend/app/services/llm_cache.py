@@ -0,0 +1,110 @@
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from prometheus_client import Counter
+import redis
+from app.core.config import settings
+from app.core.redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_HITS = Counter("okr_llm_cache_hits_total", "Respostes LLM servides des de la cache", ["tier"])
+LLM_CACHE_MISSES = Counter("okr_llm_cache_misses_total", "Crides LLM sense entrada a la cache")
+LLM_CACHE_EVICTIONS = Counter("okr_llm_cache_evictions_total", "Entrades expulsades de la cache local", ["reason"])
+
+REDIS_PREFIX = "llmcache:"
+
+_ws = re.compile(r"\s+")
+
+def normalize_prompt(prompt: str) -> str:
+    return _ws.sub(" ", prompt).strip()
+
+def make_key(prompt: str, model: str, temperature: float, system: str = "", options: dict | None = None) -> str:
+    """Clau per contingut: hash del prompt normalitzat, model, temperatura, system prompt
+    i opcions de la crida (max_tokens, format de resposta)."""
+    payload = json.dumps([model, round(float(temperature), 3), normalize_prompt(system), normalize_prompt(prompt),
+                          options or {}], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LRUCache:
+    """LRU en procés amb TTL i límit per nombre d'entrades i per bytes."""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def _drop(self, key: str, reason: str):
+        _, value = self._data.pop(key)
+        self._bytes -= len(value.encode("utf-8"))
+        LLM_CACHE_EVICTIONS.labels(reason=reason).inc()
+
+    def get(self, key: str) -> str | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            self._drop(key, "expired")
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._data:
+            _, old = self._data.pop(key)
+            self._bytes -= len(old.encode("utf-8"))
+        self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._bytes += size
+        while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+            self._drop(next(iter(self._data)), "size")
+
+    def clear(self):
+        self._data.clear()
+        self._bytes = 0
+
+_local = LRUCache(settings.LLM_CACHE_MAX_ENTRIES, settings.LLM_CACHE_MAX_BYTES, settings.LLM_CACHE_TTL_SECONDS)
+
+async def get(key: str, record_miss: bool = True) -> str | None:
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    value = _local.get(key)
+    if value is not None:
+        LLM_CACHE_HITS.labels(tier="local").inc()
+        return value
+    client = get_async_redis()
+    if client is not None:
+        try:
+            value = await client.get(REDIS_PREFIX + key)
+        except redis.RedisError as e:
+            logger.warning(f"LLM cache: Redis no disponible ({e})")
+            value = None
+        if value is not None:
+            LLM_CACHE_HITS.labels(tier="redis").inc()
+            _local.set(key, value)
+            return value
+    if record_miss:
+        LLM_CACHE_MISSES.inc()
+    return None
+
+async def put(key: str, value: str):
+    if not settings.LLM_CACHE_ENABLED or not value:
+        return
+    _local.set(key, value)
+    client = get_async_redis()
+    if client is not None:
+        try:
+            await client.set(REDIS_PREFIX + key, value, ex=settings.LLM_CACHE_REDIS_TTL_SECONDS)
+        except redis.RedisError as e:
+            logger.warning(f"LLM cache: no s'ha pogut desar a Redis ({e})")
@@ -0,0 +1,83 @@
+"""Lectures d'OKRs desats (llistat paginat i detall)."""
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import select, and_, or_
+from sqlalchemy.orm import selectinload
+from app.db.session import AsyncSessionLocal
+from app.db.models import OkrSubmission
+
+class InvalidCursor(ValueError):
+    pass
+
+# Columnes del llistat: el feedback (comprimit, cal descomprimir-lo) només si es demana
+_SUMMARY_COLUMNS = (
+    OkrSubmission.id, OkrSubmission.objective, OkrSubmission.score, OkrSubmission.clarity,
+    OkrSubmission.focus, OkrSubmission.writing, OkrSubmission.created_at,
+)
+
+def encode_cursor(created_at: datetime, okr_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), okr_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, okr_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(okr_id)
+    except Exception as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+async def list_okrs(
+    limit: int = 50,
+    cursor: str | None = None,
+    min_score: float | None = None,
+    max_score: float | None = None,
+    from_date: datetime | None = None,
+    to_date: datetime | None = None,
+    include_feedback: bool = False,
+) -> tuple[list[dict], str | None]:
+    """Pàgina d'OKRs, del més recent al més antic.
+
+    Paginació keyset sobre (created_at, id): recorre ix_okr_submissions_created_at
+    (InnoDB hi afegeix la PK) sense OFFSET, així que el cost no creix amb la pàgina.
+    `to_date` és exclusiu (l'endpoint hi suma un dia si només porta data).
+    Retorna (files, cursor de la pàgina següent o None).
+    """
+    columns = _SUMMARY_COLUMNS + ((OkrSubmission.feedback,) if include_feedback else ())
+    q = select(*columns).where(OkrSubmission.created_at.is_not(None))
+    if min_score is not None:
+        q = q.where(OkrSubmission.score >= min_score)
+    if max_score is not None:
+        q = q.where(OkrSubmission.score <= max_score)
+    if from_date is not None:
+        q = q.where(OkrSubmission.created_at >= from_date)
+    if to_date is not None:
+        q = q.where(OkrSubmission.created_at < to_date)
+    if cursor:
+        after_created, after_id = decode_cursor(cursor)
+        q = q.where(or_(
+            OkrSubmission.created_at < after_created,
+            and_(OkrSubmission.created_at == after_created, OkrSubmission.id < after_id),
+        ))
+    # Una fila de més per saber si hi ha pàgina següent
+    q = q.order_by(OkrSubmission.created_at.desc(), OkrSubmission.id.desc()).limit(limit + 1)
+
+    async with AsyncSessionLocal() as db:
+        rows = [dict(r._mapping) for r in await db.execute(q)]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return rows, next_cursor
+
+async def get_okr(okr_id: str) -> OkrSubmission | None:
+    """Detall amb els KRs carregats en una sola consulta addicional (selectinload)."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(OkrSubmission)
+            .options(selectinload(OkrSubmission.key_results))
+            .where(OkrSubmission.id == okr_id)
+        )
+        return result.scalar_one_or_none()
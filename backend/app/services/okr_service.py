@@ -1,200 +1,235 @@
 import uuid
 import json
+import time
+import asyncio
 from datetime import datetime
-from app.services.scoring import score_objective, score_kr
-from app.services.ai_service import llm_feedback
-from app.db.session import SessionLocal
+from typing import AsyncIterator, Callable
+import redis
+from prometheus_client import Counter
+from sqlalchemy import insert, select
+from sqlalchemy.exc import InterfaceError, OperationalError
+from app.core.config import settings
+from app.core.redis_client import get_async_redis
+from app.services.scoring import score_objective, score_kr, score_many, score_kr_many, PASS_THRESHOLD
+from app.services.ai_service import llm_feedback, llm_feedback_stream, cache_key
+from app.services.json_stream import IncrementalJsonParser
+from app.services.singleflight import SingleFlight
+from app.services import llm_cache, similarity, resilience
+from app.services.prompts import Prompt, objective_prompt, kr_prompt
+from app.services.analytics import apply_rollups
+from app.core.tracing import stage
+from app.db.session import AsyncSessionLocal
 from app.db.models import OkrSubmission, KeyResult
+from app.db.writer import writer
 import logging
 
 logger = logging.getLogger(__name__)
 
-async def evaluate_objective(objective: str):
-    """
-    Evalúa un objetivo usando IA y devuelve estructura compatible con frontend.
-    """
-    
-    # 🔥 PROMPT OPTIMIZADO PARA JSON CONSISTENTE
-    json_prompt = f"""
-Eres un consultor experto en OKRs con 15 años de experiencia. Evalúa este objetivo empresarial: "{objective}"
-
-Analiza el objetivo usando el framework SMART y proporciona una evaluación detallada y accionable.
-
-Responde ÚNICAMENTE en formato JSON válido con esta estructura EXACTA:
-{{
-    "overall_score": [número del 1-10 con 1 decimal],
-    "feedback": "Evaluación general detallada en 4-6 líneas que explique las fortalezas principales, las debilidades críticas y el potencial impacto del objetivo",
-    "criteria": {{
-        "specific": {{
-            "score": [1-10],
-            "comment": "Análisis detallado de 30-40 palabras sobre claridad, concreción y especificidad del objetivo"
-        }},
-        "measurable": {{
-            "score": [1-10], 
-            "comment": "Análisis detallado de 30-40 palabras sobre métricas, cuantificación y capacidad de medición"
-        }},
-        "achievable": {{
-            "score": [1-10],
-            "comment": "Análisis detallado de 30-40 palabras sobre realismo, recursos necesarios y factibilidad"
-        }},
-        "relevant": {{
-            "score": [1-10],
-            "comment": "Análisis detallado de 30-40 palabras sobre alineación estratégica e impacto empresarial"
-        }},
-        "timebound": {{
-            "score": [1-10],
-            "comment": "Análisis detallado de 30-40 palabras sobre marco temporal, urgencia y deadlines"
-        }}
-    }},
-    "suggestions": [
-        "Sugerencia específica y accionable 1 (15-25 palabras con pasos concretos)",
-        "Sugerencia específica y accionable 2 (15-25 palabras con pasos concretos)",
-        "Sugerencia específica y accionable 3 (15-25 palabras con pasos concretos)",
-        "Sugerencia específica y accionable 4 (15-25 palabras con pasos concretos)"
-    ]
-}}
-
-REQUISITOS CRÍTICOS:
-- Sé específico y detallado en cada análisis
-- Proporciona insights accionables que ayuden a mejorar el objetivo
-- Usa un tono profesional pero accesible
-- Cada criterio debe tener comentarios de 30-40 palabras mínimo
-- Las sugerencias deben ser implementables inmediatamente
-- Responde SOLO el JSON, sin texto adicional antes o después
+LLM_COALESCED = Counter("okr_llm_coalesced_total", "Avaluacions que han reaprofitat una crida LLM en curs", ["scope"])
+
+_flights = SingleFlight()
+
+class UnknownObjective(LookupError):
+    pass
+
+# Compare-and-delete: només allibera el lease si encara és nostre
+_RELEASE_LEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
 """
 
-    # Scoring heurístico para base de datos
-    heur = score_objective(objective)
-    okr_id = str(uuid.uuid4())
-    
-    # 🔥 LLAMADA A IA CON MANEJO DE ERRORES ROBUSTO
+async def _leased_feedback(key: str, prompt: Prompt, validate: Callable[[str], bool] | None = None) -> str:
+    """Crida LLM protegida per un lease a Redis perquè només un worker la faci.
+    Els altres workers esperen que el resultat aparegui a la cache compartida.
+    """
+    client = get_async_redis()
+    if client is None:
+        return await llm_feedback(prompt, validate=validate)
+
+    lease_key = f"llmlease:{key}"
+    token = uuid.uuid4().hex
     try:
-        ai_response = await llm_feedback(json_prompt)
-        logger.info(f"🔍 Respuesta IA recibida para OKR {okr_id}")
-        
-        # 🔥 PARSEAR JSON CON VALIDACIÓN
+        acquired = await client.set(lease_key, token, nx=True, px=int(settings.SINGLEFLIGHT_LEASE_SECONDS * 1000))
+    except redis.RedisError:
+        acquired = True  # sense Redis, cada worker va pel seu compte
+
+    if not acquired:
+        deadline = time.monotonic() + settings.SINGLEFLIGHT_LEASE_SECONDS
         try:
-            ai_data = json.loads(ai_response)
-            
-            # Validar que tenemos los campos esenciales
-            required_fields = ['overall_score', 'feedback', 'criteria', 'suggestions']
-            missing_fields = [field for field in required_fields if field not in ai_data]
-            
-            if missing_fields:
-                raise ValueError(f"Faltan campos requeridos: {missing_fields}")
-            
-            # Validar estructura de criteria
-            required_criteria = ['specific', 'measurable', 'achievable', 'relevant', 'timebound']
-            criteria = ai_data.get('criteria', {})
-            for criterion in required_criteria:
-                if criterion not in criteria:
-                    criteria[criterion] = {"score": 5, "comment": f"Error: criterio {criterion} no evaluado"}
-                elif not isinstance(criteria[criterion], dict):
-                    criteria[criterion] = {"score": 5, "comment": f"Error: formato incorrecto para {criterion}"}
-                elif 'score' not in criteria[criterion] or 'comment' not in criteria[criterion]:
-                    criteria[criterion] = {
-                        "score": criteria[criterion].get('score', 5),
-                        "comment": criteria[criterion].get('comment', f"Comentario no disponible para {criterion}")
-                    }
-            
-            logger.info(f"✅ JSON parseado exitosamente. Score: {ai_data['overall_score']}")
-            logger.info(f"✅ Feedback length: {len(ai_data.get('feedback', ''))}")
-            logger.info(f"✅ Criteria keys: {list(ai_data.get('criteria', {}).keys())}")
-            logger.info(f"✅ Suggestions count: {len(ai_data.get('suggestions', []))}")
-            
-        except (json.JSONDecodeError, ValueError, KeyError) as e:
-            logger.error(f"❌ Error parsing JSON: {e}")
-            logger.error(f"❌ Respuesta que falló: {ai_response[:500]}...")
-            
-            # Fallback con datos heurísticos estructurados
-            ai_data = {
-                "overall_score": float(heur["total"]),
-                "feedback": f"Error en análisis de IA. Evaluación heurística: {heur['total']}/10 puntos. El objetivo requiere revisión manual para análisis completo.",
-                "criteria": {
-                    "specific": {
-                        "score": float(heur.get("clarity", 5)), 
-                        "comment": "Análisis automático basado en claridad del texto. Se recomienda revisión manual."
-                    },
-                    "measurable": {
-                        "score": float(heur.get("focus", 5)), 
-                        "comment": "Análisis automático basado en enfoque detectado. Verificar métricas específicas."
-                    },
-                    "achievable": {
-                        "score": 5.0, 
-                        "comment": "Análisis automático - requiere evaluación manual del contexto empresarial."
-                    },
-                    "relevant": {
-                        "score": float(heur.get("focus", 5)), 
-                        "comment": "Análisis automático basado en relevancia percibida. Validar alineación estratégica."
-                    },
-                    "timebound": {
-                        "score": float(heur.get("writing", 5)), 
-                        "comment": "Análisis automático basado en redacción. Verificar timeline específico."
-                    }
-                },
-                "suggestions": [
-                    "Revisar la especificidad del objetivo con métricas concretas",
-                    "Añadir indicadores cuantificables y fechas límite claras",
-                    "Evaluar la factibilidad con recursos y capacidades disponibles",
-                    "Establecer hitos intermedios y timeline detallado de implementación"
-                ]
-            }
-            
-    except Exception as e:
-        logger.error(f"❌ Error en llamada IA: {e}")
-        
-        # Fallback de emergencia con estructura completa
+            while time.monotonic() < deadline:
+                await asyncio.sleep(settings.SINGLEFLIGHT_POLL_SECONDS)
+                cached = await llm_cache.get(key, record_miss=False)
+                if cached is not None:
+                    LLM_COALESCED.labels(scope="redis").inc()
+                    return cached
+                if not await client.exists(lease_key):
+                    break  # el líder ha acabat sense resultat desat (error o resposta invàlida): ho provem nosaltres
+        except redis.RedisError:
+            pass
+        return await llm_feedback(prompt, validate=validate)
+
+    try:
+        return await llm_feedback(prompt, validate=validate)
+    finally:
+        try:
+            await client.eval(_RELEASE_LEASE, 1, lease_key, token)
+        except redis.RedisError:
+            pass
+
+async def coalesced_feedback(prompt: Prompt) -> str:
+    """llm_feedback amb single-flight: peticions idèntiques concurrents comparteixen una sola crida."""
+    key = cache_key(prompt)
+    validate = _VALIDATORS.get(prompt.endpoint)
+    result, shared = await _flights.do(key, lambda: _leased_feedback(key, prompt, validate))
+    if shared:
+        LLM_COALESCED.labels(scope="local").inc()
+    return result
+
+_REQUIRED_FIELDS = ('overall_score', 'feedback', 'criteria', 'suggestions')
+
+def objective_response_valid(ai_response: str) -> bool:
+    """JSON amb els camps que parse_objective_response exigeix (si no, hi aplicaria el fallback)."""
+    try:
+        data = json.loads(ai_response)
+    except json.JSONDecodeError:
+        return False
+    return isinstance(data, dict) and all(f in data for f in _REQUIRED_FIELDS)
+
+# Validació abans de desar a la cache, per endpoint del prompt (el feedback dels KRs és text lliure)
+_VALIDATORS = {"objective": objective_response_valid}
+
+async def reusable_feedback(objective: str) -> tuple[str, dict] | None:
+    """Resposta LLM d'un objectiu quasi idèntic ja avaluat (app/services/similarity.py),
+    si encara és a la cache. Retorna (resposta, metadades de reutilització) o None."""
+    if not settings.SIMILARITY_ENABLED:
+        return None
+    matches = similarity.get_index().neighbours(objective, settings.SIMILARITY_THRESHOLD)
+    if not matches:
+        similarity.SIMILARITY_LOOKUPS.labels(outcome="no_match").inc()
+        return None
+    for sim, okr_id, other in matches[:3]:
+        cached = await llm_cache.get(cache_key(objective_prompt(other)), record_miss=False)
+        if cached is None:
+            continue
+        if objective_response_valid(cached):
+            similarity.SIMILARITY_LOOKUPS.labels(outcome="reused").inc()
+            return cached, {"reused": True, "reused_from": okr_id, "similarity": round(sim, 3)}
+    similarity.SIMILARITY_LOOKUPS.labels(outcome="not_cached").inc()
+    return None
+
+def parse_objective_response(ai_response: str, heur: dict) -> dict:
+    """Valida el JSON de la IA; si és invàlid retorna el fallback heurístic."""
+    # 🔥 PARSEAR JSON CON VALIDACIÓN
+    try:
+        ai_data = json.loads(ai_response)
+
+        # Validar que tenemos los campos esenciales
+        required_fields = ['overall_score', 'feedback', 'criteria', 'suggestions']
+        missing_fields = [field for field in required_fields if field not in ai_data]
+
+        if missing_fields:
+            raise ValueError(f"Faltan campos requeridos: {missing_fields}")
+
+        # Validar estructura de criteria
+        required_criteria = ['specific', 'measurable', 'achievable', 'relevant', 'timebound']
+        criteria = ai_data.get('criteria', {})
+        for criterion in required_criteria:
+            if criterion not in criteria:
+                criteria[criterion] = {"score": 5, "comment": f"Error: criterio {criterion} no evaluado"}
+            elif not isinstance(criteria[criterion], dict):
+                criteria[criterion] = {"score": 5, "comment": f"Error: formato incorrecto para {criterion}"}
+            elif 'score' not in criteria[criterion] or 'comment' not in criteria[criterion]:
+                criteria[criterion] = {
+                    "score": criteria[criterion].get('score', 5),
+                    "comment": criteria[criterion].get('comment', f"Comentario no disponible para {criterion}")
+                }
+
+        logger.info(f"✅ JSON parseado exitosamente. Score: {ai_data['overall_score']}")
+        logger.info(f"✅ Feedback length: {len(ai_data.get('feedback', ''))}")
+        logger.info(f"✅ Criteria keys: {list(ai_data.get('criteria', {}).keys())}")
+        logger.info(f"✅ Suggestions count: {len(ai_data.get('suggestions', []))}")
+
+    except (json.JSONDecodeError, ValueError, KeyError) as e:
+        logger.error(f"❌ Error parsing JSON: {e}")
+        logger.error(f"❌ Respuesta que falló: {ai_response[:500]}...")
+
+        # Fallback con datos heurísticos estructurados
         ai_data = {
             "overall_score": float(heur["total"]),
-            "feedback": f"Error en servicio de IA. Puntuación heurística: {heur['total']}/10. Contactar soporte técnico para análisis completo.",
+            "feedback": f"Error en análisis de IA. Evaluación heurística: {heur['total']}/10 puntos. El objetivo requiere revisión manual para análisis completo.",
             "criteria": {
                 "specific": {
                     "score": float(heur.get("clarity", 5)), 
-                    "comment": "Error en análisis específico - revisar conectividad con servicio de IA"
+                    "comment": "Análisis automático basado en claridad del texto. Se recomienda revisión manual."
                 },
                 "measurable": {
                     "score": float(heur.get("focus", 5)), 
-                    "comment": "Error en análisis de medición - validar configuración del sistema"
+                    "comment": "Análisis automático basado en enfoque detectado. Verificar métricas específicas."
                 },
                 "achievable": {
                     "score": 5.0, 
-                    "comment": "Error en análisis de factibilidad - requiere evaluación manual"
+                    "comment": "Análisis automático - requiere evaluación manual del contexto empresarial."
                 },
                 "relevant": {
                     "score": float(heur.get("focus", 5)), 
-                    "comment": "Error en análisis de relevancia - verificar configuración de servicio"
+                    "comment": "Análisis automático basado en relevancia percibida. Validar alineación estratégica."
                 },
                 "timebound": {
                     "score": float(heur.get("writing", 5)), 
-                    "comment": "Error en análisis temporal - contactar administrador del sistema"
+                    "comment": "Análisis automático basado en redacción. Verificar timeline específico."
                 }
             },
             "suggestions": [
-                "Error obteniendo sugerencias - revisar configuración del servicio de IA",
-                "Contactar soporte técnico para análisis detallado del objetivo",
-                "Verificar conectividad y configuración del sistema",
-                "Intentar evaluación manual mientras se resuelve el problema técnico"
+                "Revisar la especificidad del objetivo con métricas concretas",
+                "Añadir indicadores cuantificables y fechas límite claras",
+                "Evaluar la factibilidad con recursos y capacidades disponibles",
+                "Establecer hitos intermedios y timeline detallado de implementación"
             ]
         }
-        ai_response = f"Error: {str(e)}"
 
-    # Guardar en base de datos
-    try:
-        with SessionLocal() as db:
-            db.add(OkrSubmission(
-                id=okr_id,
-                objective=objective,
-                clarity=heur['clarity'],
-                focus=heur['focus'],
-                writing=heur['writing'],
-                score=heur['total'],
-                feedback=ai_data.get("feedback", "Error guardando feedback")
-            ))
-            db.commit()
-            logger.info(f"💾 OKR guardado en BD con ID: {okr_id}")
-    except Exception as e:
-        logger.error(f"❌ Error guardando en BD: {e}")
+    return ai_data
 
+def service_fallback(heur: dict) -> dict:
+    """Resposta completa basada en l'heurística quan el servei d'IA falla."""
+    # Fallback de emergencia con estructura completa
+    return {
+        "overall_score": float(heur["total"]),
+        "feedback": f"Error en servicio de IA. Puntuación heurística: {heur['total']}/10. Contactar soporte técnico para análisis completo.",
+        "criteria": {
+            "specific": {
+                "score": float(heur.get("clarity", 5)), 
+                "comment": "Error en análisis específico - revisar conectividad con servicio de IA"
+            },
+            "measurable": {
+                "score": float(heur.get("focus", 5)), 
+                "comment": "Error en análisis de medición - validar configuración del sistema"
+            },
+            "achievable": {
+                "score": 5.0, 
+                "comment": "Error en análisis de factibilidad - requiere evaluación manual"
+            },
+            "relevant": {
+                "score": float(heur.get("focus", 5)), 
+                "comment": "Error en análisis de relevancia - verificar configuración de servicio"
+            },
+            "timebound": {
+                "score": float(heur.get("writing", 5)), 
+                "comment": "Error en análisis temporal - contactar administrador del sistema"
+            }
+        },
+        "suggestions": [
+            "Error obteniendo sugerencias - revisar configuración del servicio de IA",
+            "Contactar soporte técnico para análisis detallado del objetivo",
+            "Verificar conectividad y configuración del sistema",
+            "Intentar evaluación manual mientras se resuelve el problema técnico"
+        ]
+    }
+
+def build_objective_result(okr_id: str, heur: dict, ai_data: dict, ai_response: str, debug: bool = False) -> dict:
+    """Resultat complet de l'avaluació. Els camps debug_* (la resposta del model
+    en cru i parsejada) només s'hi afegeixen amb `debug`."""
     # 🔥 ESTRUCTURA FINAL COMPATIBLE CON FRONTEND
     result = {
         # Datos principales (estructura que espera el frontend)
@@ -203,10 +238,6 @@ REQUISITOS CRÍTICOS:
         "criteria": ai_data["criteria"],
         "suggestions": ai_data["suggestions"],
         
-        # Debug info (para desarrollo)
-        "debug_ai_response": ai_response,
-        "debug_parsed": ai_data,
-        
         # Metadata adicional
         "okr_id": okr_id,
         "model_used": "gpt-4o-mini",
@@ -219,40 +250,279 @@ REQUISITOS CRÍTICOS:
             "focus": heur["focus"],
             "writing": heur["writing"]
         },
-        "can_add_krs": ai_data["overall_score"] >= 7.5
+        "can_add_krs": ai_data["overall_score"] >= PASS_THRESHOLD
     }
+    if debug:
+        # Debug info (para desarrollo)
+        result["debug_ai_response"] = ai_response
+        result["debug_parsed"] = ai_data
+    return result
+
+def kr_heuristic_feedback(heur: dict) -> str:
+    """Feedback del KR quan el servei d'IA no respon (circuit obert o deadline esgotat)."""
+    notes = " ".join(heur["notes"]) or "Sin observaciones heurísticas."
+    return f"Servicio de IA no disponible. Evaluación heurística: {heur['total']}/10. {notes}"
+
+def build_kr_result(kr_id: str, heur: dict, fb: str) -> dict:
+    return {
+        "key_result_id": kr_id,
+        "score": heur["total"],
+        "breakdown": {
+            "clarity": heur["clarity"], 
+            "measurability": heur["measurability"], 
+            "feasibility": heur["feasibility"]
+        },
+        "feedback": fb,
+        "allow_next_kr": heur["total"] >= PASS_THRESHOLD
+    }
+
+async def save_objective(okr_id: str, objective: str, heur: dict, ai_data: dict):
+    # Write-behind: s'encua i es desa en segon pla (app/db/writer.py)
+    try:
+        await writer.submit(OkrSubmission, {
+            "id": okr_id,
+            "objective": objective,
+            "clarity": heur['clarity'],
+            "focus": heur['focus'],
+            "writing": heur['writing'],
+            "score": heur['total'],
+            "overall_score": ai_data["overall_score"],
+            "feedback": ai_data.get("feedback", "Error guardando feedback"),
+        })
+        logger.info(f"💾 OKR encolado para BD con ID: {okr_id}")
+    except Exception as e:
+        logger.error(f"❌ Error guardando en BD: {e}")
+
+async def evaluate_objective(objective: str, debug: bool = False):
+    """
+    Evalúa un objetivo usando IA y devuelve estructura compatible con frontend.
+    Con `debug`, incluye la respuesta de la IA en crudo (debug_*).
+    """
+    
+    with stage("prompt"):
+        json_prompt = objective_prompt(objective)
+
+    # Scoring heurístico para base de datos
+    with stage("heuristic"):
+        heur = score_objective(objective)
+    okr_id = str(uuid.uuid4())
+    
+    # Objectiu quasi idèntic ja avaluat: es reutilitza la seva resposta
+    reuse = await reusable_feedback(objective)
+    reuse_info = {}
+
+    # 🔥 LLAMADA A IA CON MANEJO DE ERRORES ROBUSTO
+    try:
+        if reuse is not None:
+            ai_response, reuse_info = reuse
+            logger.info(f"♻️ Evaluación reutilizada de {reuse_info['reused_from']} (similitud {reuse_info['similarity']})")
+        else:
+            ai_response = await coalesced_feedback(json_prompt)
+            logger.info(f"🔍 Respuesta IA recibida para OKR {okr_id}")
+            similarity.remember(okr_id, objective)
+        
+        with stage("parse"):
+            ai_data = parse_objective_response(ai_response, heur)
+
+    except Exception as e:
+        logger.error(f"❌ Error en llamada IA: {e}")
+        
+        ai_data = service_fallback(heur)
+        ai_response = f"Error: {str(e)}"
+        degraded = True
+    else:
+        degraded = False
+
+    # Guardar en base de datos
+    await save_objective(okr_id, objective, heur, ai_data)
+
+    result = build_objective_result(okr_id, heur, ai_data, ai_response, debug)
+    result.update(reuse_info)
+    if degraded:
+        result["status"] = "degraded"
     
     logger.info(f"🎯 RESULTADO FINAL - ID: {okr_id}, Score: {result['score']}")
     return result
 
 
+async def evaluate_objective_stream(objective: str) -> AsyncIterator[tuple[str, dict]]:
+    """Variant en streaming d'evaluate_objective: genera parelles (event, dades).
+
+    heuristic  -> breakdown heurístic, immediatament
+    score / feedback / criterion / suggestion -> a mesura que el model els genera
+    done       -> resultat final amb okr_id, un cop desat a BD
+    """
+    with stage("heuristic"):
+        heur = score_objective(objective)
+    okr_id = str(uuid.uuid4())
+    yield "heuristic", {
+        "score": heur["total"],
+        "breakdown": {"clarity": heur["clarity"], "focus": heur["focus"], "writing": heur["writing"]},
+        "notes": heur["notes"],
+    }
+
+    parser = IncrementalJsonParser()
+    parts: list[str] = []
+    try:
+        async for delta in llm_feedback_stream(objective_prompt(objective), validate=objective_response_valid):
+            parts.append(delta)
+            for path, value in parser.feed(delta):
+                if path == ("overall_score",):
+                    yield "score", {"overall_score": value}
+                elif path == ("feedback",):
+                    yield "feedback", {"feedback": value}
+                elif len(path) == 2 and path[0] == "criteria":
+                    yield "criterion", {"name": path[1], **(value if isinstance(value, dict) else {"value": value})}
+                elif len(path) == 2 and path[0] == "suggestions":
+                    yield "suggestion", {"index": path[1], "text": value}
+        ai_response = "".join(parts)
+        with stage("parse"):
+            ai_data = parse_objective_response(ai_response, heur)
+    except Exception as e:
+        logger.error(f"❌ Error en llamada IA (stream): {e}")
+        yield "error", {"detail": "Error en servicio de IA; se usa la evaluación heurística"}
+        ai_data = service_fallback(heur)
+        ai_response = f"Error: {str(e)}"
+
+    await save_objective(okr_id, objective, heur, ai_data)
+    result = build_objective_result(okr_id, heur, ai_data, ai_response)
+    yield "done", {k: result[k] for k in ("okr_id", "score", "breakdown", "feedback", "criteria", "suggestions", "can_add_krs")}
+
+
+async def objective_known(okr_id: str) -> bool:
+    """L'objectiu existeix o hi és en camí: a la cua d'aquest procés, a la BD (s'espera
+    KR_PARENT_WAIT_SECONDS per si és a la cua d'un altre worker) o al fitxer de spill.
+    Amb la BD caiguda no es pot saber: es dona per bo i el writer el reintentarà."""
+    deadline = time.monotonic() + settings.KR_PARENT_WAIT_SECONDS
+    while not writer.has_pending(okr_id):
+        try:
+            async with AsyncSessionLocal() as db:
+                if await db.scalar(select(OkrSubmission.id).where(OkrSubmission.id == okr_id)) is not None:
+                    return True
+        except (OperationalError, InterfaceError, OSError):
+            return True
+        if time.monotonic() >= deadline:
+            return await asyncio.to_thread(writer.spilled, OkrSubmission.__tablename__, okr_id)
+        await asyncio.sleep(0.1)
+    return True
+
 async def evaluate_kr(okr_id: str, kr_definition: str, target_value: str, target_date: str):
-    """Evalúa un Key Result - mantener funcionalidad existente"""
+    """Evalúa un Key Result - mantener funcionalidad existente.
+    UnknownObjective si `okr_id` no existeix (abans de respondre, no en escriure la fila)."""
+    # En paral·lel amb el LLM: l'espera per un objectiu d'un altre worker no suma latència
+    known = asyncio.create_task(objective_known(okr_id))
     try:
-        heur = score_kr(kr_definition, target_value, target_date)
-        fb = await llm_feedback(f"Avalua RESULTAT CLAU d'OKR. KR: '{kr_definition}'; Valor: {target_value}; Data: {target_date}. Dona 3-6 millores concretes.")
+        with stage("heuristic"):
+            heur = score_kr(kr_definition, target_value, target_date)
+        with stage("prompt"):
+            prompt = kr_prompt(kr_definition, target_value, target_date)
+        try:
+            fb = await coalesced_feedback(prompt)
+        except Exception as e:
+            if not (isinstance(e, resilience.CircuitOpenError) or resilience.is_retryable(e)):
+                raise
+            logger.error(f"❌ Servicio de IA no disponible, KR con evaluación heurística: {e}")
+            fb = kr_heuristic_feedback(heur)
+        if not await known:
+            raise UnknownObjective(f"Unknown okr_id: {okr_id}")
         kr_id = str(uuid.uuid4())
         
-        with SessionLocal() as db:
-            db.add(KeyResult(
-                id=kr_id, okr_id=okr_id, kr_definition=kr_definition,
-                target_value=target_value, target_date=target_date,
-                clarity=heur['clarity'], measurability=heur['measurability'], 
-                feasibility=heur['feasibility'], score=heur['total'], feedback=fb
-            ))
-            db.commit()
-            
-        return {
-            "key_result_id": kr_id,
-            "score": heur["total"],
-            "breakdown": {
-                "clarity": heur["clarity"], 
-                "measurability": heur["measurability"], 
-                "feasibility": heur["feasibility"]
-            },
-            "feedback": fb,
-            "allow_next_kr": heur["total"] >= 7.5
-        }
+        await writer.submit(KeyResult, {
+            "id": kr_id, "okr_id": okr_id, "kr_definition": kr_definition,
+            "target_value": target_value, "target_date": datetime.fromisoformat(target_date),
+            "clarity": heur['clarity'], "measurability": heur['measurability'],
+            "feasibility": heur['feasibility'], "score": heur['total'], "feedback": fb,
+        })
+
+        return build_kr_result(kr_id, heur, fb)
     except Exception as e:
         logger.error(f"Error evaluating KR: {e}")
-        raise
\ No newline at end of file
+        raise
+    finally:
+        known.cancel()
+
+
+async def evaluate_batch(objectives: list, debug: bool = False) -> dict:
+    """Avalua molts objectius (i els seus KRs) d'una tirada.
+
+    Heurística en una sola passada, crides LLM en paral·lel amb concurrència
+    limitada (BATCH_LLM_CONCURRENCY) i totes les files en una sola transacció.
+    Els errors es retornen per element en lloc de fer fallar tot el lot.
+    """
+    with stage("heuristic"):
+        heur_objs = score_many(o.objective for o in objectives)
+        heur_krs = [
+            score_kr_many((kr.kr_definition, kr.target_value, kr.target_date.isoformat()) for kr in o.key_results)
+            for o in objectives
+        ]
+
+    sem = asyncio.Semaphore(max(1, settings.BATCH_LLM_CONCURRENCY))
+
+    async def bounded(prompt: Prompt) -> str:
+        async with sem:
+            return await coalesced_feedback(prompt)
+
+    responses = await asyncio.gather(
+        *(bounded(objective_prompt(o.objective)) for o in objectives),
+        *(bounded(kr_prompt(kr.kr_definition, kr.target_value, kr.target_date.isoformat()))
+          for o in objectives for kr in o.key_results),
+        return_exceptions=True,
+    )
+    kr_responses = iter(responses[len(objectives):])
+
+    okr_rows, kr_rows, results = [], [], []
+    for i, (item, heur, ai_response) in enumerate(zip(objectives, heur_objs, responses)):
+        okr_id = str(uuid.uuid4())
+        if isinstance(ai_response, BaseException):
+            logger.error(f"❌ Error en llamada IA (lote, objetivo {i}): {ai_response}")
+            ai_data = service_fallback(heur)
+            ai_response = f"Error: {str(ai_response)}"
+        else:
+            with stage("parse"):
+                ai_data = parse_objective_response(ai_response, heur)
+
+        okr_rows.append({
+            "id": okr_id, "objective": item.objective,
+            "clarity": heur['clarity'], "focus": heur['focus'], "writing": heur['writing'],
+            "score": heur['total'], "overall_score": ai_data["overall_score"],
+            "feedback": ai_data.get("feedback", "Error guardando feedback"),
+        })
+        entry = {"index": i, **build_objective_result(okr_id, heur, ai_data, ai_response, debug), "key_results": []}
+
+        for j, (kr, kheur) in enumerate(zip(item.key_results, heur_krs[i])):
+            fb = next(kr_responses)
+            if isinstance(fb, BaseException):
+                logger.error(f"❌ Error en llamada IA (lote, KR {i}.{j}): {fb}")
+                entry["key_results"].append({"index": j, "error": f"Error en servicio de IA: {fb}"})
+                continue
+            kr_id = str(uuid.uuid4())
+            kr_rows.append({
+                "id": kr_id, "okr_id": okr_id, "kr_definition": kr.kr_definition,
+                "target_value": kr.target_value, "target_date": datetime.combine(kr.target_date, datetime.min.time()),
+                "clarity": kheur['clarity'], "measurability": kheur['measurability'],
+                "feasibility": kheur['feasibility'], "score": kheur['total'], "feedback": fb,
+            })
+            entry["key_results"].append({"index": j, **build_kr_result(kr_id, kheur, fb)})
+        results.append(entry)
+
+    # Guardar en base de datos: un únic INSERT multi-fila per taula
+    try:
+        with stage("db_commit"):
+            async with AsyncSessionLocal() as db:
+                await db.execute(insert(OkrSubmission), okr_rows)
+                if kr_rows:
+                    await db.execute(insert(KeyResult), kr_rows)
+                await apply_rollups(db, {OkrSubmission: okr_rows, KeyResult: kr_rows})
+                await db.commit()
+            logger.info(f"💾 Lote guardado en BD: {len(okr_rows)} OKRs, {len(kr_rows)} KRs")
+    except Exception as e:
+        logger.error(f"❌ Error guardando lote en BD: {e}")
+        for entry in results:
+            entry["error"] = f"Error guardando en BD: {e}"
+            for kr_entry in entry["key_results"]:
+                kr_entry.setdefault("error", f"Error guardando en BD: {e}")
+
+    failed = sum(1 for e in results if e.get("error")) + \
+        sum(1 for e in results for k in e["key_results"] if k.get("error"))
+    total = len(results) + sum(len(e["key_results"]) for e in results)
+    return {"results": results, "succeeded": total - failed, "failed": failed}
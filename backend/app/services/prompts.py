@@ -0,0 +1,71 @@
+"""Plantilles de prompt de les crides LLM.
+
+Cada plantilla separa les instruccions estàtiques (system prompt, idèntic byte a
+byte entre crides i sempre al principi, perquè el proveïdor en pugui reutilitzar
+el prefix cachejat) de la part variable (missatge d'usuari: només les dades de
+l'OKR). També fixa el format de resposta (JSON mode per als objectius) i el
+pressupost de max_tokens de cada endpoint.
+"""
+import json
+from dataclasses import dataclass
+from app.core.config import settings
+
+@dataclass(frozen=True)
+class Prompt:
+    endpoint: str                 # etiqueta de les mètriques de tokens
+    system: str
+    user: str
+    json_mode: bool = False
+    max_tokens: int | None = None
+
+    def messages(self) -> list[dict]:
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.user},
+        ]
+
+    def options(self) -> dict:
+        """Paràmetres addicionals de chat.completions.create (formen part de la clau de cache)."""
+        opts = {}
+        if self.max_tokens:
+            opts["max_tokens"] = self.max_tokens
+        if self.json_mode and settings.LLM_JSON_MODE:
+            opts["response_format"] = {"type": "json_object"}
+        return opts
+
+OBJECTIVE_SYSTEM = """Eres un consultor experto en OKRs con 15 años de experiencia. Evalúas objetivos empresariales con el framework SMART y das un feedback concreto, accionable y en tono profesional pero accesible.
+
+Responde solo con un objeto JSON con esta estructura:
+{"overall_score": número 1-10 con 1 decimal,
+ "feedback": "3-4 frases: fortalezas principales, debilidades críticas e impacto potencial",
+ "criteria": {"specific": C, "measurable": C, "achievable": C, "relevant": C, "timebound": C},
+ "suggestions": [4 sugerencias de 15-25 palabras, implementables de inmediato y con pasos concretos]}
+donde cada C es {"score": entero 1-10, "comment": "20-30 palabras"}.
+
+Qué valora cada criterio:
+- specific: claridad y concreción del objetivo
+- measurable: métricas, cuantificación y capacidad de medición
+- achievable: realismo, recursos necesarios y factibilidad
+- relevant: alineación estratégica e impacto empresarial
+- timebound: marco temporal, urgencia y plazos"""
+
+KR_SYSTEM = ("Ets un avaluador d'OKR inspirat en Doerr i Grove. "
+             "Avalues resultats clau: dona 3-6 millores concretes i accionables, "
+             "breus (màxim 1200 caràcters). Evita repeticions i termes vagues.")
+
+def objective_prompt(objective: str) -> Prompt:
+    return Prompt(
+        endpoint="objective",
+        system=OBJECTIVE_SYSTEM,
+        user=f"Objetivo: {json.dumps(objective, ensure_ascii=False)}",
+        json_mode=True,
+        max_tokens=settings.LLM_MAX_TOKENS_OBJECTIVE,
+    )
+
+def kr_prompt(kr_definition: str, target_value: str, target_date: str) -> Prompt:
+    return Prompt(
+        endpoint="key_result",
+        system=KR_SYSTEM,
+        user=f"KR: '{kr_definition}'; Valor: {target_value}; Data: {target_date}.",
+        max_tokens=settings.LLM_MAX_TOKENS_KR,
+    )
@@ -0,0 +1,215 @@
+"""Capa de resiliència per a les crides LLM.
+
+- Deadline per petició (LLM_DEADLINE_SECONDS): cada intent, reintent o petició
+  de cobertura només disposa del pressupost que queda.
+- Reintents amb backoff exponencial i jitter complet, només per a errors
+  transitoris (timeout, connexió, 429, 5xx) i només si caben dins el deadline.
+- Hedging opcional: si la primera petició supera el p95 observat, se'n llança
+  una segona i es queda la primera que acabi bé.
+- Circuit breaker: amb massa errors recents s'obre i les crides fallen a
+  l'instant (CircuitOpenError) perquè el servei respongui amb l'heurística.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+from prometheus_client import Counter, Gauge, Histogram
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+LLM_CALL_SECONDS = Histogram(
+    "okr_llm_call_seconds", "Durada de les crides LLM (inclou reintents i hedging)", ["outcome"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60),
+)
+LLM_RETRIES = Counter("okr_llm_retries_total", "Reintents de crides LLM", ["reason"])
+LLM_HEDGED = Counter("okr_llm_hedged_total", "Peticions de cobertura llançades", ["winner"])
+# Amb diversos workers (gunicorn), el pitjor estat dels processos vius
+LLM_CIRCUIT_STATE = Gauge("okr_llm_circuit_state", "Estat del circuit breaker LLM (0 tancat, 1 obert, 2 semiobert)",
+                          multiprocess_mode="livemax")
+LLM_CIRCUIT_REJECTIONS = Counter("okr_llm_circuit_rejections_total", "Crides LLM rebutjades amb el circuit obert")
+
+class CircuitOpenError(Exception):
+    """El circuit està obert: no es crida el model."""
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """S'ha esgotat el pressupost de temps de la petició."""
+
+def is_retryable(exc: BaseException) -> bool:
+    """Errors transitoris (timeout, connexió, 429, 5xx): compten per al breaker i es poden reintentar."""
+    if isinstance(exc, asyncio.TimeoutError):
+        return True
+    import openai  # diferit: ja el carrega el client abans de cap crida
+    if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError,
+                        openai.RateLimitError, openai.InternalServerError)):
+        return True
+    return isinstance(exc, openai.APIStatusError) and exc.status_code >= 500
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = 0, 1, 2
+
+    def __init__(self, window: int, min_calls: int, failure_ratio: float, reset_seconds: float):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.reset_seconds = reset_seconds
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        LLM_CIRCUIT_STATE.set(self.CLOSED)
+
+    @property
+    def state(self) -> int:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self._set_state(self.HALF_OPEN)
+        return self._state
+
+    def _set_state(self, state: int):
+        if state != self._state:
+            name = {self.CLOSED: "cerrado", self.OPEN: "abierto", self.HALF_OPEN: "semiabierto"}[state]
+            logger.warning(f"⚡ Circuit breaker LLM: {name}")
+        self._state = state
+        LLM_CIRCUIT_STATE.set(state)
+
+    def allow(self):
+        state = self.state
+        if state == self.CLOSED:
+            return
+        if state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True  # una sola crida de prova
+            return
+        LLM_CIRCUIT_REJECTIONS.inc()
+        raise CircuitOpenError("LLM circuit open")
+
+    def record_success(self):
+        self._outcomes.append(True)
+        if self._state == self.HALF_OPEN:
+            self._probe_in_flight = False
+            self._outcomes.clear()
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        self._outcomes.append(False)
+        if self._state == self.HALF_OPEN:
+            self._probe_in_flight = False
+            self._trip()
+            return
+        failures = self._outcomes.count(False)
+        if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_ratio:
+            self._trip()
+
+    def release_probe(self):
+        # La prova ha acabat sense veredicte (p.ex. error del client): se'n permet una altra
+        self._probe_in_flight = False
+
+    def _trip(self):
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self._set_state(self.OPEN)
+
+class LatencyTracker:
+    """Percentil de les últimes crides correctes (per decidir quan fer hedging)."""
+
+    def __init__(self, size: int = 200):
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def quantile(self, q: float, min_samples: int) -> float | None:
+        if len(self._samples) < min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+breaker = CircuitBreaker(
+    settings.LLM_BREAKER_WINDOW,
+    settings.LLM_BREAKER_MIN_CALLS,
+    settings.LLM_BREAKER_FAILURE_RATIO,
+    settings.LLM_BREAKER_RESET_SECONDS,
+)
+latencies = LatencyTracker()
+
+def backoff(attempt: int) -> float:
+    """Backoff exponencial amb jitter complet."""
+    cap = min(settings.LLM_RETRY_MAX_SECONDS, settings.LLM_RETRY_BASE_SECONDS * (2 ** attempt))
+    return random.uniform(0, cap)
+
+async def _attempt(fn: Callable[[float], Awaitable[T]], remaining: float) -> T:
+    timeout = min(remaining, settings.LLM_TIMEOUT_SECONDS)
+    return await asyncio.wait_for(fn(timeout), timeout)
+
+async def _hedged(fn: Callable[[float], Awaitable[T]], deadline: float) -> T:
+    """Primera petició i, si passa del p95, una segona en paral·lel; guanya la primera correcta."""
+    remaining = deadline - time.monotonic()
+    delay = latencies.quantile(settings.LLM_HEDGE_QUANTILE, settings.LLM_HEDGE_MIN_SAMPLES) \
+        if settings.LLM_HEDGE_ENABLED else None
+    primary = asyncio.ensure_future(_attempt(fn, remaining))
+    if delay is None or delay >= remaining:
+        return await primary
+
+    pending = {primary}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if done:
+            return primary.result()
+
+        secondary = asyncio.ensure_future(_attempt(fn, deadline - time.monotonic()))
+        pending = {primary, secondary}
+        error: BaseException | None = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    LLM_HEDGED.labels(winner="primary" if task is primary else "hedge").inc()
+                    return task.result()
+                error = task.exception()
+        LLM_HEDGED.labels(winner="none").inc()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def call(fn: Callable[[float], Awaitable[T]], deadline_seconds: float | None = None) -> T:
+    """Executa `fn(timeout)` amb deadline, reintents, hedging i circuit breaker."""
+    start = time.monotonic()
+    deadline = start + (deadline_seconds or settings.LLM_DEADLINE_SECONDS)
+    attempt = 0
+    while True:
+        try:
+            breaker.allow()
+        except CircuitOpenError:
+            LLM_CALL_SECONDS.labels(outcome="rejected").observe(time.monotonic() - start)
+            raise
+        attempt_start = time.monotonic()
+        try:
+            result = await _hedged(fn, deadline)
+        except asyncio.CancelledError:
+            breaker.release_probe()
+            raise
+        except Exception as e:
+            if not is_retryable(e):
+                breaker.release_probe()
+                LLM_CALL_SECONDS.labels(outcome="error").observe(time.monotonic() - start)
+                raise
+            breaker.record_failure()
+            wait = backoff(attempt)
+            if attempt >= settings.LLM_MAX_RETRIES or time.monotonic() + wait >= deadline:
+                LLM_CALL_SECONDS.labels(outcome="error").observe(time.monotonic() - start)
+                if time.monotonic() >= deadline:
+                    raise DeadlineExceeded(f"LLM deadline exceeded after {attempt + 1} attempts") from e
+                raise
+            LLM_RETRIES.labels(reason=type(e).__name__).inc()
+            logger.warning(f"🔁 Reintento LLM {attempt + 1} en {wait:.2f}s: {type(e).__name__}")
+            attempt += 1
+            await asyncio.sleep(wait)
+            continue
+        breaker.record_success()
+        latencies.record(time.monotonic() - attempt_start)
+        LLM_CALL_SECONDS.labels(outcome="success").observe(time.monotonic() - start)
+        return result
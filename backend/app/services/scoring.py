@@ -1,7 +1,121 @@
 import re
+from datetime import datetime
+from typing import Callable, Iterable, NamedTuple
+
+# Llindar per passar al següent pas (can_add_krs / allow_next_kr) i "aprovat" a les estadístiques
+PASS_THRESHOLD = 7.5
 
 def clamp(n: float) -> float:
-    return max(1.0, min(10.0, round(n*10)/10))
+    v = round(n*10)/10
+    return 1.0 if v < 1.0 else 10.0 if v > 10.0 else v
+
+# Plegat de majúscules equivalent al de re.IGNORECASE per als caràcters de les regles:
+# str.lower() no plega aquests quatre igual que el motor `re`, la resta sí.
+_SRE_FOLD = str.maketrans({"İ": "i", "ı": "i", "ſ": "s", "K": "k"})
+
+def _fold(s: str) -> str:
+    if not s.isascii() and ("İ" in s or "ı" in s or "ſ" in s or "K" in s):
+        s = s.translate(_SRE_FOLD)
+    return s.lower()
+
+class Doc(NamedTuple):
+    text: str       # text net (strip)
+    low: str        # text plegat
+    low_extra: str  # text + target_value plegats (només KRs)
+
+class Rule(NamedTuple):
+    """Regla heurística declarativa: si es compleix, suma `weight` a `dimension`
+    i afegeix `note` (si n'hi ha).
+
+    - `any_of`: literals (en minúscules); si cap no apareix, la regla no s'activa
+      sense executar cap regex. Si no hi ha `pattern`, els literals són la regla.
+    - `pattern`: regex (sense IGNORECASE, sobre el text plegat) que confirma el match.
+    - `min_count`: coincidències necessàries del patró.
+    - `predicate`: regles que no són de text (llargada, majúscula inicial...).
+    """
+    dimension: str
+    weight: float
+    any_of: tuple[str, ...] = ()
+    pattern: re.Pattern | None = None
+    note: str | None = None
+    min_count: int = 1
+    negate: bool = False
+    on_extra: bool = False
+    predicate: Callable[[Doc], bool] | None = None
+
+def _compile(rule: Rule) -> Callable[[Doc], bool]:
+    """Converteix una regla en una funció especialitzada (es fa un sol cop, en importar)."""
+    if rule.predicate is not None:
+        return rule.predicate
+    lits, rx, n, negate, on_extra = rule.any_of, rule.pattern, rule.min_count, rule.negate, rule.on_extra
+
+    def test(doc: Doc) -> bool:
+        s = doc.low_extra if on_extra else doc.low
+        hit = not lits
+        for lit in lits:
+            if lit in s:
+                hit = True
+                break
+        if hit and rx is not None:
+            if n > 1:
+                hit = len(rx.findall(s)) >= n
+            else:
+                hit = rx.search(s) is not None
+        return hit != negate
+    return test
+
+def _plan(rules: tuple[Rule, ...]) -> tuple:
+    return tuple((r.dimension, r.weight, r.note, _compile(r)) for r in rules)
+
+def _apply(plan: tuple, base: dict, doc: Doc, notes: list) -> dict:
+    values = dict(base)
+    for dimension, weight, note, test in plan:
+        if test(doc):
+            values[dimension] += weight
+            if note:
+                notes.append(note)
+    return values
+
+# Regles compilades una sola vegada. L'ordre és el de les notes a la resposta i
+# el de les sumes (es manté per obtenir exactament els mateixos floats).
+OBJECTIVE_BASE = {"clarity": 5.0, "focus": 6.0, "writing": 6.0}
+OBJECTIVE_RULES: tuple[Rule, ...] = (
+    Rule("clarity", 2.0, ("millorar", "elevar", "reduir", "accelerar", "consolidar", "expandir"),
+         re.compile(r'\b(millorar|elevar|reduir|accelerar|consolidar|expandir)\b')),
+    Rule("clarity", 1.0, ("per a", "per tal de", "amb l'objectiu")),
+    Rule("clarity", 0.5, predicate=lambda d: d.text[-1:] in (".", "!", "?")),
+    Rule("clarity", -1.0, ("configurar", "instal·lar", "implementar"),
+         re.compile(r'\bconfigurar|instal·lar|implementar\b'),
+         note="Evita tasques; centra’t en impacte/resultat."),
+    Rule("focus", -1.5, ("i", "and", "&"), re.compile(r'\b(i|and|&)\b'),
+         note="Massa fronts; acota l’abast.", min_count=3),
+    Rule("focus", 1.0, ("q1", "q2", "q3", "q4", "trimestre", "12 setmanes", "90 dies")),
+    Rule("writing", 0.5, ("millor", "més", "menys"), re.compile(r'\b(millor|millorament|més|menys)\b')),
+    Rule("writing", -0.5, ("significativament", "substancialment"),
+         re.compile(r'\b(significativament|substancialment)\b'),
+         note="Evita termes vagues com 'significativament'."),
+    Rule("writing", 0.3, predicate=lambda d: bool(d.text) and d.text[0].isupper()),
+)
+_OBJECTIVE_PLAN = _plan(OBJECTIVE_RULES)
+# La claredat de l'objectiu es normalitza abans d'acotar-la
+OBJECTIVE_CLARITY_DIVISOR = 1.2
+
+_DIGIT = re.compile(r'\d')
+_QUALITY = ("qualitat", "millor", "opti", "eficient")
+
+KR_BASE = {"clarity": 6.0, "measurability": 5.5, "feasibility": 6.0}
+KR_RULES: tuple[Rule, ...] = (
+    Rule("clarity", -1.5, predicate=lambda d: len(d.text) < 20, note="KR massa curt."),
+    Rule("clarity", -0.5, ("augment", "reducció", "assolir", "arribar", "increment", "reduir", "elevar"),
+         negate=True, note="Usa verbs d'impacte ('augmentar', 'reduir', 'assolir')."),
+    Rule("measurability", 2.0, pattern=_DIGIT, on_extra=True),
+    Rule("measurability", 1.0, ("%", "pts", "€", "euros", "ms", "min", "h", "casos", "tickets",
+                                "nps", "csat", "ttfr", "mttr"), on_extra=True),
+    Rule("measurability", -1.0, predicate=lambda d: any(q in d.low for q in _QUALITY)
+         and _DIGIT.search(d.low_extra) is None and "%" not in d.low_extra,
+         note="Afegeix mètrica concreta (%, unitats, temps)."),
+)
+_KR_PLAN = _plan(KR_RULES)
 
 def score_objective(text: str):
     clean = text.strip()
@@ -9,27 +123,10 @@ def score_objective(text: str):
     if len(clean) < 15: notes.append("Objectiu massa curt.")
     if len(clean) > 500: notes.append("Objectiu massa llarg; sintetitza.")
 
-    clarity = 5.0
-    if re.search(r'\b(millorar|elevar|reduir|accelerar|consolidar|expandir)\b', clean, re.I): clarity += 2
-    if re.search(r'(per a|per tal de|amb l\'objectiu)', clean, re.I): clarity += 1
-    if re.search(r'[.!?]$', clean): clarity += 0.5
-    if re.search(r'\bconfigurar|instal·lar|implementar\b', clean, re.I): 
-        clarity -= 1; notes.append("Evita tasques; centra’t en impacte/resultat.")
-    clarity = clamp(clarity/1.2)
-
-    focus = 6.0
-    ands = len(re.findall(r'\b(i|and|&)\b', clean, re.I))
-    if ands > 2: 
-        focus -= 1.5; notes.append("Massa fronts; acota l’abast.")
-    if re.search(r'Q[1-4]|trimestre|12 setmanes|90 dies', clean, re.I): focus += 1
-    focus = clamp(focus)
-
-    writing = 6.0
-    if re.search(r'\b(millor|millorament|més|menys)\b', clean, re.I): writing += 0.5
-    if re.search(r'\b(significativament|substancialment)\b', clean, re.I): 
-        writing -= 0.5; notes.append("Evita termes vagues com 'significativament'.")
-    if clean and clean[0].isupper(): writing += 0.3
-    writing = clamp(writing)
+    v = _apply(_OBJECTIVE_PLAN, OBJECTIVE_BASE, Doc(clean, _fold(clean), ""), notes)
+    clarity = clamp(v["clarity"] / OBJECTIVE_CLARITY_DIVISOR)
+    focus = clamp(v["focus"])
+    writing = clamp(v["writing"])
 
     total = clamp((clarity + focus + writing) / 3.0)
     return {"clarity": clarity, "focus": focus, "writing": writing, "total": total, "notes": notes}
@@ -37,23 +134,13 @@ def score_objective(text: str):
 def score_kr(defn: str, target_value: str, target_date_iso: str):
     notes = []
     clean = defn.strip()
-    clarity = 6.0
-    if len(clean) < 20: 
-        clarity -= 1.5; notes.append("KR massa curt.")
-    if not re.search(r'augment|reducció|assolir|arribar|increment|reduir|elevar', clean, re.I):
-        clarity -= 0.5; notes.append("Usa verbs d'impacte ('augmentar', 'reduir', 'assolir').")
-    clarity = clamp(clarity)
-
-    measurability = 5.5
-    if re.search(r'\d', clean+target_value): measurability += 2
-    if re.search(r'%|pts|€|euros|ms|min|h|casos|tickets|NPS|CSAT|TTFR|MTTR', clean+target_value, re.I): measurability += 1
-    if re.search(r'qualitat|millor|opti|eficient', clean, re.I) and not re.search(r'\d|%', clean+target_value):
-        measurability -= 1; notes.append("Afegeix mètrica concreta (%, unitats, temps).")
-    measurability = clamp(measurability)
-
-    feasibility = 6.0
+    low = _fold(clean)
+    v = _apply(_KR_PLAN, KR_BASE, Doc(clean, low, low + _fold(target_value)), notes)
+    clarity = clamp(v["clarity"])
+    measurability = clamp(v["measurability"])
+
+    feasibility = v["feasibility"]
     try:
-        from datetime import datetime
         _ = datetime.fromisoformat(target_date_iso)
     except Exception:
         feasibility -= 1.5; notes.append("Data objectiu no vàlida.")
@@ -61,3 +148,21 @@ def score_kr(defn: str, target_value: str, target_date_iso: str):
 
     total = clamp((clarity + measurability + feasibility) / 3.0)
     return {"clarity": clarity, "measurability": measurability, "feasibility": feasibility, "total": total, "notes": notes}
+
+def score_many(texts: Iterable[str]) -> list[dict]:
+    """score_objective per a molts textos (imports, re-scoring). Els duplicats es
+    puntuen una sola vegada; cada resultat és un dict independent."""
+    seen: dict[str, dict] = {}
+    out = []
+    for text in texts:
+        res = seen.get(text)
+        if res is None:
+            res = seen[text] = score_objective(text)
+            out.append(res)
+        else:
+            out.append({**res, "notes": list(res["notes"])})
+    return out
+
+def score_kr_many(items: Iterable[tuple[str, str, str]]) -> list[dict]:
+    """score_kr per a molts (definició, target_value, target_date_iso)."""
+    return [score_kr(defn, target_value, target_date_iso) for defn, target_value, target_date_iso in items]
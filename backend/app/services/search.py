@@ -0,0 +1,187 @@
+"""Cerca de text sobre objectius i definicions de KR (GET /okrs/search).
+
+- MySQL: índexs FULLTEXT (migració 0003) amb MATCH ... AGAINST en BOOLEAN MODE;
+  cada terme de la consulta es cerca com a prefix (`terme*`) i la BD ordena per rellevància.
+- Altres BD (SQLite als tests / desenvolupament) i MySQL amb DB_PARTITIONED (les
+  taules particionades no admeten FULLTEXT, migració 0005): índex invertit en memòria del
+  procés amb ranking BM25. Es construeix a la primera cerca i, a cada cerca,
+  s'hi afegeixen les files noves (created_at >= última vista).
+"""
+import asyncio
+import math
+import re
+import heapq
+from bisect import bisect_left
+from operator import itemgetter
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, async_engine
+from app.db.models import OkrSubmission, KeyResult
+
+_TOKEN = re.compile(r"\w+")
+# Prefixos més curts no s'expandeixen (un sol caràcter casaria amb mig vocabulari)
+MIN_PREFIX = 3
+MAX_EXPANSIONS = 64
+
+KINDS = {
+    "objective": (OkrSubmission, OkrSubmission.objective),
+    "key_result": (KeyResult, KeyResult.kr_definition),
+}
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN.findall(text.lower())
+
+def _columns(kind: str) -> list:
+    model, text_col = KINDS[kind]
+    cols = [model.id, text_col.label("text"), model.score, model.created_at]
+    if model is KeyResult:
+        cols.append(KeyResult.okr_id)
+    return cols
+
+class InvertedIndex:
+    """Índex invertit en memòria: terme -> {doc: freqüència}, amb vocabulari ordenat
+    per resoldre prefixos amb bisect i ranking BM25."""
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.postings: dict[str, dict[int, int]] = {}
+        self.vocabulary: list[str] = []
+        self.docs: list[dict] = []
+        self.scores: list[float] = []
+        self.doc_len: list[int] = []
+        self.total_len = 0
+        self.ids: set[str] = set()
+        self.watermark: datetime | None = None
+        # Normalització BM25 per document, precalculada amb la llargada mitjana
+        # `_norm_avg`; només es recalcula tota quan la mitjana deriva més d'un 10%
+        self._norms: list[float] = []
+        self._norm_avg = 0.0
+
+    def add(self, doc: dict):
+        if doc["id"] in self.ids:
+            return
+        self.ids.add(doc["id"])
+        idx = len(self.docs)
+        tokens = tokenize(doc["text"])
+        self.docs.append(doc)
+        self.scores.append(doc["score"])
+        self.doc_len.append(len(tokens))
+        self.total_len += len(tokens)
+        for token in tokens:
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+                self.vocabulary.insert(bisect_left(self.vocabulary, token), token)
+            posting[idx] = posting.get(idx, 0) + 1
+        created_at = doc.get("created_at")
+        if created_at is not None and (self.watermark is None or created_at > self.watermark):
+            self.watermark = created_at
+
+    def expand(self, term: str) -> list[str]:
+        if len(term) < MIN_PREFIX:
+            return [term] if term in self.postings else []
+        out = []
+        i = bisect_left(self.vocabulary, term)
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(term) and len(out) < MAX_EXPANSIONS:
+            out.append(self.vocabulary[i])
+            i += 1
+        return out
+
+    def _doc_norms(self) -> list[float]:
+        n = len(self.docs)
+        avg_len = self.total_len / n or 1.0
+        k1, b = self.K1, self.B
+        if not self._norm_avg or abs(avg_len - self._norm_avg) > 0.1 * self._norm_avg:
+            self._norm_avg = avg_len
+            self._norms = [k1 * (1 - b + b * dl / avg_len) for dl in self.doc_len]
+        elif len(self._norms) < n:
+            avg_len = self._norm_avg
+            self._norms.extend(k1 * (1 - b + b * dl / avg_len) for dl in self.doc_len[len(self._norms):])
+        return self._norms
+
+    def search(self, query: str, limit: int = 20, min_score: float | None = None,
+               max_score: float | None = None) -> list[dict]:
+        n = len(self.docs)
+        if not n:
+            return []
+        norms = self._doc_norms()
+        k1_1 = self.K1 + 1
+        totals: dict[int, float] = {}
+        for term in dict.fromkeys(tokenize(query)):
+            # Per terme, la millor de les seves expansions (no se sumen entre elles)
+            expansions = self.expand(term)
+            best: dict[int, float] = {}
+            for token in expansions:
+                posting = self.postings[token]
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5)) * k1_1
+                if len(expansions) == 1:
+                    best = {idx: idf * tf / (tf + norms[idx]) for idx, tf in posting.items()}
+                    break
+                get = best.get
+                for idx, tf in posting.items():
+                    s = idf * tf / (tf + norms[idx])
+                    if s > get(idx, 0.0):
+                        best[idx] = s
+            if not totals:
+                totals = best
+                continue
+            get = totals.get
+            for idx, s in best.items():
+                totals[idx] = get(idx, 0.0) + s
+
+        if min_score is None and max_score is None:
+            top = heapq.nlargest(limit, totals.items(), key=itemgetter(1))
+        else:
+            lo = -math.inf if min_score is None else min_score
+            hi = math.inf if max_score is None else max_score
+            scores = self.scores
+            top = heapq.nlargest(limit, ((idx, s) for idx, s in totals.items() if lo <= scores[idx] <= hi),
+                                 key=itemgetter(1))
+        return [{**self.docs[idx], "relevance": round(s, 4)} for idx, s in top]
+
+_indexes: dict[str, InvertedIndex] = {}
+_lock = asyncio.Lock()
+
+async def _refresh_index(kind: str) -> InvertedIndex:
+    async with _lock:
+        index = _indexes.setdefault(kind, InvertedIndex())
+        model = KINDS[kind][0]
+        q = select(*_columns(kind))
+        if index.watermark is not None:
+            # Amb marge: files del mateix segon que encara no s'havien vist (add() ignora les repetides)
+            q = q.where(model.created_at >= index.watermark - timedelta(seconds=1))
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(q.execution_options(yield_per=5000))
+            async for row in result:
+                index.add(dict(row._mapping))
+        return index
+
+async def _search_mysql(kind: str, terms: list[str], limit: int, min_score: float | None,
+                        max_score: float | None) -> list[dict]:
+    model, text_col = KINDS[kind]
+    match = text_col.match(" ".join(f"{t}*" for t in terms))
+    q = select(*_columns(kind), match.label("relevance")).where(match)
+    if min_score is not None:
+        q = q.where(model.score >= min_score)
+    if max_score is not None:
+        q = q.where(model.score <= max_score)
+    q = q.order_by(match.desc()).limit(limit)
+    async with AsyncSessionLocal() as db:
+        return [dict(r._mapping) for r in await db.execute(q)]
+
+async def search(query: str, kind: str = "objective", limit: int = 20,
+                 min_score: float | None = None, max_score: float | None = None) -> list[dict]:
+    """Resultats ordenats per rellevància: dicts amb id, text, score, created_at,
+    relevance (i okr_id per als KRs)."""
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return []
+    if async_engine.dialect.name == "mysql" and not settings.DB_PARTITIONED:
+        hits = await _search_mysql(kind, terms, limit, min_score, max_score)
+    else:
+        index = await _refresh_index(kind)
+        hits = index.search(" ".join(terms), limit, min_score, max_score)
+    return [{"kind": kind, **h} for h in hits]
@@ -0,0 +1,150 @@
+"""Índex de quasi-duplicats d'objectius (MinHash + LSH) per estalviar crides LLM.
+
+Dos objectius que només difereixen en puntuació, majúscules o una o dues paraules
+reben pràcticament el mateix feedback. `evaluate_objective` consulta aquest índex
+abans de cridar el model: si troba un veí amb similitud de Jaccard (sobre el
+conjunt de paraules) >= SIMILARITY_THRESHOLD i la seva resposta encara és a la
+cache LLM, la reutilitza.
+
+- Els números han de coincidir exactament ("reduir un 10%" != "reduir un 20%").
+- L'índex és en memòria del procés, acotat a SIMILARITY_MAX_ENTRIES (FIFO), i es
+  reconstrueix en segon pla a l'arrencada amb els últims objectius desats.
+"""
+import asyncio
+import hashlib
+import logging
+import re
+from collections import OrderedDict
+from prometheus_client import Counter
+from sqlalchemy import select
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.db.models import OkrSubmission
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY_LOOKUPS = Counter("okr_similarity_lookups_total", "Consultes a l'índex de quasi-duplicats", ["outcome"])
+
+_TOKEN = re.compile(r"\w+")
+_NUMBER = re.compile(r"\d")
+
+NUM_PERM = 64
+BANDS = 16        # 16 bandes x 4 files: candidats a partir de Jaccard ~0.5
+ROWS = NUM_PERM // BANDS
+MIN_TOKENS = 4    # textos més curts no es reutilitzen mai
+
+_MERSENNE = (1 << 61) - 1
+_PERMS = [
+    (int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % (_MERSENNE - 1) + 1,
+     int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE)
+    for i in range(NUM_PERM)
+]
+
+def shingles(text: str) -> frozenset[str]:
+    return frozenset(_TOKEN.findall(text.lower()))
+
+def _numbers(tokens: frozenset[str]) -> frozenset[str]:
+    return frozenset(t for t in tokens if _NUMBER.search(t))
+
+def minhash(tokens: frozenset[str]) -> list[int]:
+    hashed = [int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=8).digest(), "big") for t in tokens]
+    return [min((a * h + b) % _MERSENNE for h in hashed) for a, b in _PERMS]
+
+def _bands(signature: list[int]) -> list[tuple]:
+    return [(i, tuple(signature[i * ROWS:(i + 1) * ROWS])) for i in range(BANDS)]
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+class SimilarityIndex:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        # okr_id -> (objectiu, paraules, claus de banda)
+        self._entries: OrderedDict[str, tuple[str, frozenset, list[tuple]]] = OrderedDict()
+        self._buckets: dict[tuple, set[str]] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, okr_id: str, objective: str):
+        tokens = shingles(objective)
+        if len(tokens) < MIN_TOKENS or okr_id in self._entries:
+            return
+        bands = _bands(minhash(tokens))
+        self._entries[okr_id] = (objective, tokens, bands)
+        for band in bands:
+            self._buckets.setdefault(band, set()).add(okr_id)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, okr_id: str):
+        _, _, bands = self._entries.pop(okr_id)
+        for band in bands:
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(okr_id)
+                if not bucket:
+                    del self._buckets[band]
+
+    def neighbours(self, objective: str, threshold: float) -> list[tuple[float, str, str]]:
+        """Veïns amb Jaccard >= threshold i els mateixos números: [(similitud, okr_id, objectiu)],
+        del més semblant al menys."""
+        tokens = shingles(objective)
+        if len(tokens) < MIN_TOKENS or not self._entries:
+            return []
+        candidates = set()
+        for band in _bands(minhash(tokens)):
+            candidates |= self._buckets.get(band, set())
+        numbers = _numbers(tokens)
+        out = []
+        for okr_id in candidates:
+            other, other_tokens, _ = self._entries[okr_id]
+            sim = jaccard(tokens, other_tokens)
+            if sim >= threshold and _numbers(other_tokens) == numbers:
+                out.append((sim, okr_id, other))
+        out.sort(reverse=True)
+        return out
+
+_index = SimilarityIndex(settings.SIMILARITY_MAX_ENTRIES)
+_rebuild_task: asyncio.Task | None = None
+
+def get_index() -> SimilarityIndex:
+    return _index
+
+def remember(okr_id: str, objective: str):
+    if settings.SIMILARITY_ENABLED:
+        _index.add(okr_id, objective)
+
+async def rebuild():
+    """Carrega els últims objectius desats (cedint el loop cada pocs centenars de files)."""
+    q = (select(OkrSubmission.id, OkrSubmission.objective)
+         .order_by(OkrSubmission.created_at.desc())
+         .limit(settings.SIMILARITY_MAX_ENTRIES))
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(q)).all()
+    # Del més antic al més nou, perquè l'expulsió FIFO tregui primer els antics
+    for i, (okr_id, objective) in enumerate(reversed(rows)):
+        _index.add(okr_id, objective)
+        if i % 500 == 499:
+            await asyncio.sleep(0)
+    logger.info(f"🔎 Índice de similitud reconstruido: {len(_index)} objetivos")
+
+def start_rebuild():
+    global _rebuild_task
+    if settings.SIMILARITY_ENABLED and _rebuild_task is None:
+        _rebuild_task = asyncio.create_task(rebuild(), name="similarity-rebuild")
+        _rebuild_task.add_done_callback(_rebuild_done)
+
+def _rebuild_done(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"❌ Error reconstruyendo el índice de similitud: {task.exception()}")
+
+async def stop_rebuild():
+    global _rebuild_task
+    if _rebuild_task is not None and not _rebuild_task.done():
+        _rebuild_task.cancel()
+        try:
+            await _rebuild_task
+        except asyncio.CancelledError:
+            pass
+    _rebuild_task = None
@@ -0,0 +1,44 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+class SingleFlight:
+    """Coalesceix crides concurrents amb la mateixa clau en una sola execució.
+
+    La feina corre en una tasca pròpia: si un client es desconnecta, la resta
+    continuen esperant el mateix resultat. Quan se'n va l'últim que l'esperava,
+    la tasca es cancel·la (ningú no llegirà la resposta de la crida LLM).
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Task] = {}
+        self._waiters: dict[asyncio.Task, int] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """Retorna (resultat, shared); shared és True si s'ha reaprofitat una crida en curs."""
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task), shared
+        finally:
+            self._waiters[task] -= 1
+            if self._waiters[task] == 0:
+                del self._waiters[task]
+                if not task.done():
+                    # Cap client l'espera: es treu ja perquè una crida nova no s'hi enganxi
+                    if self._calls.get(key) is task:
+                        del self._calls[key]
+                    task.cancel()
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # evita "exception was never retrieved" si ningú no esperava
@@ -0,0 +1,71 @@
+"""Micro-benchmark de la validació de respostes LLM (app/services/okr_service.py)
+i del parser incremental del streaming (app/services/json_stream.py).
+
+    python -m bench.bench_parse --n 20000
+
+Casos: resposta vàlida, resposta amb criteris incomplets (es completen) i JSON
+invàlid (fallback heurístic). Els logs es desactiven: es mesura el codi, no l'I/O.
+Temps en microsegons per resposta.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from app.services.json_stream import IncrementalJsonParser  # noqa: E402
+from app.services.okr_service import parse_objective_response  # noqa: E402
+from app.services.scoring import score_objective  # noqa: E402
+from bench.stub_llm import DEFAULT_CONTENT  # noqa: E402
+
+def partial_content() -> str:
+    data = json.loads(DEFAULT_CONTENT)
+    data["criteria"].pop("timebound")
+    data["criteria"]["achievable"] = {"score": 6}
+    return json.dumps(data, ensure_ascii=False)
+
+def chunks(text: str, size: int) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def per_op_us(fn, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return round((time.perf_counter() - start) / n * 1e6, 2)
+
+def stream_parse(parts: list[str]):
+    parser = IncrementalJsonParser()
+    for part in parts:
+        parser.feed(part)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=20_000)
+    parser.add_argument("--chunk-chars", type=int, default=16, help="mida dels fragments del streaming")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    heur = score_objective("Augmentar la retenció de clients un 10% abans del Q4")
+    partial = partial_content()
+    invalid = DEFAULT_CONTENT[: len(DEFAULT_CONTENT) // 2]  # resposta tallada (max_tokens)
+    parts = chunks(DEFAULT_CONTENT, args.chunk_chars)
+
+    assert parse_objective_response(partial, heur)["criteria"]["timebound"]["score"] == 5
+    assert parse_objective_response(invalid, heur)["overall_score"] == float(heur["total"])
+
+    print(json.dumps({
+        "n": args.n,
+        "response_bytes": len(DEFAULT_CONTENT.encode("utf-8")),
+        "validate_valid_us": per_op_us(lambda: parse_objective_response(DEFAULT_CONTENT, heur), args.n),
+        "validate_partial_us": per_op_us(lambda: parse_objective_response(partial, heur), args.n),
+        "validate_fallback_us": per_op_us(lambda: parse_objective_response(invalid, heur), args.n),
+        "json_loads_us": per_op_us(lambda: json.loads(DEFAULT_CONTENT), args.n),
+        "stream_parse_us": per_op_us(lambda: stream_parse(parts), args.n),
+        "stream_chunks": len(parts),
+    }))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Mida i temps de serialització de les respostes d'avaluació.
+
+    python -m bench.bench_payload --n 2000 --batch 50
+
+Compara, amb el mateix response_model que l'API, el resultat amb camps debug_* i
+JSONResponse (abans) amb el resultat sense debug i ORJSONResponse (ara), per a una
+avaluació i per a un lot. Per al lot també mostra els bytes amb gzip i Brotli
+(CompressionMiddleware). Temps en microsegons per petició, dins el procés (ASGI).
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+from app.core.compression import CompressionMiddleware, brotli  # noqa: E402
+from app.schemas.okr import OkrEvaluateResponse, BatchEvaluateResponse  # noqa: E402
+from app.services.okr_service import build_objective_result, build_kr_result  # noqa: E402
+from app.services.scoring import score_objective, score_kr  # noqa: E402
+from bench.stub_llm import DEFAULT_CONTENT  # noqa: E402
+
+def objective_result(debug: bool) -> dict:
+    heur = score_objective("Augmentar la retenció de clients un 10% abans del Q4")
+    return build_objective_result("okr-1", heur, json.loads(DEFAULT_CONTENT), DEFAULT_CONTENT, debug)
+
+def batch_result(size: int, debug: bool) -> dict:
+    kheur = score_kr("Reduir el churn mensual al 2%", "2%", "2026-12-31")
+    results = [
+        {"index": i, **objective_result(debug),
+         "key_results": [{"index": j, **build_kr_result(f"kr-{j}", kheur, "Feedback del KR " * 20)} for j in range(3)]}
+        for i in range(size)
+    ]
+    return {"results": results, "succeeded": size, "failed": 0}
+
+def make_app(response_class, debug: bool, batch_size: int) -> FastAPI:
+    app = FastAPI(default_response_class=response_class)
+    single, batch = objective_result(debug), batch_result(batch_size, debug)
+
+    @app.post("/evaluate", response_model=OkrEvaluateResponse)
+    async def evaluate():
+        return single
+
+    @app.post("/evaluate/batch", response_model=BatchEvaluateResponse)
+    async def evaluate_batch():
+        return batch
+
+    return app
+
+async def measure(app, path: str, n: int, encoding: str = "identity") -> dict:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        headers = {"Accept-Encoding": encoding}
+        response = await client.post(path, headers=headers)
+        size = len(response.content) if encoding == "identity" else int(response.headers["content-length"])
+        start = time.perf_counter()
+        for _ in range(n):
+            await client.post(path, headers=headers)
+        return {"bytes": size, "us_per_request": round((time.perf_counter() - start) / n * 1e6, 1)}
+
+async def run(args) -> dict:
+    before = make_app(JSONResponse, True, args.batch)
+    after = make_app(ORJSONResponse, False, args.batch)
+    compressed = CompressionMiddleware(after, minimum_size=1024)
+    out = {
+        "evaluate_before": await measure(before, "/evaluate", args.n),
+        "evaluate_after": await measure(after, "/evaluate", args.n),
+        "batch_before": await measure(before, "/evaluate/batch", args.n // 10),
+        "batch_after": await measure(after, "/evaluate/batch", args.n // 10),
+        "batch_gzip": await measure(compressed, "/evaluate/batch", args.n // 10, "gzip"),
+    }
+    if brotli is not None:
+        out["batch_br"] = await measure(compressed, "/evaluate/batch", args.n // 10, "br")
+    return out
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=50, help="objectius per lot (amb 3 KRs cadascun)")
+    args = parser.parse_args()
+    print(json.dumps({"n": args.n, "batch": args.batch, **asyncio.run(run(args))}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Micro-benchmark del motor heurístic (app/services/scoring.py).
+
+    python -m bench.bench_scoring --n 100000
+
+Genera un corpus sintètic reproduïble, comprova que els resultats són idèntics
+als de la implementació original (bench/legacy_scoring.py) i compara temps.
+"""
+import argparse
+import json
+import random
+import time
+
+from app.services import scoring
+from bench import legacy_scoring
+
+FILLER = [
+    "la", "el", "les", "de", "del", "clients", "vendes", "equip", "producte", "cost", "mercat", "nou",
+    "onboarding", "retenció", "usuaris", "plataforma", "servei", "procés", "temps", "resposta", "canal",
+    "digital", "suport", "comercial", "internacional", "marca", "satisfacció", "entrega", "logística",
+]
+KEYWORDS = [
+    "millorar", "reduir", "elevar", "accelerar", "consolidar", "expandir", "configurar", "instal·lar",
+    "implementar", "per a", "per tal de", "amb l'objectiu", "i", "and", "&", "Q1", "Q3", "trimestre",
+    "90 dies", "12 setmanes", "millor", "més", "menys", "significativament", "substancialment",
+    "la", "retenció", "de", "clients", "NPS", "vendes", "equip", "qualitat", "producte", "cost",
+    "augment", "reducció", "assolir", "arribar", "eficient", "tickets", "MTTR", "20%", "55", "€",
+    # majúscules i caràcters amb plegat especial a re.IGNORECASE
+    "MILLORAR", "Reduir", "R&D", "AND", "ſignificativament", "İ", "\u212aPI", "Millorament", "١٢",
+]
+DATES = ["2026-12-31", "2026-06-30", "31/12/2026", "", "2027-03-31T00:00:00"]
+VALUES = ["55", "20%", "1000 €", "alt", "", "90 ms"]
+
+def corpus(n: int, seed: int = 42, keyword_ratio: float = 0.3) -> list[str]:
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        text = " ".join(rng.choice(KEYWORDS if rng.random() < keyword_ratio else FILLER)
+                        for _ in range(rng.randint(2, 18)))
+        if rng.random() < 0.5:
+            text = text[0].upper() + text[1:]
+        if rng.random() < 0.3:
+            text += rng.choice(".!?")
+        out.append(text)
+    return out
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--keyword-ratio", type=float, default=0.3, help="proporció de paraules que activen regles")
+    args = parser.parse_args()
+
+    texts = corpus(args.n, keyword_ratio=args.keyword_ratio)
+    rng = random.Random(7)
+    krs = [(t, rng.choice(VALUES), rng.choice(DATES)) for t in texts]
+
+    legacy_obj = [legacy_scoring.score_objective(t) for t in texts]
+    assert scoring.score_many(texts) == legacy_obj, "score_objective no és compatible amb la versió original"
+    legacy_kr = [legacy_scoring.score_kr(*kr) for kr in krs]
+    assert scoring.score_kr_many(krs) == legacy_kr, "score_kr no és compatible amb la versió original"
+
+    results = {
+        "n": args.n,
+        "objective_legacy_s": timed(lambda: [legacy_scoring.score_objective(t) for t in texts]),
+        "objective_engine_s": timed(lambda: [scoring.score_objective(t) for t in texts]),
+        "objective_score_many_s": timed(lambda: scoring.score_many(texts)),
+        "kr_legacy_s": timed(lambda: [legacy_scoring.score_kr(*kr) for kr in krs]),
+        "kr_engine_s": timed(lambda: scoring.score_kr_many(krs)),
+    }
+    results["objective_speedup"] = results["objective_legacy_s"] / results["objective_engine_s"]
+    results["kr_speedup"] = results["kr_legacy_s"] / results["kr_engine_s"]
+    print(json.dumps({k: round(v, 3) if isinstance(v, float) else v for k, v in results.items()}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Latència de l'índex invertit en memòria (app/services/search.py), el que s'usa
+quan la BD no és MySQL.
+
+    python -m bench.bench_search --n 200000 --queries 500
+
+A MySQL la cerca la resol l'índex FULLTEXT; per mesurar-la, fes servir l'endpoint
+GET /api/v1/okrs/search amb una BD poblada.
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from app.services.search import InvertedIndex  # noqa: E402
+from bench.bench_scoring import corpus  # noqa: E402
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    texts = corpus(args.n)
+    rng = random.Random(3)
+    start = time.perf_counter()
+    index = InvertedIndex()
+    for i, text in enumerate(texts):
+        index.add({"id": str(i), "text": text, "score": round(rng.uniform(1, 10), 1), "created_at": None})
+    build_s = time.perf_counter() - start
+
+    queries = []
+    for _ in range(args.queries):
+        words = rng.choice(texts).split()
+        k = rng.randint(1, min(3, len(words)))
+        # l'última paraula truncada, com mentre s'escriu
+        q = words[:k]
+        q[-1] = q[-1][:max(3, len(q[-1]) - 2)]
+        queries.append(" ".join(q))
+
+    latencies = []
+    for q in queries:
+        t = time.perf_counter()
+        index.search(q, args.limit, min_score=5.0)
+        latencies.append((time.perf_counter() - t) * 1000)
+    latencies.sort()
+    print(json.dumps({
+        "n": args.n,
+        "build_s": round(build_s, 2),
+        "vocabulary": len(index.vocabulary),
+        "p50_ms": round(latencies[len(latencies) // 2], 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+        "max_ms": round(latencies[-1], 2),
+    }))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Mida desada i cost de CompressedText (feedback comprimit amb zlib, migració 0004).
+
+    python -m bench.bench_storage --n 20000 --thresholds 0 256 1024
+
+Feedback sintètic de 2 a 8 frases (el prompt en demana 3-4; els KRs en solen tenir
+menys). Per a cada llindar FEEDBACK_COMPRESS_MIN_BYTES: bytes desats respecte del
+text UTF-8, percentatge de files comprimides i microsegons per escriptura i lectura.
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from app.core.config import settings  # noqa: E402
+from app.db.models import CompressedText  # noqa: E402
+
+SENTENCES = [
+    "El objetivo es claro y está orientado a impacto.",
+    "Falta concretar el marco temporal y el responsable de cada resultado.",
+    "La métrica propuesta es medible, pero conviene fijar una línea base.",
+    "Reduce el alcance: tres focos a la vez diluyen el esfuerzo del equipo.",
+    "Evita verbos genéricos como mejorar u optimizar sin cifras asociadas.",
+    "El resultado clave depende de terceros; valora un indicador bajo vuestro control.",
+    "Buena alineación con la estrategia comercial del trimestre.",
+    "Define qué significa éxito para el cliente final y cómo se medirá.",
+]
+
+def feedbacks(n: int, seed: int = 1) -> list[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(SENTENCES, k=rng.randint(2, 8))) for _ in range(n)]
+
+def measure(texts: list[str], threshold: int) -> dict:
+    settings.FEEDBACK_COMPRESS_MIN_BYTES = threshold
+    t = CompressedText()
+    start = time.perf_counter()
+    stored = [t.process_bind_param(s, None) for s in texts]
+    encode = time.perf_counter() - start
+    start = time.perf_counter()
+    for v in stored:
+        t.process_result_value(v, None)
+    decode = time.perf_counter() - start
+    raw = sum(len(s.encode("utf-8")) for s in texts)
+    return {
+        "threshold": threshold,
+        "stored_ratio": round(sum(len(v) for v in stored) / raw, 3),
+        "compressed_pct": round(100 * sum(v.startswith(b"\x00z") for v in stored) / len(stored), 1),
+        "encode_us": round(encode / len(texts) * 1e6, 2),
+        "decode_us": round(decode / len(texts) * 1e6, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--thresholds", type=int, nargs="+", default=[0, 256, 1024])
+    args = parser.parse_args()
+    texts = feedbacks(args.n)
+    avg = sum(len(s.encode("utf-8")) for s in texts) / len(texts)
+    print(json.dumps({"n": args.n, "avg_bytes": round(avg), "results": [measure(texts, th) for th in args.thresholds]}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Prompt original de l'avaluació d'objectius (abans de app/services/prompts.py):
+instruccions completes al missatge d'usuari a cada crida, sense JSON mode ni max_tokens.
+Es manté només com a referència per a bench/llm_tokens.py.
+"""
+from app.services.prompts import Prompt
+
+SYSTEM = ("Ets un avaluador d'OKR inspirat en Doerr i Grove. "
+          "Dona feedback concret, accionable i breu (màxim 6 punts, 1200 caràcters). "
+          "Evita repeticions i termes vagues.")
+
+def _legacy_user(objective: str) -> str:
+    return f"""
+Eres un consultor experto en OKRs con 15 años de experiencia. Evalúa este objetivo empresarial: "{objective}"
+
+Analiza el objetivo usando el framework SMART y proporciona una evaluación detallada y accionable.
+
+Responde ÚNICAMENTE en formato JSON válido con esta estructura EXACTA:
+{{
+    "overall_score": [número del 1-10 con 1 decimal],
+    "feedback": "Evaluación general detallada en 4-6 líneas que explique las fortalezas principales, las debilidades críticas y el potencial impacto del objetivo",
+    "criteria": {{
+        "specific": {{
+            "score": [1-10],
+            "comment": "Análisis detallado de 30-40 palabras sobre claridad, concreción y especificidad del objetivo"
+        }},
+        "measurable": {{
+            "score": [1-10], 
+            "comment": "Análisis detallado de 30-40 palabras sobre métricas, cuantificación y capacidad de medición"
+        }},
+        "achievable": {{
+            "score": [1-10],
+            "comment": "Análisis detallado de 30-40 palabras sobre realismo, recursos necesarios y factibilidad"
+        }},
+        "relevant": {{
+            "score": [1-10],
+            "comment": "Análisis detallado de 30-40 palabras sobre alineación estratégica e impacto empresarial"
+        }},
+        "timebound": {{
+            "score": [1-10],
+            "comment": "Análisis detallado de 30-40 palabras sobre marco temporal, urgencia y deadlines"
+        }}
+    }},
+    "suggestions": [
+        "Sugerencia específica y accionable 1 (15-25 palabras con pasos concretos)",
+        "Sugerencia específica y accionable 2 (15-25 palabras con pasos concretos)",
+        "Sugerencia específica y accionable 3 (15-25 palabras con pasos concretos)",
+        "Sugerencia específica y accionable 4 (15-25 palabras con pasos concretos)"
+    ]
+}}
+
+REQUISITOS CRÍTICOS:
+- Sé específico y detallado en cada análisis
+- Proporciona insights accionables que ayuden a mejorar el objetivo
+- Usa un tono profesional pero accesible
+- Cada criterio debe tener comentarios de 30-40 palabras mínimo
+- Las sugerencias deben ser implementables inmediatamente
+- Responde SOLO el JSON, sin texto adicional antes o después
+"""
+
+def objective_prompt(objective: str) -> Prompt:
+    return Prompt(endpoint="legacy", system=SYSTEM, user=_legacy_user(objective))
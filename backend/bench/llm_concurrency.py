@@ -0,0 +1,44 @@
+"""Prova de càrrega de `llm_feedback` contra el stub local.
+
+    python -m bench.llm_concurrency --requests 64 --latency-ms 200 --caps 1 4 16
+
+Per a cada valor de LLM_MAX_CONCURRENCY llança totes les crides alhora i
+mesura el throughput: ha d'escalar amb el límit, no serialitzar-se.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from bench.stub_llm import StubServer  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.services import ai_service, prompts  # noqa: E402
+
+async def run_cap(cap: int, n: int) -> dict:
+    settings.LLM_MAX_CONCURRENCY = cap
+    await ai_service.close_client()
+    start = time.perf_counter()
+    await asyncio.gather(*(ai_service.llm_feedback(prompts.objective_prompt(f"prompt {i}")) for i in range(n)))
+    elapsed = time.perf_counter() - start
+    await ai_service.close_client()
+    return {"cap": cap, "requests": n, "seconds": round(elapsed, 3), "rps": round(n / elapsed, 2)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--caps", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--port", type=int, default=9999)
+    args = parser.parse_args()
+
+    with StubServer(port=args.port, latency_ms=args.latency_ms) as stub:
+        settings.OPENAI_BASE_URL = stub.base_url
+        for cap in args.caps:
+            print(json.dumps(asyncio.run(run_cap(cap, args.requests))))
+
+if __name__ == "__main__":
+    main()
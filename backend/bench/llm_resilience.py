@@ -0,0 +1,101 @@
+"""Prova la capa de resiliència (app/services/resilience.py) contra el stub amb fallades.
+
+    python -m bench.llm_resilience --requests 200
+
+- tail:   un 3% de peticions (`--slow-rate`, per sota del p95) triga `--slow-ms` més;
+          p50/p99 sense i amb hedging.
+- outage: el stub respon sempre 500; el breaker s'ha d'obrir i les crides han de
+          fallar a l'instant. Quan el stub es recupera, la crida de prova (semiobert)
+          torna a tancar el breaker.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from bench.stub_llm import StubServer  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.services import ai_service, prompts, resilience  # noqa: E402
+
+def pct(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+async def timed_call() -> tuple[float, str]:
+    start = time.perf_counter()
+    try:
+        await ai_service.llm_feedback(prompts.objective_prompt(f"prompt {uuid.uuid4()}"))  # sempre miss de cache
+        outcome = "ok"
+    except resilience.CircuitOpenError:
+        outcome = "rejected"
+    except Exception as e:
+        outcome = type(e).__name__
+    return time.perf_counter() - start, outcome
+
+async def run(n: int, concurrency: int) -> list[tuple[float, str]]:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            return await timed_call()
+
+    out = await asyncio.gather(*(one() for _ in range(n)))
+    await ai_service.close_client()
+    return out
+
+def summary(name: str, results: list[tuple[float, str]]) -> dict:
+    latencies = [t for t, _ in results]
+    outcomes: dict[str, int] = {}
+    for _, o in results:
+        outcomes[o] = outcomes.get(o, 0) + 1
+    return {"scenario": name, "p50_ms": pct(latencies, 0.5), "p99_ms": pct(latencies, 0.99),
+            "max_ms": pct(latencies, 1.0), "outcomes": outcomes}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--slow-rate", type=float, default=0.03)
+    parser.add_argument("--slow-ms", type=float, default=2000.0)
+    parser.add_argument("--port", type=int, default=9998)
+    args = parser.parse_args()
+
+    with StubServer(port=args.port, latency_ms=args.latency_ms, seed=1) as stub:
+        settings.OPENAI_BASE_URL = stub.base_url
+
+        stub.app.state.slow_rate, stub.app.state.slow_ms = args.slow_rate, args.slow_ms
+        for hedge in (False, True):
+            settings.LLM_HEDGE_ENABLED = hedge
+            resilience.latencies = resilience.LatencyTracker()
+            asyncio.run(run(100, args.concurrency))  # escalfa el percentil
+            before = stub.app.state.requests
+            res = asyncio.run(run(args.requests, args.concurrency))
+            print(json.dumps({**summary(f"tail hedge={hedge}", res), "upstream_requests": stub.app.state.requests - before}))
+        settings.LLM_HEDGE_ENABLED = False
+        stub.app.state.slow_rate = 0.0
+
+        settings.LLM_BREAKER_RESET_SECONDS = 1.0
+        resilience.breaker = resilience.CircuitBreaker(
+            settings.LLM_BREAKER_WINDOW, settings.LLM_BREAKER_MIN_CALLS,
+            settings.LLM_BREAKER_FAILURE_RATIO, settings.LLM_BREAKER_RESET_SECONDS,
+        )
+        stub.app.state.error_rate = 1.0
+        before = stub.app.state.requests
+        res = asyncio.run(run(args.requests, args.concurrency))
+        print(json.dumps({**summary("outage", res), "upstream_requests": stub.app.state.requests - before,
+                          "breaker_state": resilience.breaker.state}))
+
+        stub.app.state.error_rate = 0.0
+        time.sleep(settings.LLM_BREAKER_RESET_SECONDS)
+        asyncio.run(run(1, 1))  # crida de prova
+        res = asyncio.run(run(args.requests, args.concurrency))
+        print(json.dumps({**summary("recovered", res), "breaker_state": resilience.breaker.state}))
+
+if __name__ == "__main__":
+    main()
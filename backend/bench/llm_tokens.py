@@ -0,0 +1,85 @@
+"""Tokens i latència per avaluació: prompt original vs plantilles de app/services/prompts.py.
+
+    python -m bench.llm_tokens --requests 100 --token-ms 10
+
+Contra el stub amb respostes enregistrades (bench/fixtures/llm_responses.json),
+una per plantilla. El stub estima els tokens (~4 caràcters per token) i afegeix
+`--token-ms` de latència per token generat, com un model real. Els tokens es
+llegeixen de les mètriques okr_llm_tokens de l'app.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from prometheus_client import REGISTRY  # noqa: E402
+from bench import legacy_prompts  # noqa: E402
+from bench.stub_llm import StubServer  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.services import ai_service, prompts  # noqa: E402
+
+FIXTURES = Path(__file__).parent / "fixtures" / "llm_responses.json"
+
+def tokens(endpoint: str, kind: str) -> float:
+    return REGISTRY.get_sample_value("okr_llm_tokens_sum", {"endpoint": endpoint, "type": kind}) or 0.0
+
+def pct(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+async def run(name: str, build, n: int, concurrency: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    parsed = 0
+
+    async def one(i: int):
+        nonlocal parsed
+        async with sem:
+            start = time.perf_counter()
+            # Objectius diferents: sempre miss de la cache de respostes
+            content = await ai_service.llm_feedback(build(f"Mejorar la retención de clientes del segmento {i}"))
+            latencies.append(time.perf_counter() - start)
+            try:
+                json.loads(content)
+                parsed += 1
+            except json.JSONDecodeError:
+                pass
+
+    endpoint = build("x").endpoint
+    before = {k: tokens(endpoint, k) for k in ("prompt", "completion", "cached_prompt")}
+    await asyncio.gather(*(one(i) for i in range(n)))
+    await ai_service.close_client()
+    used = {k: tokens(endpoint, k) - v for k, v in before.items()}
+    return {
+        "scenario": name,
+        "prompt_tokens_per_eval": round(used["prompt"] / n, 1),
+        "uncached_prompt_tokens_per_eval": round((used["prompt"] - used["cached_prompt"]) / n, 1),
+        "completion_tokens_per_eval": round(used["completion"] / n, 1),
+        "p50_ms": pct(latencies, 0.5),
+        "p95_ms": pct(latencies, 0.95),
+        "valid_json": parsed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--token-ms", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=9999)
+    args = parser.parse_args()
+
+    with open(FIXTURES, encoding="utf-8") as f:
+        responses = json.load(f)
+    with StubServer(port=args.port, latency_ms=args.latency_ms, token_ms=args.token_ms, responses=responses) as stub:
+        settings.OPENAI_BASE_URL = stub.base_url
+        for name, build in (("legacy", legacy_prompts.objective_prompt), ("templates", prompts.objective_prompt)):
+            print(json.dumps(asyncio.run(run(name, build, args.requests, args.concurrency))))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Arrencada en fred: temps fins a la primera petició servida.
+
+    python -m bench.startup --runs 5
+
+Cada execució arrenca un procés uvicorn nou amb app.main:app (contra el stub LLM
+i un SQLite temporal) i mesura, des del llançament, quan respon /health (procés
+servint) i quan /ready retorna 200 (escalfament fet). També mesura el temps
+d'importar app.main en un procés a part. Amb --database-url apuntant a una BD lenta o
+inaccessible, /health ha de respondre igualment (i /ready, no).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench.stub_llm import StubServer
+
+def wait_for(client: httpx.Client, url: str, start: float, deadline: float) -> float | None:
+    while time.perf_counter() < deadline:
+        try:
+            if client.get(url, timeout=0.5).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.TransportError:
+            pass
+        time.sleep(0.005)
+    return None
+
+def import_seconds(env: dict) -> float:
+    code = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def one_run(env: dict, port: int, timeout: float) -> dict:
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        # Un sol client: crear-ne un per intent consumeix CPU que li falta al procés que arrenca
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            deadline = start + timeout
+            health = wait_for(client, "/health", start, deadline)
+            ready = wait_for(client, "/ready", start, deadline)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return {"health_s": health, "ready_s": ready}
+
+def summary(values: list[float | None]) -> dict:
+    ok = [v for v in values if v is not None]
+    if not ok:
+        return {"failed": len(values)}
+    return {"median_ms": round(statistics.median(ok) * 1000, 1), "max_ms": round(max(ok) * 1000, 1),
+            "failed": len(values) - len(ok)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--stub-port", type=int, default=9999)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--database-url", help="per defecte, un SQLite temporal nou")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, StubServer(port=args.stub_port, latency_ms=0) as stub:
+        env = {
+            **os.environ,
+            "DATABASE_URL": args.database_url or f"sqlite:///{tmp}/startup.db",
+            "DB_CREATE_ALL": "false" if args.database_url else "true",
+            "OPENAI_API_KEY": "sk-bench",
+            "OPENAI_BASE_URL": stub.base_url,
+            "LOG_LEVEL": "WARNING",
+        }
+        env.pop("REDIS_URL", None)
+        imports = [import_seconds(env) for _ in range(args.runs)]
+        runs = [one_run(env, args.port, args.timeout) for _ in range(args.runs)]
+
+    print(json.dumps({
+        "runs": args.runs,
+        "import_app": summary(imports),
+        "first_health": summary([r["health_s"] for r in runs]),
+        "first_ready": summary([r["ready_s"] for r in runs]),
+    }))
+
+if __name__ == "__main__":
+    main()
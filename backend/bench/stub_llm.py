@@ -0,0 +1,204 @@
+"""Servidor stub compatible amb l'API de chat completions d'OpenAI.
+
+    python -m bench.stub_llm --port 9999 --latency-ms 200
+
+Respon sempre el mateix JSON després d'esperar `latency_ms` (asíncronament,
+així que el stub mateix no serialitza les peticions). Amb `"stream": true`
+l'envia en fragments de `chunk_chars` caràcters, repartint la latència.
+
+Injecció de fallades (per provar app/services/resilience.py), modificable en
+calent via `app.state`:
+- `error_rate`: fracció de peticions que responen `error_status` (500, 429...).
+- `slow_rate` / `slow_ms`: fracció de peticions amb latència addicional (cua llarga).
+- `latency_sigma`: la latència base es multiplica per una lognormal(0, sigma)
+  (0 = fixa), una distribució més semblant a la d'un model real.
+
+Tokens (per a bench/llm_tokens.py): `usage` s'estima amb ~4 caràcters per token,
+`max_tokens` talla la resposta (finish_reason "length"), `token_ms` afegeix
+latència per token generat i un system prompt ja vist es compta com a prefix
+cachejat (`prompt_tokens_details.cached_tokens`). `responses` és una llista de
+respostes enregistrades [{"match": text, "content": resposta}]: es retorna la
+primera el `match` de la qual apareix als missatges.
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_CONTENT = json.dumps({
+    "overall_score": 7.8,
+    "feedback": "Objectiu clar i orientat a impacte. Falta concretar el marc temporal.",
+    "criteria": {
+        "specific": {"score": 8, "comment": "Clar i concret."},
+        "measurable": {"score": 7, "comment": "Mètrica identificable però sense valor de partida."},
+        "achievable": {"score": 8, "comment": "Realista amb l'equip actual."},
+        "relevant": {"score": 8, "comment": "Alineat amb l'estratègia."},
+        "timebound": {"score": 6, "comment": "Falta data límit explícita."},
+    },
+    "suggestions": [
+        "Afegeix el valor de partida de la mètrica",
+        "Defineix una data límit trimestral",
+        "Acota l'abast a un únic equip",
+        "Defineix fites intermèdies",
+    ],
+}, ensure_ascii=False)
+
+CHARS_PER_TOKEN = 4
+
+def count_tokens(text: str) -> int:
+    """Aproximació sense tokenitzador: ~4 caràcters per token."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def create_app(latency_ms: float = 200.0, content: str = DEFAULT_CONTENT, chunk_chars: int = 16,
+               error_rate: float = 0.0, error_status: int = 500, slow_rate: float = 0.0,
+               slow_ms: float = 2000.0, seed: int | None = None, token_ms: float = 0.0,
+               responses: list[dict] | None = None, latency_sigma: float = 0.0) -> FastAPI:
+    app = FastAPI()
+    app.state.latency_ms = latency_ms
+    app.state.content = content
+    app.state.chunk_chars = chunk_chars
+    app.state.error_rate = error_rate
+    app.state.error_status = error_status
+    app.state.slow_rate = slow_rate
+    app.state.slow_ms = slow_ms
+    app.state.token_ms = token_ms
+    app.state.latency_sigma = latency_sigma
+    app.state.responses = responses or []
+    app.state.requests = 0
+    app.state.seen_system = set()
+    rng = random.Random(seed)
+
+    def reply(body: dict) -> tuple[str, str, dict]:
+        """Contingut, finish_reason i usage de la petició."""
+        messages = body.get("messages", [])
+        text = "\n".join(str(m.get("content", "")) for m in messages)
+        content = next((r["content"] for r in app.state.responses if r["match"] in text), app.state.content)
+        finish_reason = "stop"
+        max_tokens = body.get("max_tokens")
+        if max_tokens and count_tokens(content) > max_tokens:
+            content, finish_reason = content[:max_tokens * CHARS_PER_TOKEN], "length"
+        system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+        cached = count_tokens(system) if system in app.state.seen_system else 0
+        app.state.seen_system.add(system)
+        usage = {
+            "prompt_tokens": count_tokens(text),
+            "completion_tokens": count_tokens(content),
+            "total_tokens": count_tokens(text) + count_tokens(content),
+            "prompt_tokens_details": {"cached_tokens": cached},
+        }
+        return content, finish_reason, usage
+
+    def base_latency() -> float:
+        sigma = app.state.latency_sigma
+        return app.state.latency_ms * (rng.lognormvariate(0.0, sigma) if sigma else 1.0) / 1000.0
+
+    def latency(usage: dict) -> float:
+        return base_latency() + app.state.token_ms * usage["completion_tokens"] / 1000.0
+
+    async def stream_chunks(model: str, body: dict):
+        content, finish_reason, usage = reply(body)
+        step = max(1, app.state.chunk_chars)
+        pieces = [content[i:i + step] for i in range(0, len(content), step)]
+        delay = latency(usage) / max(1, len(pieces))
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+        for piece in pieces:
+            await asyncio.sleep(delay)
+            payload = {
+                "id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(payload)}\n\n"
+        payload = {
+            "id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}],
+        }
+        yield f"data: {json.dumps(payload)}\n\n"
+        if (body.get("stream_options") or {}).get("include_usage"):
+            payload = {
+                "id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [], "usage": usage,
+            }
+            yield f"data: {json.dumps(payload)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    @app.post("/v1/chat/completions")
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        if rng.random() < app.state.slow_rate:
+            await asyncio.sleep(app.state.slow_ms / 1000.0)
+        if rng.random() < app.state.error_rate:
+            await asyncio.sleep(base_latency())
+            return JSONResponse(
+                {"error": {"message": "injected fault", "type": "server_error", "code": None}},
+                status_code=app.state.error_status,
+            )
+        if body.get("stream"):
+            return StreamingResponse(stream_chunks(body.get("model", "stub"), body), media_type="text/event-stream")
+        content, finish_reason, usage = reply(body)
+        await asyncio.sleep(latency(usage))
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": finish_reason,
+            }],
+            "usage": usage,
+        }
+
+    return app
+
+class StubServer:
+    """Arrenca el stub en un fil propi (amb el seu event loop) per als benchmarks."""
+
+    def __init__(self, port: int = 9999, **kwargs):
+        self.port = port
+        self.app = create_app(**kwargs)
+        self.server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=9999)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-ms", type=float, default=2000.0)
+    parser.add_argument("--token-ms", type=float, default=0.0)
+    parser.add_argument("--responses", help="JSON amb respostes enregistrades [{match, content}]")
+    args = parser.parse_args()
+    responses = None
+    if args.responses:
+        with open(args.responses, encoding="utf-8") as f:
+            responses = json.load(f)
+    app = create_app(latency_ms=args.latency_ms, error_rate=args.error_rate, error_status=args.error_status,
+                     slow_rate=args.slow_rate, slow_ms=args.slow_ms, token_ms=args.token_ms, responses=responses,
+                     latency_sigma=args.latency_sigma)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
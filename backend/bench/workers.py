@@ -0,0 +1,135 @@
+"""Escalat del throughput amb el nombre de workers de gunicorn (gunicorn.conf.py).
+
+    python -m bench.workers --workers 1 2 4 --duration 10
+
+Camí només heurístic (el que és CPU): l'API del model és inaccessible, el circuit
+s'obre i cada avaluació respon amb l'heurística (status degraded). La càrrega la
+generen --clients processos amb --concurrency peticions en curs cadascun; han de
+tenir CPU pròpia perquè no limitin el resultat (clients + workers <= cores).
+Per a cada N: RPS, p50/p99, eficiència respecte de N x RPS(1) i si /metrics
+(mode multiprocés) agrega les peticions de tots els workers.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+def client_worker(base_url: str, duration: float, concurrency: int, seed: int) -> list[float]:
+    async def run() -> list[float]:
+        rng = random.Random(seed)
+        latencies: list[float] = []
+        stop_at = time.perf_counter() + duration
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+            async def loop():
+                while time.perf_counter() < stop_at:
+                    # Textos diferents: sense cache ni reaprofitament per similitud
+                    text = f"Augmentar les vendes del segment {rng.randrange(10**9)} un {rng.randint(5, 50)}% el Q{rng.randint(1, 4)}"
+                    start = time.perf_counter()
+                    response = await client.post("/api/v1/okrs/evaluate", json={"objective": text})
+                    if response.status_code == 200:
+                        latencies.append(time.perf_counter() - start)
+
+            await asyncio.gather(*(loop() for _ in range(concurrency)))
+        return latencies
+
+    return asyncio.run(run())
+
+def pct(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1) if ordered else 0.0
+
+def wait_ready(base_url: str, timeout: float):
+    deadline = time.perf_counter() + timeout
+    with httpx.Client(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if client.get("/ready", timeout=1).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            time.sleep(0.1)
+    raise RuntimeError("gunicorn no està a punt")
+
+def metrics_requests(base_url: str) -> float:
+    """Peticions a /evaluate segons /metrics (suma de tots els workers)."""
+    text = httpx.get(f"{base_url}/metrics", timeout=10).text
+    total = 0.0
+    for line in text.splitlines():
+        if line.startswith("http_requests_total{") and 'handler="/api/v1/okrs/evaluate"' in line:
+            total += float(line.rsplit(" ", 1)[1])
+    return total
+
+def run(n: int, args, tmp: str) -> dict:
+    base_url = f"http://127.0.0.1:{args.port}"
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp}/workers-{n}.db",
+        "OPENAI_API_KEY": "sk-bench",
+        "OPENAI_BASE_URL": "http://127.0.0.1:9/v1",   # inaccessible: només heurística
+        "LLM_MAX_RETRIES": "0",
+        "LOG_LEVEL": "WARNING",
+        "WEB_WORKERS": str(n),
+        "WEB_BIND": f"127.0.0.1:{args.port}",
+        "PROMETHEUS_MULTIPROC_DIR": f"{tmp}/prometheus-{n}",
+    }
+    env.pop("REDIS_URL", None)
+    subprocess.run([sys.executable, "-c", "from app.db.models import Base; from app.db.session import engine; "
+                    "Base.metadata.create_all(engine)"], env=env, cwd=BACKEND, check=True)
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+                              env=env, cwd=BACKEND, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(base_url, 60)
+        # Escalfament: obre el circuit a tots els workers
+        client_worker(base_url, 2.0, args.concurrency, seed=0)
+        before = metrics_requests(base_url)
+        start = time.perf_counter()
+        with multiprocessing.Pool(args.clients) as pool:
+            parts = pool.starmap(client_worker, [(base_url, args.duration, args.concurrency, seed + 1)
+                                                 for seed in range(args.clients)])
+        elapsed = time.perf_counter() - start
+        counted = metrics_requests(base_url) - before
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+    latencies = [v for part in parts for v in part]
+    return {
+        "workers": n,
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": pct(latencies, 0.5),
+        "p99_ms": pct(latencies, 0.99),
+        "metrics_aggregated": counted >= len(latencies),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=2, help="processos generadors de càrrega")
+    parser.add_argument("--concurrency", type=int, default=32, help="peticions en curs per procés client")
+    parser.add_argument("--port", type=int, default=8770)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.workers:
+            results.append(run(n, args, tmp))
+    base = results[0]["rps"] / results[0]["workers"]
+    for r in results:
+        r["efficiency"] = round(r["rps"] / (base * r["workers"]), 2) if base else None
+        print(json.dumps(r))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Servei de producció: gunicorn amb N workers uvicorn (un procés per core).
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+- Workers (WEB_WORKERS, 0 = un per CPU), bind i timeouts surten de Settings.
+- Sense preload: cada worker importa l'app i crea els seus pools (BD, Redis, LLM)
+  després del fork. Si s'activa --preload, post_fork descarta els pools heretats.
+- Mètriques Prometheus en mode multiprocés (PROMETHEUS_MULTIPROC_DIR): /metrics
+  agrega tots els workers, sigui quin sigui el que respon.
+- Les cues i caches en memòria són per worker: amb més d'un cal REDIS_URL perquè
+  els treballs asíncrons i el rate limit siguin compartits.
+- DB_CREATE_ALL (dev): les taules les crea el màster un cop, abans del fork; els
+  workers no ho repeteixen (N create_all simultanis es trepitjarien).
+"""
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+
+from app.core.config import settings
+
+logger = logging.getLogger("gunicorn.error")
+
+PROMETHEUS_DIR = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/okr-prometheus")
+
+bind = settings.WEB_BIND
+workers = settings.WEB_WORKERS or multiprocessing.cpu_count()
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = settings.WEB_TIMEOUT_SECONDS
+# Marge perquè el lifespan buidi el write-behind i els treballs en curs
+graceful_timeout = settings.WEB_GRACEFUL_TIMEOUT_SECONDS
+keepalive = settings.WEB_KEEPALIVE_SECONDS
+max_requests = settings.WEB_MAX_REQUESTS
+max_requests_jitter = settings.WEB_MAX_REQUESTS // 10
+accesslog = None  # les peticions ja es registren a les mètriques i les traces
+
+def _create_tables():
+    from app.db.models import Base
+    from app.db.session import engine
+    Base.metadata.create_all(engine)
+    engine.dispose()  # cap connexió del màster als workers
+    # Els workers són forks del màster i hereten aquest `settings`: el lifespan ja no les crea
+    settings.DB_CREATE_ALL = False
+
+def on_starting(server):
+    # Fitxers de mètriques d'una execució anterior: comptarien dues vegades
+    shutil.rmtree(PROMETHEUS_DIR, ignore_errors=True)
+    os.makedirs(PROMETHEUS_DIR, exist_ok=True)
+    if settings.DB_CREATE_ALL:
+        _create_tables()
+    if workers > 1 and not settings.REDIS_URL:
+        logger.warning(f"⚠️ {workers} workers sin REDIS_URL: la cola de trabajos y el rate limit son por worker")
+
+def post_fork(server, worker):
+    # Amb preload, el fill hereta els pools del pare: no es poden compartir connexions
+    session = sys.modules.get("app.db.session")
+    if session is not None:
+        session.engine.dispose(close=False)
+        session.async_engine.sync_engine.dispose(close=False)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
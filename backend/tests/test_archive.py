@@ -0,0 +1,80 @@
+"""app.cli.archive sobre SQLite amb les FK actives (com InnoDB): res no surt de la BD sense exportar."""
+import glob
+import gzip
+import json
+import os
+import tempfile
+from datetime import date, datetime
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/archive.db"
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import pytest  # noqa: E402
+from sqlalchemy import event, select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from app.cli.archive import archive  # noqa: E402
+from app.db.models import Base, KeyResult, OkrSubmission  # noqa: E402
+from app.db.session import engine  # noqa: E402
+
+TODAY = date(2026, 10, 18)
+
+@event.listens_for(engine, "connect")
+def _foreign_keys(dbapi_conn, _):
+    dbapi_conn.execute("PRAGMA foreign_keys=ON")
+
+def _okr(okr_id: str, created_at: datetime) -> OkrSubmission:
+    return OkrSubmission(id=okr_id, objective=f"Objectiu {okr_id}", clarity=8, focus=8, writing=8, score=8,
+                         feedback="{}", created_at=created_at)
+
+def _kr(kr_id: str, okr_id: str, created_at: datetime) -> KeyResult:
+    return KeyResult(id=kr_id, okr_id=okr_id, kr_definition=f"KR {kr_id}", target_value="10%",
+                     target_date=datetime(2026, 12, 31), clarity=8, measurability=8, feasibility=8, score=8,
+                     feedback="{}", created_at=created_at)
+
+def _archived_ids(out: str) -> dict[str, set[str]]:
+    ids: dict[str, set[str]] = {}
+    for path in glob.glob(os.path.join(out, "*.jsonl.gz")):
+        table = os.path.basename(path).split("-")[0]
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            ids.setdefault(table, set()).update(json.loads(line)["id"] for line in f)
+    return ids
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([
+            _okr("old", datetime(2024, 1, 15)),
+            _okr("recent", datetime(2026, 9, 1)),
+        ])
+        session.flush()
+        session.add_all([
+            _kr("old-kr", "old", datetime(2024, 1, 20)),
+            _kr("late-kr", "old", datetime(2026, 9, 10)),  # KR nou d'un objectiu arxivat
+            _kr("recent-kr", "recent", datetime(2026, 9, 2)),
+        ])
+        session.commit()
+    yield
+    Base.metadata.drop_all(engine)
+
+def test_newer_krs_leave_with_their_objective(db, tmp_path):
+    summary = archive(12, str(tmp_path), today=TODAY)
+
+    archived = _archived_ids(str(tmp_path))
+    assert archived["okr_submissions"] == {"old"}
+    assert archived["key_results"] == {"old-kr", "late-kr"}
+    assert summary["tables"]["okr_submissions"]["key_results"] == 1
+    with Session(engine) as session:
+        assert session.scalars(select(OkrSubmission.id)).all() == ["recent"]
+        assert session.scalars(select(KeyResult.id)).all() == ["recent-kr"]
+
+def test_dry_run_counts_newer_krs_once(db, tmp_path):
+    summary = archive(12, str(tmp_path), dry_run=True, today=TODAY)
+
+    assert summary["tables"]["key_results"]["rows"] == 1
+    assert summary["tables"]["okr_submissions"]["rows"] == 1
+    assert summary["tables"]["okr_submissions"]["key_results"] == 1
+    assert not os.listdir(tmp_path)
+    with Session(engine) as session:
+        assert len(session.scalars(select(KeyResult.id)).all()) == 3